@@ -1,16 +1,64 @@
-from fastapi import FastAPI, Request
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routers.telegram import router as telegram_router
+from routers.telegram import router as telegram_router, process_update
 from routers.constructor import router as constructor_router
 from routers.api import router as api_router
 from routers.metrics import router as metrics_router
+from routers.health import router as health_router
+
+from services.logging_setup import configure_logging
+from services.prometheus_middleware import PrometheusMiddleware
+import services.telegram_client as telegram_client
+import constants.redis_models as rdb
+from services.migrations import migrate_schema
+import services.inbound_queue as inbound_queue
+import services.broadcast as broadcast
+import services.db as db
+import services.health as health
+import services.mongo_db as mdb
+from config.settings import INBOUND_QUEUE_ENABLED
+
+
+def _warm_mongo() -> None:
+    mdb.ping()
+    mdb.ensure_indexes()
+    mdb.migrate_legacy_variables()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    configure_logging()
+    # Independent warm-ups run concurrently so startup takes as long as the
+    # slowest dependency; any failure aborts startup.
+    await asyncio.gather(
+        telegram_client.start(),
+        migrate_schema(),
+        rdb.redis_client.ping(),
+        asyncio.to_thread(_warm_mongo),
+    )
+    rdb.start_invalidation_listener()
+    mdb.log_writer.start()
+    if INBOUND_QUEUE_ENABLED:
+        inbound_queue.start(process_update)
+    health.mark_ready()
+    try:
+        yield
+    finally:
+        health.mark_not_ready()
+        await inbound_queue.stop()
+        await broadcast.stop()
+        await mdb.log_writer.stop()
+        await rdb.close()
+        await telegram_client.close()
+        await db.async_engine.dispose()
+        await asyncio.to_thread(mdb.close)
 
-import time
-from constants.prometheus_models import REQUEST_COUNT, REQUEST_LATENCY
-import services.logging_setup  # configure logging on import
 
 app = FastAPI(
     title="Telegram CORP AI Integration API",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -20,23 +68,11 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(PrometheusMiddleware)
 
 
 app.include_router(telegram_router)
 app.include_router(constructor_router)
 app.include_router(api_router)
 app.include_router(metrics_router)
-
-@app.middleware("http")
-async def prometheus_middleware(request: Request, call_next):
-    method = request.method
-    endpoint = request.url.path
-
-    start = time.time()
-    response = await call_next(request)
-    latency = time.time() - start
-
-    REQUEST_COUNT.labels(method=method, endpoint=endpoint).inc()
-    REQUEST_LATENCY.labels(method=method, endpoint=endpoint).observe(latency)
-
-    return response
\ No newline at end of file
+app.include_router(health_router)
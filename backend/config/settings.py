@@ -1,5 +1,6 @@
 import os
 import json
+import math
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -11,6 +12,25 @@ INTEGRATION_URL = os.getenv("INTEGRATION_URL")
 INTEGRATION_CODE = os.getenv("INTEGRATION_CODE")
 INTEGRATION_TOKEN = os.getenv("INTEGRATION_TOKEN")
 
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org").rstrip("/")
+TELEGRAM_HTTP2 = os.getenv("TELEGRAM_HTTP2", "false").lower() in ("1", "true", "yes")
+TELEGRAM_MAX_CONNECTIONS = int(os.getenv("TELEGRAM_MAX_CONNECTIONS", "100"))
+TELEGRAM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("TELEGRAM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+TELEGRAM_KEEPALIVE_EXPIRY = float(os.getenv("TELEGRAM_KEEPALIVE_EXPIRY", "60"))
+TELEGRAM_TIMEOUT = float(os.getenv("TELEGRAM_TIMEOUT", "30"))
+TELEGRAM_CONNECT_TIMEOUT = float(os.getenv("TELEGRAM_CONNECT_TIMEOUT", "5"))
+TELEGRAM_FILE_CACHE_TTL = float(os.getenv("TELEGRAM_FILE_CACHE_TTL", "3000"))
+TELEGRAM_FILE_CACHE_SIZE = int(os.getenv("TELEGRAM_FILE_CACHE_SIZE", "10000"))
+TELEGRAM_BOT_RATE = float(os.getenv("TELEGRAM_BOT_RATE", "30"))
+TELEGRAM_CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE", "1"))
+TELEGRAM_GROUP_RATE = float(os.getenv("TELEGRAM_GROUP_RATE", str(20 / 60)))
+TELEGRAM_SEND_MAX_RETRIES = int(os.getenv("TELEGRAM_SEND_MAX_RETRIES", "3"))
+MEDIA_INFLIGHT_BYTES = int(os.getenv("MEDIA_INFLIGHT_BYTES", str(64 * 1024 * 1024)))
+MEDIA_DOWNLOAD_MAX_CONNECTIONS = int(os.getenv("MEDIA_DOWNLOAD_MAX_CONNECTIONS", "20"))
+# auto: let Telegram fetch public URLs itself and learn per domain when that
+# fails; url: always try the URL first; upload: always relay the bytes.
+MEDIA_SEND_STRATEGY = os.getenv("MEDIA_SEND_STRATEGY", "auto").lower()
+
 BASE_DIR = Path(__file__).resolve().parent
 with open(BASE_DIR / 'scheme.json', 'r', encoding='utf-8') as f:
     SCHEME = json.load(f)
@@ -21,19 +41,85 @@ POSTGRES_USER=os.getenv("POSTGRES_USER")
 POSTGRES_PASSWORD=os.getenv("POSTGRES_PASSWORD")
 POSTGRES_DB=os.getenv("POSTGRES_DB")
 FERNET_KEY=os.getenv("FERNET_KEY")
+BLIND_INDEX_KEY=os.getenv("BLIND_INDEX_KEY")
 POSTGRES_CONNECTION_URL = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_URL}/{POSTGRES_DB}"
+POSTGRES_ASYNC_CONNECTION_URL = f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_URL}/{POSTGRES_DB}"
+POSTGRES_POOL_SIZE = int(os.getenv("POSTGRES_POOL_SIZE", "10"))
+POSTGRES_MAX_OVERFLOW = int(os.getenv("POSTGRES_MAX_OVERFLOW", "20"))
 
 
 REDIS_URL=os.getenv("REDIS_URL")
 REDIS_PASSWORD=os.getenv("REDIS_PASSWORD")
 REDIS_CACHE_TIME=os.getenv("REDIS_CACHE_TIME", "86400")
+# Accepts plain seconds or a product such as 60*60*24; parsed once here.
+REDIS_CACHE_TTL=math.prod(int(part) for part in REDIS_CACHE_TIME.split("*"))
+WEBHOOK_CONTEXT_TTL=int(os.getenv("WEBHOOK_CONTEXT_TTL", "300"))
+MEDIA_FILE_ID_TTL=int(os.getenv("MEDIA_FILE_ID_TTL", str(30 * 24 * 3600)))
+MEDIA_FILE_ID_REVALIDATE=int(os.getenv("MEDIA_FILE_ID_REVALIDATE", "3600"))
+MEDIA_STRATEGY_TTL=int(os.getenv("MEDIA_STRATEGY_TTL", str(24 * 3600)))
+CONTACT_VARIABLES_TTL=int(os.getenv("CONTACT_VARIABLES_TTL", "3600"))
+LOCAL_CACHE_SIZE=int(os.getenv("LOCAL_CACHE_SIZE", "10000"))
+LOCAL_CACHE_TTL=float(os.getenv("LOCAL_CACHE_TTL", "30"))
 REDIS_CONNECTION_URL = f"redis://:{REDIS_PASSWORD}@{REDIS_URL}"
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", "5"))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
+
+OUTBOUND_QUEUE_ENABLED = os.getenv("OUTBOUND_QUEUE_ENABLED", "false").lower() in ("1", "true", "yes")
+OUTBOUND_STREAM = os.getenv("OUTBOUND_STREAM", "outbound:messages")
+OUTBOUND_DEAD_LETTER_STREAM = os.getenv("OUTBOUND_DEAD_LETTER_STREAM", "outbound:dead-letters")
+OUTBOUND_GROUP = os.getenv("OUTBOUND_GROUP", "senders")
+OUTBOUND_STREAM_MAXLEN = int(os.getenv("OUTBOUND_STREAM_MAXLEN", "100000"))
+OUTBOUND_MAX_ATTEMPTS = int(os.getenv("OUTBOUND_MAX_ATTEMPTS", "5"))
+OUTBOUND_RETRY_BASE_DELAY = float(os.getenv("OUTBOUND_RETRY_BASE_DELAY", "2"))
+OUTBOUND_RETRY_MAX_DELAY = float(os.getenv("OUTBOUND_RETRY_MAX_DELAY", "300"))
+OUTBOUND_CLAIM_IDLE_MS = int(os.getenv("OUTBOUND_CLAIM_IDLE_MS", "60000"))
+OUTBOUND_BATCH_SIZE = int(os.getenv("OUTBOUND_BATCH_SIZE", "20"))
+OUTBOUND_METRICS_PORT = int(os.getenv("OUTBOUND_METRICS_PORT", "9101"))
+
+INBOUND_QUEUE_ENABLED = os.getenv("INBOUND_QUEUE_ENABLED", "false").lower() in ("1", "true", "yes")
+INBOUND_STREAM_PREFIX = os.getenv("INBOUND_STREAM_PREFIX", "inbound:updates")
+INBOUND_PARTITIONS = int(os.getenv("INBOUND_PARTITIONS", "16"))
+INBOUND_GROUP = os.getenv("INBOUND_GROUP", "processors")
+INBOUND_STREAM_MAXLEN = int(os.getenv("INBOUND_STREAM_MAXLEN", "100000"))
+INBOUND_LEASE_MS = int(os.getenv("INBOUND_LEASE_MS", "30000"))
+
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "30"))
+BROADCAST_FETCH_SIZE = int(os.getenv("BROADCAST_FETCH_SIZE", "500"))
+BROADCAST_TTL = int(os.getenv("BROADCAST_TTL", str(7 * 24 * 3600)))
+BROADCAST_STALE_AFTER = int(os.getenv("BROADCAST_STALE_AFTER", "300"))
+
+TEXT_STATS_CAPACITY = int(os.getenv("TEXT_STATS_CAPACITY", "100"))
+TEXT_STATS_EXPORT_TOP = int(os.getenv("TEXT_STATS_EXPORT_TOP", "10"))
+TEXT_STATS_DUMP_INTERVAL = float(os.getenv("TEXT_STATS_DUMP_INTERVAL", "5"))
+
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_FILE_MAX_BYTES = int(os.getenv("LOG_FILE_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_FILE_BACKUPS = int(os.getenv("LOG_FILE_BACKUPS", "5"))
+LOKI_BATCH_SIZE = int(os.getenv("LOKI_BATCH_SIZE", "500"))
+LOKI_FLUSH_INTERVAL = float(os.getenv("LOKI_FLUSH_INTERVAL", "2"))
+LOKI_BUFFER_SIZE = int(os.getenv("LOKI_BUFFER_SIZE", "10000"))
+# Share of info-level events logged per event type, e.g. "INCOMING=0.1,SENT=0".
+# Unlisted events and anything at warning level or above are always logged.
+LOG_SAMPLE_RATES = {
+    event.strip(): float(rate)
+    for event, rate in (
+        item.split("=", 1) for item in os.getenv("LOG_SAMPLE_RATES", "").split(",") if "=" in item
+    )
+}
+LOG_MAX_FIELD_CHARS = int(os.getenv("LOG_MAX_FIELD_CHARS", "1000"))
+
+HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", "2"))
 
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
 PROMETHEUS_JOBS_PATH = os.getenv("PROMETHEUS_JOBS_PATH", "/app/shared/jobs.json")
 
 MONGO_HOST=os.getenv("MONGO_HOST")
 MONGO_USERNAME=os.getenv("MONGO_USERNAME")
 MONGO_PASSWORD=os.getenv("MONGO_PASSWORD")
 MONGO_DB=os.getenv("MONGO_DB")
+MONGO_LOG_QUEUE_SIZE = int(os.getenv("MONGO_LOG_QUEUE_SIZE", "10000"))
+MONGO_LOG_BATCH_SIZE = int(os.getenv("MONGO_LOG_BATCH_SIZE", "500"))
+MONGO_LOG_FLUSH_INTERVAL = float(os.getenv("MONGO_LOG_FLUSH_INTERVAL", "1"))
 
 
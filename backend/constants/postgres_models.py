@@ -1,7 +1,11 @@
+import base64
+import hashlib
+import hmac
+import re
+
 from cryptography.fernet import Fernet
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy import (
-    create_engine,
     Column,
     ForeignKey,
     LargeBinary,
@@ -9,18 +13,31 @@ from sqlalchemy import (
     Text,
     Boolean,
     Index,
+    String,
 )
-from sqlalchemy.orm import declarative_base, sessionmaker, relationship
+from sqlalchemy.orm import declarative_base, relationship
 
-from config.settings import FERNET_KEY, POSTGRES_CONNECTION_URL
+from config.settings import FERNET_KEY, BLIND_INDEX_KEY
 
 cipher = Fernet(FERNET_KEY)
 
-engine = create_engine(POSTGRES_CONNECTION_URL)
-Session = sessionmaker(bind=engine)
-session = Session()
+if BLIND_INDEX_KEY:
+    _blind_index_key = BLIND_INDEX_KEY.encode()
+else:
+    _blind_index_key = hmac.new(
+        base64.urlsafe_b64decode(FERNET_KEY), b"blind-index", hashlib.sha256
+    ).digest()
+
+
+def blind_index(value: str) -> str:
+    """Return a keyed HMAC of ``value`` usable for equality lookups."""
+    return hmac.new(_blind_index_key, value.encode(), hashlib.sha256).hexdigest()
 
 
+def blind_index_key_id() -> str:
+    """Fingerprint of the blind index key, stored to notice when it changes."""
+    return blind_index("blind-index-key-id")[:16]
+
 Base = declarative_base()
 
 
@@ -31,6 +48,7 @@ class Bot(Base):
     token = Column(LargeBinary, nullable=False)
     name = Column(Text, nullable=False)
     ownerUuid = Column(LargeBinary, nullable=False)
+    ownerUuidHash = Column(String(64), nullable=True)
     passUuid = Column(LargeBinary, nullable=False)
     webUrl = Column(LargeBinary, nullable=False)
     locale = Column(Text, nullable=False, default="en")
@@ -60,6 +78,7 @@ class Bot(Base):
     
     def set_owner_uuid(self, plain_uuid: str):
         self.ownerUuid = cipher.encrypt(plain_uuid.encode())
+        self.ownerUuidHash = blind_index(plain_uuid)
 
     def get_owner_uuid(self) -> str:
         return cipher.decrypt(self.ownerUuid).decode()
@@ -82,18 +101,28 @@ class Bot(Base):
     def get_locale(self) -> str:
         return self.locale
 
+    __table_args__ = (
+        Index('ix_bots_owner_uuid_hash', 'ownerUuidHash'),
+    )
+
 
 class PassToken(Base):
     __tablename__ = 'pass_tokens'
 
     uuid = Column(LargeBinary, primary_key=True)
+    uuidHash = Column(String(64), nullable=True)
     bot_id = Column(BigInteger, ForeignKey('bots.id', ondelete='CASCADE'), nullable=False)
     isUsed = Column(Boolean, default=False, nullable=False)
 
     bot = relationship('Bot', back_populates='pass_tokens')
 
+    __table_args__ = (
+        Index('ix_pass_tokens_bot_id_uuid_hash', 'bot_id', 'uuidHash'),
+    )
+
     def set_uuid(self, plain_uuid: str):
         self.uuid = cipher.encrypt(plain_uuid.encode())
+        self.uuidHash = blind_index(plain_uuid)
 
     def get_uuid(self) -> str:
         return cipher.decrypt(self.uuid).decode()
@@ -106,12 +135,24 @@ class User(Base):
     name = Column(Text, nullable=True)
     surname = Column(Text, nullable=True)
     phone = Column(LargeBinary, nullable=True)
+    phoneHash = Column(String(64), nullable=True)
 
     bots = relationship("BotUser", back_populates="user")
     projects = relationship("UserProjectSelection", back_populates="user")
 
+    __table_args__ = (
+        Index('ix_users_phone_hash', 'phoneHash'),
+    )
+
+    @staticmethod
+    def phone_blind_index(plain_phone: str) -> str | None:
+        """Blind index of the phone digits, so ``+7 900`` matches ``7900``."""
+        digits = re.sub(r"\D", "", plain_phone or "")
+        return blind_index(digits) if digits else None
+
     def set_phone(self, plain_phone: str):
         self.phone = cipher.encrypt(plain_phone.encode())
+        self.phoneHash = User.phone_blind_index(plain_phone)
 
     def get_phone(self) -> str:
         return cipher.decrypt(self.phone).decode() 
@@ -130,6 +171,7 @@ class BotUser(Base):
 
     __table_args__ = (
         Index('ix_bot_user_bot_id_user_id', 'bot_id', 'user_id', unique=True),
+        Index('ix_bot_user_user_id', 'user_id'),
     )
 
 class Project(Base):
@@ -180,4 +222,14 @@ class UserProjectSelection(Base):
     )
 
 
-Base.metadata.create_all(engine)
+# MigrationState row holding blind_index_key_id() of the key the stored
+# hashes were computed with.
+BLIND_INDEX_KEY_STATE = "blind_index_key"
+
+
+class MigrationState(Base):
+    """Key/value facts about the schema that migrate_schema() checks on startup."""
+    __tablename__ = 'migration_state'
+
+    name = Column(String(64), primary_key=True)
+    value = Column(Text, nullable=False)
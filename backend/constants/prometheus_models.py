@@ -1,8 +1,20 @@
-from prometheus_client import CollectorRegistry
-from prometheus_client import Counter, Histogram
+from prometheus_client import CollectorRegistry, multiprocess
+from prometheus_client import Counter, Gauge, Histogram
+
+from config.settings import PROMETHEUS_MULTIPROC_DIR
 
 registry = CollectorRegistry()
 
+# With several worker processes every metric is written to mmap'd files in
+# PROMETHEUS_MULTIPROC_DIR and a scrape merges the files of all workers.
+# Gauges are summed over live processes only ("livesum"), so a dead worker's
+# in-flight counts disappear with it.
+if PROMETHEUS_MULTIPROC_DIR:
+    scrape_registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(scrape_registry)
+else:
+    scrape_registry = registry
+
 REQUEST_COUNT = Counter(
     "http_requests_total",
     "Total number of HTTP requests received",
@@ -17,6 +29,22 @@ REQUEST_LATENCY = Histogram(
     registry=registry
 )
 
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests currently being handled",
+    ["method"],
+    multiprocess_mode="livesum",
+    registry=registry,
+)
+
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes",
+    "Histogram of response body sizes (bytes)",
+    ["method", "endpoint"],
+    buckets=(100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000),
+    registry=registry,
+)
+
 MESSAGE_COUNT = Counter(
     "bot_messages_total",
     "Total number of processed bot messages",
@@ -25,9 +53,156 @@ MESSAGE_COUNT = Counter(
 )
 
 
-MESSAGE_TEXT_COUNT = Counter(
-    "bot_message_text_total",
-    "Count of messages by direction, bot and text",
-    ["direction", "bot_id", "text"],
+TELEGRAM_API_REQUESTS = Counter(
+    "telegram_api_requests_total",
+    "Total number of Telegram Bot API calls by method and status",
+    ["method", "status"],
+    registry=registry,
+)
+
+TELEGRAM_API_LATENCY = Histogram(
+    "telegram_api_request_duration_seconds",
+    "Histogram of Telegram Bot API call latencies (seconds)",
+    ["method"],
+    registry=registry,
+)
+
+TELEGRAM_API_IN_FLIGHT = Gauge(
+    "telegram_api_requests_in_flight",
+    "Number of Telegram Bot API calls currently awaiting a response",
+    multiprocess_mode="livesum",
+    registry=registry,
+)
+
+TELEGRAM_POOL_CONNECTIONS = Gauge(
+    "telegram_api_pool_connections",
+    "Connections held by the shared Telegram API client pool",
+    ["state"],
+    multiprocess_mode="livesum",
+    registry=registry,
+)
+
+TELEGRAM_SEND_QUEUE_DEPTH = Gauge(
+    "telegram_send_queue_depth",
+    "Outgoing Telegram messages waiting for a rate limit slot",
+    multiprocess_mode="livesum",
+    registry=registry,
+)
+
+TELEGRAM_SEND_WAIT = Histogram(
+    "telegram_send_wait_seconds",
+    "Time outgoing Telegram messages spent waiting for a rate limit slot",
+    buckets=(0, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+    registry=registry,
+)
+
+TELEGRAM_SEND_RETRIES = Counter(
+    "telegram_send_retries_total",
+    "Outgoing Telegram messages retried after a 429 response",
+    registry=registry,
+)
+
+MEDIA_RELAY_INFLIGHT_BYTES = Gauge(
+    "media_relay_inflight_bytes",
+    "Bytes of media reserved by uploads currently relayed to Telegram",
+    multiprocess_mode="livesum",
+    registry=registry,
+)
+
+MEDIA_FILE_ID_CACHE = Counter(
+    "media_file_id_cache_total",
+    "Outgoing media sent by cached Telegram file_id, by result",
+    ["result"],
+    registry=registry,
+)
+
+MEDIA_SEND_STRATEGY_RESULTS = Counter(
+    "media_send_strategy_total",
+    "Outgoing media sends by strategy (url pass-through or upload) and result",
+    ["strategy", "result"],
+    registry=registry,
+)
+
+
+OUTBOUND_JOBS = Counter(
+    "outbound_jobs_total",
+    "Outbound queue jobs handled by the workers by result",
+    ["result"],
+    registry=registry,
+)
+
+OUTBOUND_QUEUE_LAG = Histogram(
+    "outbound_queue_lag_seconds",
+    "Time between enqueueing an outbound job and a worker picking it up",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300),
+    registry=registry,
+)
+
+
+INBOUND_UPDATES = Counter(
+    "inbound_updates_total",
+    "Queued Telegram updates processed by the partition consumers by result",
+    ["result"],
+    registry=registry,
+)
+
+INBOUND_QUEUE_LAG = Histogram(
+    "inbound_queue_lag_seconds",
+    "Time between queueing a Telegram update and starting to process it",
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+    registry=registry,
+)
+
+
+BROADCAST_MESSAGES = Counter(
+    "broadcast_messages_total",
+    "Per-recipient broadcast sends by result",
+    ["result"],
+    registry=registry,
+)
+
+
+MONGO_LOG_DOCUMENTS = Counter(
+    "mongo_log_documents_total",
+    "Message log documents handled by the batched Mongo writer by result",
+    ["result"],
+    registry=registry,
+)
+
+MONGO_LOG_QUEUE_DEPTH = Gauge(
+    "mongo_log_queue_depth",
+    "Message log documents waiting to be written to Mongo",
+    multiprocess_mode="livesum",
+    registry=registry,
+)
+
+
+CONTACT_VARIABLES_CACHE = Counter(
+    "contact_variables_cache_total",
+    "Contact variable lookups by where they were answered from",
+    ["result"],
+    registry=registry,
+)
+
+
+LOG_RECORDS_DROPPED = Counter(
+    "log_records_dropped_total",
+    "Log records dropped because the log queue or the Loki backlog was full",
+    ["reason"],
+    registry=registry,
+)
+
+LOKI_PUSHES = Counter(
+    "loki_pushes_total",
+    "Batched pushes of log records to Loki by result",
+    ["result"],
+    registry=registry,
+)
+
+
+LOCAL_CACHE_REQUESTS = Counter(
+    "local_cache_requests_total",
+    "In-process cache lookups in front of Redis by entity and result",
+    ["entity", "result"],
     registry=registry,
 )
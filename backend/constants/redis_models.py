@@ -1,67 +1,353 @@
+import asyncio
+import hashlib
+import itertools
 import json
-from typing import Optional, Tuple
+import logging
+import time
+from typing import Any, Optional, Tuple
 import redis
+from redis import asyncio as aioredis
 from cryptography.fernet import Fernet
 
-from config.settings import FERNET_KEY, REDIS_CONNECTION_URL, REDIS_CACHE_TIME
-
-redis_client = redis.Redis.from_url(REDIS_CONNECTION_URL, decode_responses=True)
+from config.settings import (
+    FERNET_KEY,
+    REDIS_CONNECTION_URL,
+    REDIS_MAX_CONNECTIONS,
+    REDIS_POOL_TIMEOUT,
+    REDIS_HEALTH_CHECK_INTERVAL,
+    REDIS_CACHE_TTL,
+    WEBHOOK_CONTEXT_TTL,
+    MEDIA_FILE_ID_TTL,
+    MEDIA_STRATEGY_TTL,
+    CONTACT_VARIABLES_TTL,
+    BROADCAST_TTL,
+    BROADCAST_STALE_AFTER,
+    LOCAL_CACHE_SIZE,
+    LOCAL_CACHE_TTL,
+)
+from constants.prometheus_models import LOCAL_CACHE_REQUESTS
+from services.cache import TTLCache
+
+# One pool per process shared by every coroutine. The blocking pool makes
+# callers wait for a free connection instead of failing when it is exhausted.
+redis_pool = aioredis.BlockingConnectionPool.from_url(
+    REDIS_CONNECTION_URL,
+    decode_responses=True,
+    max_connections=REDIS_MAX_CONNECTIONS,
+    timeout=REDIS_POOL_TIMEOUT,
+    health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+)
+redis_client = aioredis.Redis(connection_pool=redis_pool)
 
 cipher = Fernet(FERNET_KEY)
 
+logger = logging.getLogger(__name__)
+
+# In-process cache in front of the hot, rarely changing entries. It is keyed
+# by the Redis key and kept coherent across workers by publishing the keys
+# touched by every write on INVALIDATION_CHANNEL. Filling it after a read
+# miss is local only.
+local_cache = TTLCache(maxsize=LOCAL_CACHE_SIZE, ttl=LOCAL_CACHE_TTL)
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+# Versions order reads against invalidations: a fill carries the version
+# taken before its value was read and is dropped if the key was invalidated
+# after that, so a late invalidation wins over an in-flight read.
+_versions = itertools.count(1)
+_invalidated_at = TTLCache(maxsize=LOCAL_CACHE_SIZE, ttl=LOCAL_CACHE_TTL)
+_cleared_at = 0
+
+_listener: Optional[asyncio.Task] = None
+
+
+def cache_version() -> int:
+    """Version to pass to a ``fill`` of a value about to be loaded."""
+    return next(_versions)
+
+
+def _local_get(entity: str, key: str) -> Any:
+    value = local_cache.get(key)
+    LOCAL_CACHE_REQUESTS.labels(
+        entity=entity, result="miss" if value is None else "hit"
+    ).inc()
+    return value
+
+
+def _local_fill(key: str, value: Any, version: int) -> None:
+    """Cache ``value`` locally unless ``key`` was invalidated after ``version``."""
+    if _cleared_at > version or _invalidated_at.get(key, 0) > version:
+        return
+    local_cache.set(key, value)
+
+
+def _local_drop(keys) -> None:
+    version = next(_versions)
+    for key in keys:
+        local_cache.pop(key)
+        _invalidated_at.set(key, version)
+
+
+def _local_clear() -> None:
+    global _cleared_at
+    _cleared_at = next(_versions)
+    local_cache.clear()
+
+
+def _invalidate(pipe, *keys: str) -> None:
+    """Drop ``keys`` locally and queue the broadcast on ``pipe``.
+
+    Only for writes and deletes; fills after a read miss use ``_local_fill``.
+    """
+    _local_drop(keys)
+    pipe.publish(INVALIDATION_CHANNEL, json.dumps(keys))
+
+
+async def _listen() -> None:
+    while True:
+        pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            # Anything published while we were not subscribed is lost.
+            _local_clear()
+            while True:
+                message = await pubsub.get_message(timeout=1.0)
+                if message:
+                    _local_drop(json.loads(message["data"]))
+        except redis.RedisError as e:
+            logger.warning(f"Cache invalidation listener disconnected: {e}")
+            _local_clear()
+            await asyncio.sleep(1.0)
+        finally:
+            await pubsub.aclose()
+
+
+def start_invalidation_listener() -> None:
+    global _listener
+    if _listener is None:
+        _listener = asyncio.create_task(_listen())
+
+
+async def stop_invalidation_listener() -> None:
+    global _listener
+    if _listener is None:
+        return
+    _listener.cancel()
+    try:
+        await _listener
+    except asyncio.CancelledError:
+        pass
+    _listener = None
+
+
+async def close() -> None:
+    """Stop the listener and release every pooled connection."""
+    await stop_invalidation_listener()
+    await redis_client.aclose()
+    await redis_pool.disconnect()
+
+
 class Bot:
     @staticmethod
-    def create(bot_id: int, token: str):
+    async def create(bot_id: int, token: str):
         key = Bot.__redis_key_for_bot_token(bot_id)
         token = cipher.encrypt(token.encode())
-        redis_client.set(key, token, ex=int(eval(REDIS_CACHE_TIME)))
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.set(key, token, ex=REDIS_CACHE_TTL)
+        _invalidate(pipe, key)
+        await pipe.execute()
 
     @staticmethod
-    def get(bot_id: int):
+    async def fill(bot_id: int, token: str, version: int) -> None:
+        """Cache a token loaded from the database after a miss."""
         key = Bot.__redis_key_for_bot_token(bot_id)
-        token = redis_client.get(key)
+        await redis_client.set(key, cipher.encrypt(token.encode()), ex=REDIS_CACHE_TTL, nx=True)
+        _local_fill(key, token, version)
+
+    @staticmethod
+    async def get(bot_id: int):
+        key = Bot.__redis_key_for_bot_token(bot_id)
+        cached = _local_get("bot_token", key)
+        if cached is not None:
+            return cached
+        version = cache_version()
+        token = await redis_client.get(key)
         if token:
-            return cipher.decrypt(token).decode()
-        
+            token = cipher.decrypt(token).decode()
+            _local_fill(key, token, version)
+            return token
+
         return None
 
     @staticmethod
-    def delete(bot_id: int):
+    async def delete(bot_id: int):
         key = Bot.__redis_key_for_bot_token(bot_id)
-        redis_client.delete(key)
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.delete(key)
+        _invalidate(pipe, key)
+        await pipe.execute()
 
     @staticmethod
     def __redis_key_for_bot_token(bot_id: int) -> str:
         return f"bots:{bot_id}:token"
 
 
+class BotLocale:
+    """Cache for bot locale."""
+
+    @staticmethod
+    async def set(bot_id: int, locale: str) -> None:
+        key = f"bots:{bot_id}:locale"
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.set(key, locale, ex=REDIS_CACHE_TTL)
+        _invalidate(pipe, key)
+        await pipe.execute()
+
+    @staticmethod
+    async def fill(bot_id: int, locale: str, version: int) -> None:
+        """Cache a locale loaded from the database after a miss."""
+        key = f"bots:{bot_id}:locale"
+        await redis_client.set(key, locale, ex=REDIS_CACHE_TTL, nx=True)
+        _local_fill(key, locale, version)
+
+    @staticmethod
+    async def get(bot_id: int) -> str | None:
+        key = f"bots:{bot_id}:locale"
+        cached = _local_get("bot_locale", key)
+        if cached is not None:
+            return cached
+        version = cache_version()
+        locale = await redis_client.get(key)
+        if locale is not None:
+            _local_fill(key, locale, version)
+        return locale
+
+    @staticmethod
+    async def delete(bot_id: int) -> None:
+        key = f"bots:{bot_id}:locale"
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.delete(key)
+        _invalidate(pipe, key)
+        await pipe.execute()
+
+
+class WebhookContext:
+    """Everything the webhook handler needs for a bot user, read in one round trip.
+
+    Bot-level values reuse the ``Bot`` token and ``BotLocale`` keys; the
+    user-level part is a JSON document with a short TTL because projects are
+    managed outside of this service.
+    """
+
+    @staticmethod
+    def _user_key(bot_id: int, user_id: int) -> str:
+        return f"bots:{bot_id}:users:{user_id}:context"
+
+    @staticmethod
+    async def get(bot_id: int, user_id: int) -> Tuple[str | None, str | None, dict | None]:
+        keys = (
+            f"bots:{bot_id}:token",
+            f"bots:{bot_id}:locale",
+            WebhookContext._user_key(bot_id, user_id),
+        )
+        cached = tuple(local_cache.get(key) for key in keys)
+        if None not in cached:
+            LOCAL_CACHE_REQUESTS.labels(entity="webhook_context", result="hit").inc()
+            return cached
+        LOCAL_CACHE_REQUESTS.labels(entity="webhook_context", result="miss").inc()
+
+        version = cache_version()
+        pipe = redis_client.pipeline(transaction=False)
+        for key in keys:
+            pipe.get(key)
+        token, locale, user = await pipe.execute()
+        values = (
+            cipher.decrypt(token).decode() if token else None,
+            locale,
+            json.loads(user) if user else None,
+        )
+        for key, value in zip(keys, values):
+            if value is not None:
+                _local_fill(key, value, version)
+        return values
+
+    @staticmethod
+    async def fill(bot_id: int, user_id: int, token: str, locale: str, user: dict, version: int) -> None:
+        """Cache a context loaded from the database after a miss.
+
+        Keys written in the meantime are newer than what was loaded and are
+        kept.
+        """
+        keys = (f"bots:{bot_id}:token", f"bots:{bot_id}:locale", WebhookContext._user_key(bot_id, user_id))
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.set(keys[0], cipher.encrypt(token.encode()), ex=REDIS_CACHE_TTL, nx=True)
+        pipe.set(keys[1], locale, ex=REDIS_CACHE_TTL, nx=True)
+        pipe.set(keys[2], json.dumps(user), ex=WEBHOOK_CONTEXT_TTL, nx=True)
+        await pipe.execute()
+        for key, value in zip(keys, (token, locale, user)):
+            _local_fill(key, value, version)
+
+    @staticmethod
+    async def invalidate(bot_id: int, user_id: int) -> None:
+        key = WebhookContext._user_key(bot_id, user_id)
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.delete(key)
+        _invalidate(pipe, key)
+        await pipe.execute()
+
+
 class BotUserStatus:
     """Cache for bot user status and ownership."""
 
     @staticmethod
-    def set(bot_id: int, user_id: int, is_active: bool, is_owner: bool) -> None:
+    async def set(bot_id: int, user_id: int, is_active: bool, is_owner: bool) -> None:
         key = BotUserStatus.__redis_key(bot_id, user_id)
-        redis_client.hset(
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.hset(
             key,
             mapping={"is_active": int(is_active), "is_owner": int(is_owner)},
         )
-        redis_client.expire(key, int(eval(REDIS_CACHE_TIME)))
+        pipe.expire(key, REDIS_CACHE_TTL)
+        _invalidate(pipe, key)
+        await pipe.execute()
 
     @staticmethod
-    def get(bot_id: int, user_id: int):
+    async def fill(bot_id: int, user_id: int, is_active: bool, is_owner: bool, version: int) -> None:
+        """Cache a status loaded from the database after a miss.
+
+        HSETNX keeps fields written by a concurrent update.
+        """
         key = BotUserStatus.__redis_key(bot_id, user_id)
-        data = redis_client.hgetall(key)
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.hsetnx(key, "is_active", int(is_active))
+        pipe.hsetnx(key, "is_owner", int(is_owner))
+        pipe.expire(key, REDIS_CACHE_TTL)
+        await pipe.execute()
+        _local_fill(key, {"is_active": bool(is_active), "is_owner": bool(is_owner)}, version)
+
+    @staticmethod
+    async def get(bot_id: int, user_id: int):
+        key = BotUserStatus.__redis_key(bot_id, user_id)
+        cached = _local_get("bot_user_status", key)
+        if cached is not None:
+            return cached
+        version = cache_version()
+        data = await redis_client.hgetall(key)
         if not data:
             return None
-        return {
+        status = {
             "is_active": bool(int(data.get("is_active", "0"))),
             "is_owner": bool(int(data.get("is_owner", "0"))),
         }
+        _local_fill(key, status, version)
+        return status
 
     @staticmethod
-    def delete(bot_id: int, user_id: int) -> None:
+    async def delete(bot_id: int, user_id: int) -> None:
         key = BotUserStatus.__redis_key(bot_id, user_id)
-        redis_client.delete(key)
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.delete(key)
+        _invalidate(pipe, key)
+        await pipe.execute()
 
     @staticmethod
     def __redis_key(bot_id: int, user_id: int) -> str:
@@ -72,34 +358,64 @@ class BotOwner:
     """Cache for bot owner id."""
 
     @staticmethod
-    def set(bot_id: int, user_id: int) -> None:
+    async def set(bot_id: int, user_id: int) -> None:
         key = f"bots:{bot_id}:owner"
-        redis_client.set(key, user_id, ex=int(eval(REDIS_CACHE_TIME)))
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.set(key, user_id, ex=REDIS_CACHE_TTL)
+        _invalidate(pipe, key)
+        await pipe.execute()
 
     @staticmethod
-    def get(bot_id: int):
+    async def fill(bot_id: int, user_id: int, version: int) -> None:
+        """Cache an owner loaded from the database after a miss."""
         key = f"bots:{bot_id}:owner"
-        value = redis_client.get(key)
-        return int(value) if value is not None else None
+        await redis_client.set(key, user_id, ex=REDIS_CACHE_TTL, nx=True)
+        _local_fill(key, int(user_id), version)
+
+    @staticmethod
+    async def get(bot_id: int):
+        key = f"bots:{bot_id}:owner"
+        cached = _local_get("bot_owner", key)
+        if cached is not None:
+            return cached
+        version = cache_version()
+        value = await redis_client.get(key)
+        if value is None:
+            return None
+        _local_fill(key, int(value), version)
+        return int(value)
 
     @staticmethod
-    def delete(bot_id: int) -> None:
+    async def delete(bot_id: int) -> None:
         key = f"bots:{bot_id}:owner"
-        redis_client.delete(key)
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.delete(key)
+        _invalidate(pipe, key)
+        await pipe.execute()
 
 
 class BotUsersPage:
     """Cache for paginated users list in admin panel."""
 
     @staticmethod
-    def _key(bot_id: int, page: int, per_page: int, search: str | None, is_active: bool | None) -> str:
+    def _key(bot_id: int, generation: int, page: int, per_page: int, search: str | None, is_active: bool | None) -> str:
         search_part = search or ""
         active_part = "any" if is_active is None else str(int(is_active))
-        return f"bots:{bot_id}:users-page:{page}:{per_page}:{search_part}:{active_part}"
+        return f"bots:{bot_id}:users-page:{generation}:{page}:{per_page}:{search_part}:{active_part}"
 
     @staticmethod
-    def set(
+    def _generation_key(bot_id: int) -> str:
+        return f"bots:{bot_id}:users-page-gen"
+
+    @staticmethod
+    async def generation(bot_id: int) -> int:
+        """Current page generation; read it before querying the database."""
+        return int(await redis_client.get(BotUsersPage._generation_key(bot_id)) or 0)
+
+    @staticmethod
+    async def set(
         bot_id: int,
+        generation: int,
         page: int,
         per_page: int,
         search: str | None,
@@ -107,37 +423,75 @@ class BotUsersPage:
         users: list,
         total: int,
     ) -> None:
-        key = BotUsersPage._key(bot_id, page, per_page, search, is_active)
+        key = BotUsersPage._key(bot_id, generation, page, per_page, search, is_active)
         value = json.dumps({"users": users, "total": total})
-        redis_client.set(key, value, ex=int(eval(REDIS_CACHE_TIME)))
+        await redis_client.set(key, value, ex=REDIS_CACHE_TTL)
 
     @staticmethod
-    def get(
+    async def get(
         bot_id: int,
+        generation: int,
         page: int,
         per_page: int,
         search: str | None,
         is_active: bool | None,
     ):
-        key = BotUsersPage._key(bot_id, page, per_page, search, is_active)
-        value = redis_client.get(key)
+        key = BotUsersPage._key(bot_id, generation, page, per_page, search, is_active)
+        value = await redis_client.get(key)
         if not value:
             return None
         data = json.loads(value)
         return data.get("users"), data.get("total")
 
     @staticmethod
-    def invalidate(bot_id: int) -> None:
-        pattern = f"bots:{bot_id}:users-page:*"
-        for key in redis_client.scan_iter(pattern):
-            redis_client.delete(key)
+    async def invalidate(bot_id: int) -> None:
+        """Move the bot to a new generation; old pages are never read again
+        and expire on their own."""
+        await redis_client.incr(BotUsersPage._generation_key(bot_id))
+
+
+async def forget_user(user_id: int, bot_ids) -> None:
+    """Drop every per-bot cache entry of a deleted user in one round trip."""
+    if not bot_ids:
+        return
+    keys = []
+    pipe = redis_client.pipeline(transaction=False)
+    for bot_id in bot_ids:
+        keys += [
+            f"bots:{bot_id}:users:{user_id}:status",
+            WebhookContext._user_key(bot_id, user_id),
+            f"bots:{bot_id}:owner",
+        ]
+        pipe.incr(BotUsersPage._generation_key(bot_id))
+    pipe.delete(*keys)
+    _invalidate(pipe, *keys)
+    await pipe.execute()
 
 
 class Message:
-    """Cache message for sending later, including attachments."""
+    """Cache message for sending later, including attachments.
+
+    Each message is one hash so it is written, read and removed in a single
+    round trip.
+    """
+
+    @staticmethod
+    def _key(bot_id: int, user_id: int, message_id: int) -> str:
+        return f"bots:{bot_id}:users:{user_id}:messages:{message_id}"
+
+    @staticmethod
+    def _decode(data: dict) -> Optional[Tuple[str, str, list, str | None]]:
+        if "text" not in data or "participant" not in data:
+            return None
+        return (
+            data["text"],
+            data["participant"],
+            json.loads(data.get("attachments") or "[]"),
+            data.get("message_type"),
+        )
 
     @staticmethod
-    def set(
+    async def set(
         bot_id: int,
         user_id: int,
         message_id: int,
@@ -146,64 +500,263 @@ class Message:
         attachments: list | None = None,
         message_type: str | None = None,
     ) -> None:
-        key = f"bots:{bot_id}:users:{user_id}:messages:{message_id}:text"
-        redis_client.set(key, message, ex=int(eval(REDIS_CACHE_TIME)))
-        key = f"bots:{bot_id}:users:{user_id}:messages:{message_id}:participant"
-        redis_client.set(key, participant, ex=int(eval(REDIS_CACHE_TIME)))
-        key = f"bots:{bot_id}:users:{user_id}:messages:{message_id}:attachments"
-        redis_client.set(key, json.dumps(attachments or []), ex=int(eval(REDIS_CACHE_TIME)))
-        key = f"bots:{bot_id}:users:{user_id}:messages:{message_id}:message_type"
+        key = Message._key(bot_id, user_id, message_id)
+        mapping = {
+            "text": message,
+            "participant": participant,
+            "attachments": json.dumps(attachments or []),
+        }
         if message_type is not None:
-            redis_client.set(key, message_type, ex=int(eval(REDIS_CACHE_TIME)))
-        else:
-            redis_client.delete(key)
+            mapping["message_type"] = message_type
+        pipe = redis_client.pipeline()
+        pipe.delete(key)
+        pipe.hset(key, mapping=mapping)
+        pipe.expire(key, REDIS_CACHE_TTL)
+        await pipe.execute()
 
     @staticmethod
-    def get(
+    async def get(
         bot_id: int,
         user_id: int,
         message_id: int,
     ) -> Optional[Tuple[str, str, list, str | None]]:
-        key = f"bots:{bot_id}:users:{user_id}:messages:{message_id}:text"
-        text = redis_client.get(key)
-
-        key = f"bots:{bot_id}:users:{user_id}:messages:{message_id}:participant"
-        participant = redis_client.get(key)
-
-        key = f"bots:{bot_id}:users:{user_id}:messages:{message_id}:attachments"
-        attachments_raw = redis_client.get(key)
-        attachments = json.loads(attachments_raw) if attachments_raw else []
-
-        key = f"bots:{bot_id}:users:{user_id}:messages:{message_id}:message_type"
-        message_type = redis_client.get(key)
+        return Message._decode(
+            await redis_client.hgetall(Message._key(bot_id, user_id, message_id))
+        )
 
-        return (
-            text,
-            participant,
-            attachments,
-            message_type,
-        ) if text is not None and participant is not None else None
+    @staticmethod
+    async def pop(
+        bot_id: int,
+        user_id: int,
+        message_id: int,
+    ) -> Optional[Tuple[str, str, list, str | None]]:
+        """Atomically read and remove the cached message."""
+        key = Message._key(bot_id, user_id, message_id)
+        pipe = redis_client.pipeline()
+        pipe.hgetall(key)
+        pipe.delete(key)
+        data, _ = await pipe.execute()
+        return Message._decode(data)
 
     @staticmethod
-    def delete(bot_id: int, user_id: int, message_id: int) -> None:
-        for suffix in ["text", "participant", "attachments", "message_type"]:
-            key = f"bots:{bot_id}:users:{user_id}:messages:{message_id}:{suffix}"
-            redis_client.delete(key)
+    async def delete(bot_id: int, user_id: int, message_id: int) -> None:
+        await redis_client.delete(Message._key(bot_id, user_id, message_id))
 
 class Session:
 
     @staticmethod
-    def set(bot_id: int, user_id: int, session_id: str, project_id: int) -> None:
+    async def set(bot_id: int, user_id: int, session_id: str, project_id: int) -> None:
         key = f"bots:{bot_id}:users:{user_id}:session:{session_id}:project"
-        redis_client.set(key, project_id, ex=int(eval(REDIS_CACHE_TIME)))
+        await redis_client.set(key, project_id, ex=REDIS_CACHE_TTL)
     
     @staticmethod
-    def get(bot_id: int, user_id: int, session_id: str) -> int | None:
+    async def get(bot_id: int, user_id: int, session_id: str) -> int | None:
         key = f"bots:{bot_id}:users:{user_id}:session:{session_id}:project"
-        project_id = redis_client.get(key)
+        project_id = await redis_client.get(key)
         return project_id if project_id is not None else None
 
     @staticmethod
-    def delete(bot_id: int, user_id: int, session_id: str) -> None:
+    async def delete(bot_id: int, user_id: int, session_id: str) -> None:
         key = f"bots:{bot_id}:users:{user_id}:session:{session_id}:project"
-        redis_client.delete(key)
+        await redis_client.delete(key)
+
+
+class MediaFileId:
+    """Telegram file_id of media a bot already sent, by URL.
+
+    Stored with the validator (ETag, or Last-Modified and size) the file had
+    when it was sent and the time that was last confirmed; callers compare
+    it with the current one, so a changed file at the same URL is uploaded
+    again.
+    """
+
+    @staticmethod
+    def _key(bot_key: str, file_url: str) -> str:
+        digest = hashlib.sha256(file_url.encode()).hexdigest()
+        return f"bots:{bot_key}:media:{digest}"
+
+    @staticmethod
+    async def set(bot_key: str, file_url: str, validator: str, file_id: str) -> None:
+        key = MediaFileId._key(bot_key, file_url)
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.delete(key)
+        pipe.hset(key, mapping={"validator": validator, "file_id": file_id, "checked_at": time.time()})
+        pipe.expire(key, MEDIA_FILE_ID_TTL)
+        await pipe.execute()
+
+    @staticmethod
+    async def get(bot_key: str, file_url: str) -> tuple[str, str, float] | None:
+        """Return ``(validator, file_id, checked_at)`` or None."""
+        cached = await redis_client.hgetall(MediaFileId._key(bot_key, file_url))
+        if not cached.get("file_id"):
+            return None
+        return cached.get("validator", ""), cached["file_id"], float(cached.get("checked_at") or 0)
+
+    @staticmethod
+    async def touch(bot_key: str, file_url: str) -> None:
+        """Record that the validator still matches the file behind the URL."""
+        key = MediaFileId._key(bot_key, file_url)
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.hset(key, "checked_at", time.time())
+        pipe.expire(key, MEDIA_FILE_ID_TTL)
+        await pipe.execute()
+
+    @staticmethod
+    async def delete(bot_key: str, file_url: str) -> None:
+        await redis_client.delete(MediaFileId._key(bot_key, file_url))
+
+
+class MediaDomainStrategy:
+    """Last media send strategy ("url" or "upload") that worked per domain.
+
+    Entries expire so a domain that became reachable is probed again.
+    """
+
+    @staticmethod
+    async def set(domain: str, strategy: str) -> None:
+        await redis_client.set(f"media:domains:{domain}:strategy", strategy, ex=MEDIA_STRATEGY_TTL)
+
+    @staticmethod
+    async def get(domain: str) -> str | None:
+        return await redis_client.get(f"media:domains:{domain}:strategy")
+
+
+class ContactVariables:
+    """Every variable of a contact as one hash.
+
+    A hash is only trusted once it carries the COMPLETE field, i.e. it was
+    filled from the whole Mongo document; a name missing from it then is
+    known not to exist, so misses are cached too.
+    """
+
+    COMPLETE = "\x00complete"
+
+    @staticmethod
+    def _key(bot_id: int, user_id: int) -> str:
+        return f"bots:{bot_id}:users:{user_id}:variables"
+
+    @staticmethod
+    async def get(bot_id: int, user_id: int) -> Optional[dict]:
+        key = ContactVariables._key(bot_id, user_id)
+        cached = _local_get("contact_variables", key)
+        if cached is not None:
+            return cached
+        version = cache_version()
+        variables = await redis_client.hgetall(key)
+        if variables.pop(ContactVariables.COMPLETE, None) is None:
+            return None
+        _local_fill(key, variables, version)
+        return variables
+
+    @staticmethod
+    async def fill(bot_id: int, user_id: int, variables: dict) -> None:
+        """Cache the full variable map read from Mongo.
+
+        HSETNX keeps fields written through by a concurrent update, which are
+        newer than what this reader loaded.
+        """
+        key = ContactVariables._key(bot_id, user_id)
+        pipe = redis_client.pipeline()
+        for name, value in variables.items():
+            pipe.hsetnx(key, name, value)
+        pipe.hset(key, ContactVariables.COMPLETE, 1)
+        pipe.expire(key, CONTACT_VARIABLES_TTL)
+        await pipe.execute()
+
+    @staticmethod
+    async def update(bot_id: int, user_id: int, variables: dict) -> None:
+        """Write updated values through; an uncached contact stays incomplete."""
+        key = ContactVariables._key(bot_id, user_id)
+        pipe = redis_client.pipeline()
+        pipe.hset(key, mapping={name: str(value) for name, value in variables.items()})
+        pipe.expire(key, CONTACT_VARIABLES_TTL)
+        _invalidate(pipe, key)
+        await pipe.execute()
+
+
+class Broadcast:
+    """Progress of a broadcast job and the result of each recipient.
+
+    Counters live in one hash and results in another keyed by user id, so
+    every send costs a single pipelined round trip.
+    """
+
+    @staticmethod
+    def _key(job_id: str) -> str:
+        return f"broadcasts:{job_id}"
+
+    @staticmethod
+    def _results_key(job_id: str) -> str:
+        return f"broadcasts:{job_id}:results"
+
+    @staticmethod
+    async def create(job_id: str, bot_id: int, total: int) -> None:
+        pipe = redis_client.pipeline()
+        pipe.hset(
+            Broadcast._key(job_id),
+            mapping={
+                "bot_id": bot_id,
+                "status": "running",
+                "total": total,
+                "sent": 0,
+                "failed": 0,
+                "started_at": time.time(),
+                "heartbeat_at": time.time(),
+            },
+        )
+        pipe.expire(Broadcast._key(job_id), BROADCAST_TTL)
+        await pipe.execute()
+
+    @staticmethod
+    async def record(job_id: str, user_id: int, ok: bool, detail: str | None = None) -> None:
+        key, results_key = Broadcast._key(job_id), Broadcast._results_key(job_id)
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.hincrby(key, "sent" if ok else "failed", 1)
+        pipe.hset(key, "heartbeat_at", time.time())
+        pipe.hset(
+            results_key,
+            user_id,
+            json.dumps({"status": "sent" if ok else "failed", "detail": detail}),
+        )
+        pipe.expire(results_key, BROADCAST_TTL)
+        await pipe.execute()
+
+    @staticmethod
+    async def finish(job_id: str, status: str, total: int | None = None) -> None:
+        mapping = {"status": status, "finished_at": time.time()}
+        if total is not None:
+            mapping["total"] = total
+        await redis_client.hset(Broadcast._key(job_id), mapping=mapping)
+
+    @staticmethod
+    async def get(job_id: str) -> Optional[dict]:
+        data = await redis_client.hgetall(Broadcast._key(job_id))
+        if not data:
+            return None
+        status = data["status"]
+        # The worker running a job records every send; if it stopped doing
+        # so, it is gone (restart, crash) and the job will not resume.
+        heartbeat = float(data.get("heartbeat_at", data["started_at"]))
+        if status == "running" and time.time() - heartbeat > BROADCAST_STALE_AFTER:
+            status = "interrupted"
+        return {
+            "jobId": job_id,
+            "botId": int(data["bot_id"]),
+            "status": status,
+            "total": int(data["total"]),
+            "sent": int(data["sent"]),
+            "failed": int(data["failed"]),
+            "startedAt": float(data["started_at"]),
+            "finishedAt": float(data["finished_at"]) if "finished_at" in data else None,
+        }
+
+    @staticmethod
+    async def results(job_id: str, cursor: int = 0, count: int = 100) -> Tuple[int, list]:
+        """Return the next HSCAN cursor and a page of recipient results."""
+        cursor, data = await redis_client.hscan(
+            Broadcast._results_key(job_id), cursor=cursor, count=count
+        )
+        return cursor, [
+            {"userId": int(user_id), **json.loads(result)}
+            for user_id, result in data.items()
+        ]
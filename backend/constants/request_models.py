@@ -1,4 +1,4 @@
-from pydantic import BaseModel, SecretStr
+from pydantic import BaseModel, SecretStr, model_validator
 from typing import Optional, List, Dict, Any
 
 class ExtraData(BaseModel):
@@ -48,6 +48,25 @@ class SendSystemMessageRequest(BaseModel):
     chat: Chat
     text: str
 
+class BroadcastFilter(BaseModel):
+    activeOnly: bool = True
+    project: Optional[str] = None
+    search: Optional[str] = None
+
+class BroadcastRequest(BaseModel):
+    text: Optional[str] = None
+    file: Optional[File] = None
+    caption: Optional[str] = None
+    quickReplies: Optional[List[List[QuickReply]]] = None
+    inlineButtons: Optional[List[List[InlineButton]]] = None
+    filter: BroadcastFilter = BroadcastFilter()
+
+    @model_validator(mode="after")
+    def _text_or_file(self):
+        if bool(self.text) == bool(self.file):
+            raise ValueError("Exactly one of text or file is required")
+        return self
+
 class UpdateContactDataRequest(BaseModel):
     externalId: str
     data: Dict[str, Any]
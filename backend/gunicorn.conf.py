@@ -0,0 +1,13 @@
+import os
+
+from prometheus_client import multiprocess
+
+bind = "0.0.0.0:8000"
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+
+def child_exit(server, worker):
+    # Drop the dead worker's live gauges; its counters and histograms stay
+    # in the merged totals.
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,47 @@
+import asyncio
+import os
+import signal
+import socket
+
+from prometheus_client import start_http_server
+
+import constants.redis_models as rdb
+import services.db as db
+import services.mongo_db as mdb
+from config.settings import OUTBOUND_METRICS_PORT
+from constants.prometheus_models import scrape_registry
+from services.logging_setup import configure_logging
+import services.telegram_client as telegram_client
+from services.outbound_queue import run_worker
+
+
+async def main() -> None:
+    configure_logging()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    consumer = f"{socket.gethostname()}-{os.getpid()}"
+    # The worker serves no HTTP API, so its queue, retry and dead-letter
+    # metrics get an endpoint of their own.
+    metrics_server = None
+    if OUTBOUND_METRICS_PORT:
+        metrics_server, _ = start_http_server(OUTBOUND_METRICS_PORT, registry=scrape_registry)
+    await telegram_client.start()
+    rdb.start_invalidation_listener()
+    mdb.log_writer.start()
+    try:
+        await run_worker(consumer, stop)
+    finally:
+        await mdb.log_writer.stop()
+        await rdb.close()
+        await telegram_client.close()
+        await db.async_engine.dispose()
+        await asyncio.to_thread(mdb.close)
+        if metrics_server is not None:
+            metrics_server.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
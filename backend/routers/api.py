@@ -3,7 +3,7 @@ from fastapi import APIRouter
 from fastapi.exceptions import HTTPException
 from fastapi.responses import JSONResponse, Response
 
-from constants.request_models import IntegrateRequest
+from constants.request_models import IntegrateRequest, BroadcastRequest
 from constants.response_models import (
     IntegrationResponse,
     UsersPageResponse,
@@ -17,6 +17,9 @@ from config.settings import (
 import httpx
 import services.helper_functions as hf
 import services.db as db
+import services.outbound_queue as outbound_queue
+import services.broadcast as broadcast
+import constants.redis_models as rdb
 from services.webhook_server import get_bot_name, get_bot_id, set_webhook
 from services.logging_setup import interaction_logger
 
@@ -45,14 +48,14 @@ async def integrate_new_user(request: IntegrateRequest):
     if not bot_id or not bot_name:
         raise HTTPException(status_code=401, detail="Invalid bot token")
 
-    bot_exists = db.bot_exists(bot_id)
+    bot_exists = await db.bot_exists(bot_id)
 
     if bot_exists:
-        stored_name, pass_uuid, _, stored_locale = db.get_bot_auth(bot_id)
+        stored_name, pass_uuid, _, stored_locale = await db.get_bot_auth(bot_id)
         bot_name = stored_name
         locale = request.locale or stored_locale or "en"
         if locale != stored_locale:
-            db.update_bot_locale(bot_id, locale)
+            await db.update_bot_locale(bot_id, locale)
     else:
         pass_uuid = hf.generate_uuid()
 
@@ -101,9 +104,9 @@ async def integrate_new_user(request: IntegrateRequest):
             )
 
         if bot_exists:
-            db.update_bot_web_url(bot_id, web_url)
+            await db.update_bot_web_url(bot_id, web_url)
         else:
-            db.create_new_bot(
+            await db.create_new_bot(
                 bot_id,
                 token,
                 bot_name,
@@ -132,7 +135,7 @@ async def integrate_new_user(request: IntegrateRequest):
 async def bots_by_owner(owner_uuid: str):
     """Return list of bots for a given owner."""
     try:
-        infos = db.get_bots_by_owner_uuid(owner_uuid)
+        infos = await db.get_bots_by_owner_uuid(owner_uuid)
         return [
             {
                 "botId": bot_id,
@@ -152,7 +155,7 @@ async def bots_by_owner(owner_uuid: str):
 )
 async def is_bot_verified(bot_id: int):
     """Return verification status of the bot."""
-    return db.is_bot_verified(bot_id)
+    return await db.is_bot_verified(bot_id)
 
 
 @router.get(
@@ -170,7 +173,7 @@ async def list_bot_users(
 ):
     """Return paginated users for the given bot."""
     try:
-        users, total = db.get_bot_users(
+        users, total = await db.get_bot_users(
             bot_id=bot_id,
             page=page,
             per_page=per_page,
@@ -190,7 +193,7 @@ async def list_bot_users(
 async def owner_name(bot_id: int) -> str:
     """Return bot owner's display name."""
     try:
-        owner_name = db.get_owner_name(bot_id)
+        owner_name = await db.get_owner_name(bot_id)
 
         return owner_name
     except Exception as e:
@@ -204,7 +207,7 @@ async def owner_name(bot_id: int) -> str:
 async def auth_info(bot_id: int):
     """Return bot name, pass token and admin panel url."""
     try:
-        bot_name, pass_uuid, web_url, _ = db.get_bot_auth(bot_id)
+        bot_name, pass_uuid, web_url, _ = await db.get_bot_auth(bot_id)
 
         return {"botName": bot_name, "passUiid": pass_uuid, "webUrl": web_url}
     except Exception as e:
@@ -218,11 +221,11 @@ async def auth_info(bot_id: int):
 )
 async def refresh_web_url(bot_id: int, locale: Optional[str] = None):
     """Fetch a new admin panel URL for the bot."""
-    if not db.bot_exists(bot_id):
+    if not await db.bot_exists(bot_id):
         interaction_logger.error(f"Bot {bot_id} not found for refresh")
         raise HTTPException(status_code=404, detail="Bot not found")
 
-    bot_name, pass_uuid, _, stored_locale = db.get_bot_auth(bot_id)
+    bot_name, pass_uuid, _, stored_locale = await db.get_bot_auth(bot_id)
     locale = locale or stored_locale or "en"
 
     integration_request = {
@@ -258,7 +261,7 @@ async def refresh_web_url(bot_id: int, locale: Optional[str] = None):
             )
 
         web_url = data["webUrl"]
-        db.update_bot_web_url(bot_id, web_url)
+        await db.update_bot_web_url(bot_id, web_url)
         interaction_logger.info(
             f"Web URL refreshed for bot_id={bot_id} url={web_url}"
         )
@@ -278,11 +281,11 @@ async def refresh_web_url(bot_id: int, locale: Optional[str] = None):
 )
 async def generate_invite(bot_id: int):
     """Generate a single-use pass UUID for inviting a user."""
-    if not db.bot_exists(bot_id):
+    if not await db.bot_exists(bot_id):
         interaction_logger.error(f"Bot {bot_id} not found for invite")
         raise HTTPException(status_code=404, detail="Bot not found")
     try:
-        new_uuid = db.create_pass_token(bot_id)
+        new_uuid = await db.create_pass_token(bot_id)
         interaction_logger.info(
             f"Invite token created for bot_id={bot_id} uuid={new_uuid}"
         )
@@ -299,7 +302,7 @@ async def generate_invite(bot_id: int):
 async def logout_owner(bot_id: int):
     """Log out owner from admin panel."""
     try:
-        db.bot_set_verified(bot_id, False)
+        await db.bot_set_verified(bot_id, False)
         interaction_logger.info(f"Owner logged out for bot_id={bot_id}")
         return {"botId": bot_id, "verified": False}
     except Exception as e:
@@ -314,7 +317,7 @@ async def logout_owner(bot_id: int):
 async def switch_activness(bot_id: int, user_id: int, new_status: bool):
     """Activate or deactivate a user."""
     try:
-        db.set_botuser_status(bot_id, user_id, new_status)
+        await db.set_botuser_status(bot_id, user_id, new_status)
         interaction_logger.info(
             f"User {user_id} status for bot {bot_id} set to {new_status}"
         )
@@ -333,7 +336,7 @@ async def switch_activness(bot_id: int, user_id: int, new_status: bool):
 async def delete_user(bot_id: int, user_id: int):
     """Delete a user from the database."""
     try:
-        db.delete_user_by_id(user_id)
+        await db.delete_user_by_id(user_id)
         interaction_logger.info(
             f"Deleted user {user_id} from bot {bot_id}"
         )
@@ -343,3 +346,69 @@ async def delete_user(bot_id: int, user_id: int):
             f"Failed to delete user {user_id} from bot {bot_id}: {e}"
         )
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get(
+    "/outbound/dead-letters",
+    description="List outbound messages that exhausted their retries",
+)
+async def list_dead_letters(count: int = 100, after: Optional[str] = None):
+    """Return dead-lettered outbound jobs, oldest first."""
+    try:
+        return {"items": await outbound_queue.dead_letters(count, after)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post(
+    "/outbound/dead-letters/{entry_id}/replay",
+    description="Put a dead-lettered outbound message back on the queue",
+)
+async def replay_dead_letter(entry_id: str):
+    """Re-enqueue a dead-lettered job with a fresh retry budget."""
+    new_id = await outbound_queue.replay(entry_id)
+    if new_id is None:
+        raise HTTPException(status_code=404, detail="Dead letter not found")
+    interaction_logger.info(f"Replayed outbound dead letter {entry_id} as {new_id}")
+    return {"id": new_id}
+
+
+@router.post(
+    "/bot/{bot_id}/broadcast",
+    status_code=202,
+    description=(
+        "Send one message to every user of the bot matching the filter. "
+        "Returns a job id to poll for progress."),
+)
+async def start_broadcast(bot_id: int, request: BroadcastRequest):
+    """Start a broadcast job and return its id and recipient count."""
+    if not await db.bot_exists(bot_id):
+        interaction_logger.error(f"Bot {bot_id} not found for broadcast")
+        raise HTTPException(status_code=404, detail="Bot not found")
+    try:
+        return await broadcast.start(bot_id, request)
+    except Exception as e:
+        interaction_logger.error(f"Broadcast start failed for bot_id={bot_id}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get(
+    "/broadcasts/{job_id}",
+    description="Return progress of a broadcast job",
+)
+async def broadcast_progress(job_id: str):
+    """Return status and sent/failed counters of the job."""
+    progress = await rdb.Broadcast.get(job_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Broadcast not found")
+    return progress
+
+
+@router.get(
+    "/broadcasts/{job_id}/results",
+    description="Page through per-recipient results of a broadcast job",
+)
+async def broadcast_results(job_id: str, cursor: int = 0, count: int = 100):
+    """Return recipient results; pass the returned cursor until it is 0."""
+    next_cursor, items = await rdb.Broadcast.results(job_id, cursor, count)
+    return {"cursor": next_cursor, "items": items}
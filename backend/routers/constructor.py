@@ -1,12 +1,16 @@
-from fastapi import APIRouter, Request
+from typing import List, Optional
+
+from fastapi import APIRouter, Query, Request
 from fastapi.responses import JSONResponse
 from constants.request_models import SendTextMessageRequest, SendMediaMessageRequest, SendSystemMessageRequest, UpdateContactDataRequest
-from config.settings import SCHEME
+from config.settings import SCHEME, OUTBOUND_QUEUE_ENABLED
 import services.sender_adapter as sa
+import services.outbound as outbound
+import services.outbound_queue as outbound_queue
 import services.db as db
-from services.logging_setup import interaction_logger
+import services.contact_variables as contact_variables
+from services.logging_setup import interaction_logger, log_event
 import constants.redis_models as rdb
-import services.mongo_db as mdb
 import json
 import asyncio
 
@@ -22,7 +26,7 @@ async def get_schema():
 async def list_messengers():
     """Return all users grouped as messenger contacts."""
     try:
-        bot_users = db.get_all_bot_users()
+        bot_users = await db.get_all_bot_users()
         items = [
             {
                 "externalType": "employees",
@@ -50,6 +54,14 @@ async def get_status(id: int):
     }
 
 
+async def _send(job: dict) -> dict:
+    """Queue the job when the outbound queue is enabled, otherwise send it now."""
+    if OUTBOUND_QUEUE_ENABLED:
+        await outbound_queue.enqueue(job)
+        return {"status_code": 200, "body": {"queued": True}}
+    return await outbound.deliver(job)
+
+
 @router.post('/{id}/sendTextMessage', description="Send a text message to a chat")
 async def send_message(id: int, request: SendTextMessageRequest):
     """Send text with optional buttons and quick replies."""
@@ -57,75 +69,14 @@ async def send_message(id: int, request: SendTextMessageRequest):
         messenger_id = id
         #TODO Remove 
         if int(id) == 12:
-            messenger_id = '7922062448'
-        interaction_logger.info(
-            f"Sending text message to {request.chat.contact} via bot {messenger_id}"
-        )
-        token = db.get_bot_token(messenger_id)
+            messenger_id = 7922062448
+        log_event("CONSTRUCTOR_TEXT", bot_id=messenger_id, chat_id=request.chat.contact)
         chat_id = request.chat.contact
-        text = request.text
-        inline_buttons = request.inlineButtons
-        quick_replies = request.quickReplies
-
-        reply_keyboard = None
-        if quick_replies:
-            reply_keyboard = [
-                [
-                    {
-                        **{"text": qr.text},
-                        **({"request_contact": True} if qr.type.lower() == "phone" else {}),
-                        **({"request_location": True} if qr.type.lower() in {"geolocation", "location"} else {}),
-                    }
-                    for qr in row
-                ]
-                for row in quick_replies
-            ]
-
-        response = await sa.send_message(
-            token,
-            chat_id,
-            text,
-            inline_buttons=inline_buttons,
-            reply_keyboard=reply_keyboard,
-            remove_keyboard=not inline_buttons and not quick_replies,
-            bot_id=messenger_id,
-        )
 
-        sent_payload = {
-            "chat_id": chat_id,
-            "text": text,
-            "parse_mode": "HTML",
-        }
-        if not inline_buttons and not quick_replies:
-            sent_payload["reply_markup"] = {"remove_keyboard": True}
-        elif inline_buttons:
-            sent_payload["reply_markup"] = {"inline_keyboard": inline_buttons}
-        elif reply_keyboard:
-            sent_payload["reply_markup"] = {
-                "keyboard": reply_keyboard,
-                "resize_keyboard": True,
-                "one_time_keyboard": True,
-            }
-
-        asyncio.create_task(
-            asyncio.to_thread(
-                mdb.insert_message,
-                source="ConstructorMessages",
-                bot_id=int(messenger_id),
-                user_id=int(chat_id),
-                message_id=response.get("body", {}).get("result", {}).get("message_id", 0),
-                participant_name=request.chat.operator or "",
-                text=text,
-                attachments=[],
-                received_body=request.model_dump(),
-                sent_body=sent_payload,
-            )
-        )
+        response = await _send(outbound.text_job(messenger_id, request))
 
         if response["status_code"] == 200:
-            interaction_logger.info(
-                f"Text message sent to {chat_id} via bot {messenger_id}"
-            )
+            log_event("CONSTRUCTOR_TEXT_SENT", bot_id=messenger_id, chat_id=chat_id)
             return {"externalId": chat_id, "messengerId": chat_id}
         else:
             interaction_logger.error(
@@ -153,84 +104,14 @@ async def send_media_message(id: int, request: SendMediaMessageRequest):
         messenger_id = id
         #TODO Remove 
         if int(id) == 12:
-            messenger_id = '7922062448'
-        interaction_logger.info(
-            f"Sending media message to {request.chat.contact} via bot {messenger_id}"
-        )
-        token = db.get_bot_token(messenger_id)
+            messenger_id = 7922062448
+        log_event("CONSTRUCTOR_MEDIA", bot_id=messenger_id, chat_id=request.chat.contact)
         chat_id = request.chat.contact
-        file_type = request.file.type
-        file_url = request.file.url
-        file_mime = request.file.mime
-        caption = request.caption
-        inline_buttons = request.inlineButtons
-        quick_replies = request.quickReplies
-
-        reply_keyboard = None
-        if quick_replies:
-            reply_keyboard = [
-                [
-                    {
-                        **{"text": qr.text},
-                        **({"request_contact": True} if qr.type.lower() == "phone" else {}),
-                        **({"request_location": True} if qr.type.lower() in {"geolocation", "location"} else {}),
-                    }
-                    for qr in row
-                ]
-                for row in quick_replies
-            ]
-
-        response = await sa.send_media(
-            token,
-            chat_id,
-            file_type,
-            file_url,
-            file_mime,
-            caption,
-            inline_buttons=inline_buttons,
-            reply_keyboard=reply_keyboard,
-            remove_keyboard=not inline_buttons and not quick_replies,
-            bot_id=messenger_id,
-        )
 
-        sent_payload = {
-            "chat_id": str(chat_id),
-        }
-        if caption and file_type in ["image", "video", "document"]:
-            sent_payload["caption"] = caption[:1024]
-        if inline_buttons:
-            sent_payload["reply_markup"] = {"inline_keyboard": inline_buttons}
-        elif reply_keyboard:
-            sent_payload["reply_markup"] = {
-                "keyboard": reply_keyboard,
-                "resize_keyboard": True,
-                "one_time_keyboard": True,
-            }
-        elif not inline_buttons and not quick_replies:
-            sent_payload["reply_markup"] = {"remove_keyboard": True}
-        sent_payload["file_type"] = file_type
-        sent_payload["file_url"] = file_url
-        sent_payload["file_mime"] = file_mime
-
-        asyncio.create_task(
-            asyncio.to_thread(
-                mdb.insert_message,
-                source="ConstructorMessages",
-                bot_id=int(messenger_id),
-                user_id=int(chat_id),
-                message_id=response.get("body", {}).get("result", {}).get("message_id", 0),
-                participant_name=request.chat.operator or "",
-                text=caption or "",
-                attachments=[{"type": file_type, "url": file_url, "mime": file_mime}],
-                received_body=request.model_dump(),
-                sent_body=sent_payload,
-            )
-        )
+        response = await _send(outbound.media_job(messenger_id, request))
 
         if response["status_code"] == 200:
-            interaction_logger.info(
-                f"Media message sent to {chat_id} via bot {messenger_id}"
-            )
+            log_event("CONSTRUCTOR_MEDIA_SENT", bot_id=messenger_id, chat_id=chat_id)
             return {"externalId": chat_id, "messengerId": chat_id}
         else:
             interaction_logger.error(
@@ -252,16 +133,14 @@ async def send_system_message(id: int, request: SendSystemMessageRequest):
         messenger_id = id
         #TODO Remove 
         if int(id) == 12:
-            messenger_id = '7922062448'
-        interaction_logger.info(
-            f"Receiving system message from {request.chat.contact} from bot {messenger_id}"
+            messenger_id = 7922062448
+        log_event(
+            "CONSTRUCTOR_SYSTEM", bot_id=messenger_id, chat_id=request.chat.contact, text=request.text
         )
         chat_id = request.chat.contact
         
         text = request.text
 
-        interaction_logger.info(text) 
-
         project_data = json.loads(text)
 
         event = project_data.get("event")
@@ -269,7 +148,7 @@ async def send_system_message(id: int, request: SendSystemMessageRequest):
         if event == "started":
             message_id = project_data.get("req_id")
             if message_id:
-                cached = rdb.Message.get(messenger_id, chat_id, message_id)
+                cached = await rdb.Message.pop(messenger_id, chat_id, message_id)
                 if cached:
                     text, participant, attachments, message_type = cached
                     request_body = sa._build_event_request(
@@ -282,23 +161,23 @@ async def send_system_message(id: int, request: SendSystemMessageRequest):
                         message_type,
                     )
                     asyncio.create_task(sa._forward_message(request_body))
-                rdb.Message.delete(messenger_id, chat_id, message_id)
 
             session_id = project_data.get("session_id")
             if session_id:
-                selected_project_id = db.get_selected_project_id(messenger_id, chat_id)
+                selected_project_id = await db.get_selected_project_id(messenger_id, int(chat_id))
                 if selected_project_id:
-                    rdb.Session.set(messenger_id, chat_id, session_id, selected_project_id)
+                    await rdb.Session.set(messenger_id, chat_id, session_id, selected_project_id)
         
         elif event == "stopped":
             session_id = project_data.get("session_id")
 
             if session_id:
-                project_id = rdb.Session.get(messenger_id, chat_id, session_id)
+                project_id = await rdb.Session.get(messenger_id, chat_id, session_id)
 
-                db.deselect_project(project_id, messenger_id, chat_id)
+                if project_id:
+                    await db.deselect_project(int(project_id), messenger_id, int(chat_id))
 
-                rdb.Session.delete(messenger_id, chat_id, session_id)
+                await rdb.Session.delete(messenger_id, chat_id, session_id)
         
 
         return {"externalId": chat_id, "messengerId": chat_id}
@@ -311,6 +190,34 @@ async def send_system_message(id: int, request: SendSystemMessageRequest):
         )
     
 
+@router.get("/{id}/chats/{chatExternalId}/variables")
+async def get_many_variables_of_chat(
+    id: int, chatExternalId: int, names: Optional[List[str]] = Query(None)
+):
+    """Return the requested variables of the chat, or all of them."""
+    try:
+        bot_id = int(id)
+
+        #TODO Remove
+        if bot_id == 12:
+            bot_id = 7922062448
+
+        user_id = int(chatExternalId)
+
+        log_event("VARIABLES_GET", bot_id=bot_id, user_id=user_id, names=names)
+
+        variables = await contact_variables.get(bot_id, user_id, names)
+
+        return {"variables": variables}
+
+    except Exception as e:
+        interaction_logger.error(f"Variables request failed: {e}")
+        return JSONResponse(
+            content={"message": str(e), "code": "internal_server_error"},
+            status_code=202
+        )
+
+
 @router.get("/{id}/chats/{chatExternalId}/variables/{variable}")
 async def get_variables_of_chat(id: int, chatExternalId: int, variable: str):
     try:
@@ -324,9 +231,9 @@ async def get_variables_of_chat(id: int, chatExternalId: int, variable: str):
 
         name = str(variable)
 
-        interaction_logger.info(f"Got Request on variables for bot: {bot_id}, user_id: {user_id}, variable {name}")
+        log_event("VARIABLES_GET", bot_id=bot_id, user_id=user_id, names=[name])
 
-        value = mdb.get_variable(bot_id, user_id, name)
+        value = (await contact_variables.get(bot_id, user_id, [name]))[name]
         
         return {"value": value}
     
@@ -350,10 +257,9 @@ async def update_contact_data(id: int, request: UpdateContactDataRequest):
         user_id = int(request.externalId)
         data = request.data
 
-        interaction_logger.info(f"Update contact Data for bot: {bot_id}, for user: {user_id}, Data: {data}")
+        log_event("VARIABLES_UPDATE", bot_id=bot_id, user_id=user_id, data=data)
 
-        for name, value in data.items():
-            mdb.save_variable(bot_id, user_id, name, value)
+        await contact_variables.save(bot_id, user_id, data)
 
         return {
             "externalId": f"{user_id}",
@@ -0,0 +1,23 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+import services.health as health
+
+router = APIRouter(prefix="/health", tags=['Health'])
+
+
+@router.get("/live", description="Liveness probe")
+async def live():
+    """The process is up and serving requests."""
+    return {"status": "ok"}
+
+
+@router.get("/ready", description="Readiness probe")
+async def ready():
+    """Ready once startup finished and Postgres, Redis and Mongo answer a ping."""
+    if not health.is_ready():
+        return JSONResponse(status_code=503, content={"status": "starting", "checks": {}})
+    checks = await health.check()
+    if all(result == "ok" for result in checks.values()):
+        return {"status": "ok", "checks": checks}
+    return JSONResponse(status_code=503, content={"status": "unavailable", "checks": checks})
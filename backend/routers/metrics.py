@@ -1,9 +1,10 @@
 from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from fastapi import Response, APIRouter
 from fastapi.exceptions import HTTPException
-from constants.prometheus_models import registry
+from constants.prometheus_models import scrape_registry
 from constants.request_models import Job
-from config.settings import PROMETHEUS_JOBS_PATH
+from config.settings import PROMETHEUS_JOBS_PATH, TEXT_STATS_CAPACITY
+import services.text_stats as text_stats
 import json
 import os
 
@@ -12,10 +13,16 @@ router = APIRouter(prefix="/metrics", tags=['Metrics'])
 @router.get("/", description="Prometheus metrics endpoint")
 async def metrics():
     """Expose application metrics in Prometheus format."""
-    data = generate_latest(registry)
+    data = generate_latest(scrape_registry)
     return Response(content=data, media_type=CONTENT_TYPE_LATEST)
 
 
+@router.get("/texts", description="Most frequent message texts per bot and direction")
+async def top_texts(limit: int = 10):
+    """Return the Space-Saving summaries with estimated counts and error bounds."""
+    return text_stats.snapshot(max(1, min(limit, TEXT_STATS_CAPACITY)))
+
+
 @router.get("/jobs", description="List scraping jobs configured for Prometheus")
 async def get_jobs():
     """Return list of configured Prometheus jobs."""
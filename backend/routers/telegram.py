@@ -3,14 +3,16 @@ from fastapi.responses import JSONResponse
 from fastapi.exceptions import HTTPException
 import services.db as db
 import constants.redis_models as rdb
-import httpx
 import services.sender_adapter as sa
 import services.helper_functions as hf
 import services.webhook_server as ws
-from services.logging_setup import interaction_logger
+from services.webhook_context import WebhookContext, load_webhook_context
+import services.inbound_queue as inbound_queue
+from config.settings import INBOUND_QUEUE_ENABLED
+from services.logging_setup import interaction_logger, log_event
 from services.mongo_db import insert_message
-from constants.prometheus_models import MESSAGE_COUNT, MESSAGE_TEXT_COUNT
-import asyncio
+from constants.prometheus_models import MESSAGE_COUNT
+import services.text_stats as text_stats
 
 router = APIRouter(tags=["Telegram"])
 
@@ -47,8 +49,8 @@ def tr(key: str, locale: str) -> str:
     return MESSAGES.get(key, {}).get(locale, MESSAGES[key]["en"])
 
 
-async def _parse_update(update: dict, token: str):
-    """Extract message data from the Telegram update."""
+def _parse_update(update: dict):
+    """Extract message data and the callback query id from the Telegram update."""
     message = update.get("message") or update.get("edited_message")
     callback = update.get("callback_query")
     if not message and not callback:
@@ -58,38 +60,37 @@ async def _parse_update(update: dict, token: str):
         contact_id = callback["from"]["id"]
         text = callback.get("data", "")
         message = callback.get("message", {})
-        async with httpx.AsyncClient() as client:
-            await client.post(
-                f"https://api.telegram.org/bot{token}/answerCallbackQuery",
-                data={"callback_query_id": callback["id"]},
-            )
+        callback_id = callback["id"]
     else:
         contact_id = message["from"]["id"]
         text = message.get("text", "")
-    return message, contact_id, text
+        callback_id = None
+    return message, contact_id, text, callback_id
+
+
+def _build_commands(projects: list[str]) -> dict:
+    commands = {"commands": []}
+    for project in projects:
+        commands["commands"].append({"command": project, "description": project})
+    return hf.clean_commands(commands)
 
 
 def _update_metrics(bot_id: int, text: str, contact_id: int):
     MESSAGE_COUNT.labels(direction="incoming", bot_id=str(bot_id)).inc()
-    MESSAGE_TEXT_COUNT.labels(
-        direction="incoming",
-        bot_id=str(bot_id),
-        text=text[:100],
-    ).inc()
-    interaction_logger.info(
-        f"INCOMING bot_id={bot_id} user_id={contact_id} text={text}"
-    )
+    text_stats.record(bot_id, "incoming", text)
+    log_event("INCOMING", bot_id=bot_id, user_id=contact_id, text=text)
 
 
-async def _handle_contact(bot_id: int, token: str, contact_id: int, contact_info: dict, locale: str, message_id: int, participant_name: str):
-    db.update_user(
+async def _handle_contact(bot_id: int, ctx: WebhookContext, contact_id: int, contact_info: dict, message_id: int, participant_name: str):
+    token, locale = ctx.token, ctx.locale
+    await db.update_user(
         contact_id,
         contact_info.get("first_name"),
         contact_info.get("last_name"),
         contact_info.get("phone_number"),
     )
-    if db.get_is_bot_owner(bot_id, contact_id):
-        db.bot_set_verified(bot_id, True)
+    if ctx.is_owner:
+        await db.bot_set_verified(bot_id, True)
     await sa.send_message(
         token,
         contact_id,
@@ -98,10 +99,9 @@ async def _handle_contact(bot_id: int, token: str, contact_id: int, contact_info
         bot_id=bot_id,
     )
 
-    project_restart_code = db.get_selected_project_code(bot_id, contact_id)
+    project_restart_code = ctx.selected_project_code
     if project_restart_code is None:
-        db.set_main_as_selected(bot_id, contact_id)
-        project_restart_code = db.get_selected_project_code(bot_id, contact_id)
+        project_restart_code = await db.set_main_as_selected(bot_id, contact_id)
 
     restart_request_body = sa._build_event_request(message_id, project_restart_code, contact_id, bot_id, participant_name)
 
@@ -111,12 +111,7 @@ async def _handle_contact(bot_id: int, token: str, contact_id: int, contact_info
         interaction_logger.error(f"Failed to restart sesstion: {restart_response.content}")
         return JSONResponse(content={"ok": False, "error": str(restart_response.content)}, status_code=200)
     
-    projects = db.get_not_main_projects(bot_id, contact_id)
-    commands = {"commands": []}
-    for project in projects:
-        commands["commands"].append({"command": project, "description": project})
-
-    commands = hf.clean_commands(commands)
+    commands = _build_commands(ctx.project_commands)
 
     set_command_response = await ws.set_bot_commands(token, commands)
 
@@ -135,8 +130,8 @@ async def _handle_start(bot_id: int, token: str, contact_id: int, text: str, mes
         _, _, input_uuid = text.partition("=")
     input_uuid = input_uuid.strip()
 
-    if input_uuid and db.compare_bot_auth_owner(bot_id, input_uuid):
-        existing_owner = db.get_bot_owner_id(bot_id)
+    if input_uuid and await db.compare_bot_auth_owner(bot_id, input_uuid):
+        existing_owner = await db.get_bot_owner_id(bot_id)
         if existing_owner and existing_owner != contact_id:
             await sa.send_message(
                 token,
@@ -146,8 +141,8 @@ async def _handle_start(bot_id: int, token: str, contact_id: int, text: str, mes
             )
             return {"status": "ok"}
 
-        if db.get_is_bot_owner(bot_id, contact_id) and db.owner_has_contact(bot_id, contact_id):
-            db.bot_set_verified(bot_id, True)
+        if await db.get_is_bot_owner(bot_id, contact_id) and await db.owner_has_contact(bot_id, contact_id):
+            await db.bot_set_verified(bot_id, True)
             await sa.send_message(
                 token,
                 contact_id,
@@ -157,8 +152,8 @@ async def _handle_start(bot_id: int, token: str, contact_id: int, text: str, mes
             return {"status": "ok"}
 
         contact_button = [[{"text": tr("share_phone_btn", locale), "request_contact": True}]]
-        if not db.get_is_bot_owner(bot_id, contact_id):
-            db.add_owner_user(bot_id, contact_id)
+        if not await db.get_is_bot_owner(bot_id, contact_id):
+            await db.add_owner_user(bot_id, contact_id)
         await sa.send_message(
             token,
             contact_id,
@@ -168,8 +163,8 @@ async def _handle_start(bot_id: int, token: str, contact_id: int, text: str, mes
         )
         return {"status": "ok"}
 
-    if input_uuid and db.compare_bot_auth_pass(bot_id, input_uuid):
-        if db.bot_has_user(bot_id, contact_id):
+    if input_uuid and await db.compare_bot_auth_pass(bot_id, input_uuid):
+        if await db.bot_has_user(bot_id, contact_id):
             await sa.send_message(
                 token,
                 contact_id,
@@ -178,7 +173,7 @@ async def _handle_start(bot_id: int, token: str, contact_id: int, text: str, mes
             return {"status": "ok"}
 
         contact_button = [[{"text": tr("share_phone_btn", locale), "request_contact": True}]]
-        db.add_user_to_a_bot(
+        await db.add_user_to_a_bot(
             bot_id,
             contact_id,
             message["from"].get("first_name"),
@@ -186,9 +181,9 @@ async def _handle_start(bot_id: int, token: str, contact_id: int, text: str, mes
             None,
         )
 
-        db.add_user_to_all_projects(bot_id, contact_id)
+        await db.add_user_to_all_projects(bot_id, contact_id)
         
-        db.mark_pass_token_used(bot_id, input_uuid)
+        await db.mark_pass_token_used(bot_id, input_uuid)
         await sa.send_message(
             token,
             contact_id,
@@ -197,14 +192,8 @@ async def _handle_start(bot_id: int, token: str, contact_id: int, text: str, mes
             bot_id=bot_id,
         )
 
-        projects = db.get_not_main_projects(bot_id, contact_id)
-        commands = {"commands": []}
-        for project in projects:
-            commands["commands"].append({"command": project, "description": project})
-
-        commands = hf.clean_commands(commands)
-
-        await ws.set_bot_commands(token, commands)
+        projects = await db.get_not_main_projects(bot_id, contact_id)
+        await ws.set_bot_commands(token, _build_commands(projects))
 
         return {"status": "ok"}
 
@@ -243,22 +232,48 @@ async def _check_user_status(bot_id: int, token: str, contact_id: int, user_stat
     tags=["Telegram"],
 )
 async def handle_webhook(bot_id: int, request: Request):
-    """Process Telegram webhook updates and forward messages."""
+    """Process Telegram webhook updates and forward messages.
+
+    With INBOUND_QUEUE_ENABLED the update is only validated and queued on its
+    chat's partition; ``process_update`` runs later in a partition consumer.
+    """
     try:
-        interaction_logger.info(f"Webhook call for bot_id={bot_id}")
+        log_event("WEBHOOK", bot_id=bot_id)
         update = await request.json()
 
-        token = db.get_bot_token(bot_id)
-        if not token:
-            raise HTTPException(status_code=404, detail="Bot not registered")
+        if not INBOUND_QUEUE_ENABLED:
+            return await process_update(bot_id, update)
+
+        try:
+            _, contact_id, _, _ = _parse_update(update)
+        except (ValueError, KeyError) as e:
+            return JSONResponse(content={"ok": False, "error": str(e)}, status_code=200)
+        await inbound_queue.enqueue(bot_id, contact_id, update)
+        return {"status": "queued"}
+
+    except Exception as e:
+        interaction_logger.error(f"Webhook handling failed for bot_id={bot_id}: {e}")
+        return JSONResponse(content={"ok": False, "error": str(e)}, status_code=200)
 
-        locale = db.get_bot_locale(bot_id) or "en"
 
+async def process_update(bot_id: int, update: dict):
+    """Handle one Telegram update for the bot."""
+    try:
         try:
-            message, contact_id, text = await _parse_update(update, token)
+            message, contact_id, text, callback_id = _parse_update(update)
         except ValueError as e:
             return JSONResponse(content={"ok": False, "error": str(e)}, status_code=200)
 
+        ctx = await load_webhook_context(bot_id, contact_id)
+        if ctx is None:
+            raise HTTPException(status_code=404, detail="Bot not registered")
+
+        token = ctx.token
+        locale = ctx.locale
+
+        if callback_id:
+            await ws.answer_callback_query(token, callback_id)
+
         _update_metrics(bot_id, text, contact_id)
 
         user_info = message.get("from", {})
@@ -272,10 +287,10 @@ async def handle_webhook(bot_id: int, request: Request):
         message_id = message.get("message_id")
 
         contact_info = message.get("contact")
-        user_status = db.get_botuser_status(bot_id, contact_id)
+        user_status = ctx.user_status
 
-        if contact_info and db.bot_has_user(bot_id, contact_id):
-            return await _handle_contact(bot_id, token, contact_id, contact_info, locale, message_id, participant_name)
+        if contact_info and ctx.has_user:
+            return await _handle_contact(bot_id, ctx, contact_id, contact_info, message_id, participant_name)
 
         start_resp = await _handle_start(bot_id, token, contact_id, text, message, locale)
         if start_resp:
@@ -285,15 +300,15 @@ async def handle_webhook(bot_id: int, request: Request):
         if status_resp:
             return status_resp
 
-        attachments, message_type = hf.extract_telegram_attachments(message, token)
+        attachments, message_type = await hf.extract_telegram_attachments(message, token)
 
         if text.startswith("/"):
             command_text = text[1:].split()[0]
             command_text = command_text.split("@")[0]
-            project_match = db.find_project_by_command(bot_id, contact_id, command_text)
+            project_match = await db.find_project_by_command(bot_id, contact_id, command_text)
             if project_match:
                 project_id, project_code = project_match
-                db.set_project_selected(bot_id, project_id, contact_id)
+                await db.set_project_selected(bot_id, project_id, contact_id)
 
                 stop_request_body = sa._build_event_request(
                     message_id,
@@ -330,10 +345,9 @@ async def handle_webhook(bot_id: int, request: Request):
                     )
                 return {"status": "ok"}
 
-        if db.no_project_selected(bot_id, contact_id):
-            
-            db.set_main_as_selected(bot_id, contact_id)
-            project_restart_code = db.get_selected_project_code(bot_id, contact_id)
+        if ctx.selected_project_code is None:
+
+            project_restart_code = await db.set_main_as_selected(bot_id, contact_id)
             project_restart_code += f"_{message_id}"
             restart_request_body = sa._build_event_request(
                 message_id,
@@ -342,7 +356,7 @@ async def handle_webhook(bot_id: int, request: Request):
                 bot_id,
                 participant_name,
             )
-            rdb.Message.set(
+            await rdb.Message.set(
                 bot_id,
                 contact_id,
                 message_id,
@@ -355,13 +369,8 @@ async def handle_webhook(bot_id: int, request: Request):
 
             return {"status": "ok", "raw_response": restart_response.text}
 
-        
-        projects = db.get_not_main_projects(bot_id, contact_id)
-        commands = {"commands": []}
-        for project in projects:
-            commands["commands"].append({"command": project, "description": project})
 
-        commands = hf.clean_commands(commands)
+        commands = _build_commands(ctx.project_commands)
 
         set_command_response = await ws.set_bot_commands(token, commands)
 
@@ -381,19 +390,16 @@ async def handle_webhook(bot_id: int, request: Request):
 
         response = await sa._forward_message(request_body)
 
-        asyncio.create_task(
-            asyncio.to_thread(
-                insert_message,
-                source="UsersMessages",
-                bot_id=bot_id,
-                user_id=contact_id,
-                message_id=message_id,
-                participant_name=participant_name,
-                text=text,
-                attachments=attachments,
-                received_body=update,
-                sent_body=request_body,
-            )
+        insert_message(
+            source="UsersMessages",
+            bot_id=bot_id,
+            user_id=contact_id,
+            message_id=message_id,
+            participant_name=participant_name,
+            text=text,
+            attachments=attachments,
+            received_body=update,
+            sent_body=request_body,
         )
 
         if response.status_code >= 400:
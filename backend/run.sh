@@ -1 +1,9 @@
-uvicorn app:app --host 0.0.0.0 --port 8000
\ No newline at end of file
+if [ "${WEB_CONCURRENCY:-1}" -gt 1 ]; then
+  # Several workers share metrics through PROMETHEUS_MULTIPROC_DIR; files
+  # left by a previous run would be merged into the new totals.
+  export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus-multiproc}"
+  rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+  mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+  exec gunicorn app:app -c gunicorn.conf.py
+fi
+exec uvicorn app:app --host 0.0.0.0 --port 8000
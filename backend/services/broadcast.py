@@ -0,0 +1,103 @@
+import asyncio
+import json
+import uuid
+from typing import Any, Dict, Set
+
+import constants.redis_models as rdb
+import services.db as db
+import services.outbound as outbound
+from config.settings import BROADCAST_CONCURRENCY
+from constants.prometheus_models import BROADCAST_MESSAGES
+from services.logging_setup import interaction_logger
+
+# Running broadcasts of this process by job id. Progress itself is in Redis,
+# so any worker can report it.
+_jobs: Dict[str, asyncio.Task] = {}
+
+
+async def start(bot_id: int, request) -> Dict[str, Any]:
+    """Count the recipients, record the job and start sending in background."""
+    recipients = request.filter
+    total = await db.count_broadcast_recipients(
+        bot_id, recipients.activeOnly, recipients.project, recipients.search
+    )
+    job_id = uuid.uuid4().hex
+    await rdb.Broadcast.create(job_id, bot_id, total)
+
+    task = asyncio.create_task(
+        _run(job_id, bot_id, outbound.broadcast_job(bot_id, request), recipients)
+    )
+    _jobs[job_id] = task
+    task.add_done_callback(lambda _: _jobs.pop(job_id, None))
+    interaction_logger.info(
+        f"Broadcast {job_id} started for bot {bot_id} with {total} recipients"
+    )
+    return {"jobId": job_id, "total": total}
+
+
+async def _send_one(job_id: str, template: Dict[str, Any], user_id: int) -> None:
+    try:
+        response = await outbound.deliver({**template, "chat_id": user_id})
+    except Exception as e:
+        ok, detail = False, str(e)
+    else:
+        ok = response["status_code"] == 200
+        detail = None if ok else json.dumps(response["body"])
+    BROADCAST_MESSAGES.labels(result="sent" if ok else "failed").inc()
+    try:
+        await rdb.Broadcast.record(job_id, user_id, ok, detail)
+    except Exception as e:
+        interaction_logger.error(f"Broadcast {job_id} could not record user {user_id}: {e}")
+
+
+async def _run(job_id: str, bot_id: int, template: Dict[str, Any], recipients) -> None:
+    """Stream recipients and send to at most BROADCAST_CONCURRENCY at once.
+
+    The semaphore is taken before the next id is taken, so a slow Telegram
+    slows down paging through recipients instead of piling up tasks.
+    The pace itself is set by the per-bot rate limit in ``sender_adapter``.
+    """
+    limit = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+    pending: Set[asyncio.Task] = set()
+    streamed = 0
+
+    async def send(user_id: int) -> None:
+        try:
+            await _send_one(job_id, template, user_id)
+        finally:
+            limit.release()
+
+    try:
+        async for user_id in db.iter_broadcast_recipients(
+            bot_id, recipients.activeOnly, recipients.project, recipients.search
+        ):
+            await limit.acquire()
+            streamed += 1
+            task = asyncio.create_task(send(user_id))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        if pending:
+            await asyncio.gather(*pending)
+    except asyncio.CancelledError:
+        for task in pending:
+            task.cancel()
+        await rdb.Broadcast.finish(job_id, "interrupted")
+        raise
+    except Exception as e:
+        interaction_logger.error(f"Broadcast {job_id} failed after {streamed} recipients: {e}")
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        await rdb.Broadcast.finish(job_id, "failed")
+        return
+
+    # Users may join or leave while the job runs; report what was sent.
+    await rdb.Broadcast.finish(job_id, "done", total=streamed)
+    interaction_logger.info(f"Broadcast {job_id} finished, {streamed} recipients")
+
+
+async def stop() -> None:
+    """Interrupt the broadcasts running in this process."""
+    tasks = list(_jobs.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,35 @@
+import asyncio
+from typing import Dict, List, Optional
+
+import constants.redis_models as rdb
+import services.mongo_db as mdb
+from constants.prometheus_models import CONTACT_VARIABLES_CACHE
+
+
+async def get(bot_id: int, user_id: int, names: Optional[List[str]] = None) -> Dict[str, str]:
+    """Read-through lookup of contact variables, see ``mongo_db.get_variables``.
+
+    The first lookup loads every variable of the contact, so later lookups
+    of any name, set or not, are answered from the cache.
+    """
+    if names:
+        mdb.check_names(names)
+    variables = await rdb.ContactVariables.get(bot_id, user_id)
+    if variables is None:
+        CONTACT_VARIABLES_CACHE.labels(result="miss").inc()
+        variables = await asyncio.to_thread(mdb.get_variables, bot_id, user_id)
+        await rdb.ContactVariables.fill(bot_id, user_id, variables)
+    else:
+        CONTACT_VARIABLES_CACHE.labels(result="hit").inc()
+
+    if names:
+        return {name: variables.get(name, "") for name in names}
+    return dict(variables)
+
+
+async def save(bot_id: int, user_id: int, variables: Dict) -> None:
+    """Store variables in Mongo and write them through to the cache."""
+    if not variables:
+        return
+    await asyncio.to_thread(mdb.save_variables, bot_id, user_id, variables)
+    await rdb.ContactVariables.update(bot_id, user_id, variables)
@@ -1,12 +1,17 @@
-from contextlib import contextmanager
+from contextlib import asynccontextmanager
 from cryptography.fernet import InvalidToken
-from typing import Optional, Tuple
+from typing import AsyncIterator, Optional, Tuple
 
-from sqlalchemy import exists, or_, func, select
+from sqlalchemy import and_, exists, or_, func, select, update, delete
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from config.settings import (
+    POSTGRES_ASYNC_CONNECTION_URL,
+    POSTGRES_POOL_SIZE,
+    POSTGRES_MAX_OVERFLOW,
+    BROADCAST_FETCH_SIZE,
+)
 from constants.postgres_models import (
-    engine,
     Bot,
     User,
     BotUser,
@@ -14,28 +19,40 @@ from constants.postgres_models import (
     Project,
     BotProject,
     UserProjectSelection,
+    MigrationState,
+    BLIND_INDEX_KEY_STATE,
+    blind_index,
+    blind_index_key_id,
 )
 import constants.redis_models as rdb
 import services.helper_functions as hf
 
-SessionLocal = sessionmaker(bind=engine)
+async_engine = create_async_engine(
+    POSTGRES_ASYNC_CONNECTION_URL,
+    pool_size=POSTGRES_POOL_SIZE,
+    max_overflow=POSTGRES_MAX_OVERFLOW,
+    # Replace connections Postgres dropped while idle instead of failing the
+    # first query that picks one up.
+    pool_pre_ping=True,
+)
+SessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+@asynccontextmanager
+async def get_session():
 
-@contextmanager
-def get_session():
-    
     session = SessionLocal()
     try:
         yield session
     except SQLAlchemyError:
-        session.rollback()
+        await session.rollback()
         raise
     else:
-        session.commit()
+        await session.commit()
     finally:
-        session.close()
+        await session.close()
 
 
-def create_new_bot(
+async def create_new_bot(
     id: int,
     token: str,
     name: str,
@@ -44,173 +61,265 @@ def create_new_bot(
     web_url: str,
     locale: str = "en",
 ):
-    with get_session() as session:
+    async with get_session() as session:
         new_bot = Bot(id=id, name=name, locale=locale)
         new_bot.set_token(token)
         new_bot.set_owner_uuid(owner_uuid)
         new_bot.set_pass_uuid(pass_uuid)
         new_bot.set_web_url(web_url)
         session.add(new_bot)
-    rdb.Bot.create(id, token)
+    await rdb.Bot.create(id, token)
 
 
-def bot_exists(id: int) -> bool:
-    with get_session() as session:
-        return session.query(exists().where(Bot.id == id)).scalar()
+async def bot_exists(id: int) -> bool:
+    async with get_session() as session:
+        return bool(await session.scalar(select(exists().where(Bot.id == id))))
 
 
-def update_bot_web_url(id: int, new_url: str) -> None:
+async def update_bot_web_url(id: int, new_url: str) -> None:
     """Update stored web URL for a bot."""
-    with get_session() as session:
-        bot = session.get(Bot, id)
+    async with get_session() as session:
+        bot = await session.get(Bot, id)
         if bot:
             bot.set_web_url(new_url)
 
 
-def update_bot_locale(id: int, locale: str) -> None:
+async def update_bot_locale(id: int, locale: str) -> None:
     """Update stored locale for a bot."""
-    with get_session() as session:
-        bot = session.get(Bot, id)
+    async with get_session() as session:
+        bot = await session.get(Bot, id)
         if bot:
             bot.set_locale(locale)
+    await rdb.BotLocale.delete(id)
 
 
-def get_bot_auth(id: int) -> Optional[Tuple[str, str, str, str]]:
+async def get_bot_auth(id: int) -> Optional[Tuple[str, str, str, str]]:
     """Return bot name, pass uuid, web url and locale for the bot."""
-    with get_session() as session:
-        bot = session.get(Bot, id)
+    async with get_session() as session:
+        bot = await session.get(Bot, id)
         if not bot:
             return None
         return bot.name, bot.get_pass_uuid(), bot.get_web_url(), bot.get_locale()
 
 
-def compare_bot_auth_owner(id: int, tested_owner_uuid: str) -> bool:
-    with get_session() as session:
-        bot = session.get(Bot, id)
+async def compare_bot_auth_owner(id: int, tested_owner_uuid: str) -> bool:
+    async with get_session() as session:
+        bot = await session.get(Bot, id)
         return bool(bot and bot.get_owner_uuid() == tested_owner_uuid)
 
 
-def compare_bot_auth_pass(id: int, tested_pass_uuid: str) -> bool:
+async def compare_bot_auth_pass(id: int, tested_pass_uuid: str) -> bool:
     """Return True if the token exists and is unused."""
-    with get_session() as session:
-        tokens = (
-            session.query(PassToken)
-            .filter_by(bot_id=id, isUsed=False)
-            .all()
-        )
-        for token in tokens:
-            if token.get_uuid() == tested_pass_uuid:
-                return True
+    async with get_session() as session:
+        return await _find_unused_pass_token(session, id, tested_pass_uuid) is not None
+
+
+_blind_indexes_current = False
+
+
+async def _blind_indexes_ready(session) -> bool:
+    """False while stored hashes may still use a previous BLIND_INDEX_KEY."""
+    global _blind_indexes_current
+    if not _blind_indexes_current:
+        state = await session.get(MigrationState, BLIND_INDEX_KEY_STATE)
+        _blind_indexes_current = state is not None and state.value == blind_index_key_id()
+    return _blind_indexes_current
+
+
+def _decrypts_to(getter, value: str) -> bool:
+    try:
+        return getter() == value
+    except InvalidToken:
         return False
 
 
-def create_pass_token(bot_id: int) -> str:
+async def _find_unused_pass_token(session, bot_id: int, pass_uuid: str) -> Optional[PassToken]:
+    query = select(PassToken).filter_by(bot_id=bot_id, isUsed=False)
+    # Mid re-key some hashes are stale, so decrypt every candidate instead.
+    if await _blind_indexes_ready(session):
+        query = query.filter_by(uuidHash=blind_index(pass_uuid))
+    tokens = (await session.scalars(query)).all()
+    for token in tokens:
+        if _decrypts_to(token.get_uuid, pass_uuid):
+            return token
+    return None
+
+
+async def create_pass_token(bot_id: int) -> str:
     """Generate and store a new single-use pass token."""
     new_uuid = hf.generate_uuid()
-    with get_session() as session:
+    async with get_session() as session:
         token = PassToken(bot_id=bot_id)
         token.set_uuid(new_uuid)
         session.add(token)
     return new_uuid
 
 
-def mark_pass_token_used(bot_id: int, pass_uuid: str) -> None:
+async def mark_pass_token_used(bot_id: int, pass_uuid: str) -> None:
     """Mark the specified token as used."""
-    with get_session() as session:
-        tokens = (
-            session.query(PassToken)
-            .filter_by(bot_id=bot_id, isUsed=False)
-            .all()
-        )
-        for token in tokens:
-            if token.get_uuid() == pass_uuid:
-                token.isUsed = True
-                session.add(token)
-                break
+    async with get_session() as session:
+        token = await _find_unused_pass_token(session, bot_id, pass_uuid)
+        if token:
+            token.isUsed = True
+
+
+async def _bots_by_owner_uuid(session, owner_uuid: str) -> list[Bot]:
+    query = select(Bot).order_by(Bot.id)
+    if await _blind_indexes_ready(session):
+        query = query.where(Bot.ownerUuidHash == blind_index(owner_uuid))
+    bots = (await session.scalars(query)).all()
+    return [bot for bot in bots if _decrypts_to(bot.get_owner_uuid, owner_uuid)]
 
 
-def get_bot_by_owner_uuid(owner_uuid: str) -> Optional[Tuple[int, str, str, str]]:
+async def get_bot_by_owner_uuid(owner_uuid: str) -> Optional[Tuple[int, str, str, str]]:
     """Return bot info by owner uuid."""
-    with get_session() as session:
-        bots = session.query(Bot).all()
-        for bot in bots:
-            if bot.get_owner_uuid() == owner_uuid:
-                return bot.id, bot.name, bot.get_pass_uuid(), bot.get_web_url()
+    async with get_session() as session:
+        for bot in await _bots_by_owner_uuid(session, owner_uuid):
+            return bot.id, bot.name, bot.get_pass_uuid(), bot.get_web_url()
     return None
 
 
-def get_bots_by_owner_uuid(owner_uuid: str) -> list[Tuple[int, str, str, str]]:
+async def get_bots_by_owner_uuid(owner_uuid: str) -> list[Tuple[int, str, str, str]]:
     """Return list of bot info tuples for the given owner uuid."""
-    with get_session() as session:
-        bots = session.query(Bot).all()
-        res = []
-        for bot in bots:
-            if bot.get_owner_uuid() == owner_uuid:
-                res.append((bot.id, bot.name, bot.get_pass_uuid(), bot.get_web_url()))
-        return res
+    async with get_session() as session:
+        return [
+            (bot.id, bot.name, bot.get_pass_uuid(), bot.get_web_url())
+            for bot in await _bots_by_owner_uuid(session, owner_uuid)
+        ]
 
 
-def get_all_bots() -> list[Tuple[int, str]]:
+async def get_all_bots() -> list[Tuple[int, str]]:
     """Return list of bot id and name for all bots."""
-    with get_session() as session:
-        rows = session.query(Bot.id, Bot.name).order_by(Bot.id).all()
+    async with get_session() as session:
+        rows = (await session.execute(select(Bot.id, Bot.name).order_by(Bot.id))).all()
         return [(bot_id, name) for bot_id, name in rows]
 
-def get_all_bot_users() -> list[Tuple[int, int, str | None, str | None]]:
+async def get_all_bot_users() -> list[Tuple[int, int, str | None, str | None]]:
     """Return list of bot id, user id and user names for all bot users."""
-    with get_session() as session:
+    async with get_session() as session:
         rows = (
-            session.query(BotUser.bot_id, User.id, User.name, User.surname)
-            .join(User, BotUser.user_id == User.id)
-            .order_by(BotUser.bot_id, User.id)
-            .all()
-        )
+            await session.execute(
+                select(BotUser.bot_id, User.id, User.name, User.surname)
+                .join(User, BotUser.user_id == User.id)
+                .order_by(BotUser.bot_id, User.id)
+            )
+        ).all()
         return [
             (bot_id, user_id, name, surname)
             for bot_id, user_id, name, surname in rows
         ]
 
-def get_bot_token(id: int) -> Optional[str]:
-    token = rdb.Bot.get(id)
+async def get_bot_token(id: int) -> Optional[str]:
+    version = rdb.cache_version()
+    token = await rdb.Bot.get(id)
     if token:
         return token
-    with get_session() as session:
-        bot = session.get(Bot, id)
+    async with get_session() as session:
+        bot = await session.get(Bot, int(id))
         if not bot:
             return None
         token = bot.get_token()
-    rdb.Bot.create(id, token)
+    await rdb.Bot.fill(id, token, version)
     return token
 
 
-def get_bot_locale(id: int) -> str | None:
+async def get_bot_locale(id: int) -> str | None:
     """Return stored locale for a bot."""
-    with get_session() as session:
-        bot = session.get(Bot, id)
+    version = rdb.cache_version()
+    cached = await rdb.BotLocale.get(id)
+    if cached:
+        return cached
+    async with get_session() as session:
+        bot = await session.get(Bot, id)
         if not bot:
             return None
-        return bot.get_locale()
+        locale = bot.get_locale()
+    await rdb.BotLocale.fill(id, locale, version)
+    return locale
+
+
+async def get_webhook_context(bot_id: int, user_id: int) -> Optional[dict]:
+    """Return bot token, locale and the user's status and projects in one query."""
+    async with get_session() as session:
+        rows = (
+            await session.execute(
+                select(
+                    Bot,
+                    BotUser.is_active,
+                    BotUser.is_owner,
+                    Project.name,
+                    Project.code,
+                    UserProjectSelection.is_selected,
+                    BotProject.is_main,
+                )
+                .select_from(Bot)
+                .outerjoin(
+                    BotUser,
+                    and_(BotUser.bot_id == Bot.id, BotUser.user_id == user_id),
+                )
+                .outerjoin(
+                    UserProjectSelection,
+                    and_(
+                        UserProjectSelection.bot_id == Bot.id,
+                        UserProjectSelection.user_id == user_id,
+                    ),
+                )
+                .outerjoin(Project, Project.id == UserProjectSelection.project_id)
+                .outerjoin(
+                    BotProject,
+                    and_(
+                        BotProject.bot_id == Bot.id,
+                        BotProject.project_id == Project.id,
+                    ),
+                )
+                .where(Bot.id == bot_id)
+                .order_by(Project.id)
+            )
+        ).all()
 
+        if not rows:
+            return None
 
-def is_bot_verified(id: int) -> bool:
-    with get_session() as session:
-        bot = session.get(Bot, id)
+        bot, is_active, is_owner = rows[0][0], rows[0][1], rows[0][2]
+        selected_project_code = None
+        project_commands = []
+        for _, _, _, name, code, is_selected, is_main in rows:
+            if name is None:
+                continue
+            if is_selected and selected_project_code is None:
+                selected_project_code = code
+            if is_main is False:
+                project_commands.append(name)
+
+        return {
+            "token": bot.get_token(),
+            "locale": bot.get_locale(),
+            "user": {
+                "is_active": is_active,
+                "is_owner": bool(is_owner),
+                "selected_project_code": selected_project_code,
+                "project_commands": project_commands,
+            },
+        }
+
+
+async def is_bot_verified(id: int) -> bool:
+    async with get_session() as session:
+        bot = await session.get(Bot, id)
         return bool(bot and bot.verified)
 
 
-def add_owner_user(bot_id: int, user_id: int):
-    
-    with get_session() as session:
-        user = session.get(User, user_id)
+async def add_owner_user(bot_id: int, user_id: int):
+
+    async with get_session() as session:
+        user = await session.get(User, user_id)
         if not user:
             user = User(id=user_id)
             session.add(user)
-            session.flush()
+            await session.flush()
 
-        bu = (
-            session.query(BotUser)
-                   .filter_by(bot_id=bot_id, user_id=user_id)
-                   .one_or_none()
+        bu = await session.scalar(
+            select(BotUser).filter_by(bot_id=bot_id, user_id=user_id)
         )
         if bu:
             bu.is_owner = True
@@ -219,64 +328,69 @@ def add_owner_user(bot_id: int, user_id: int):
             session.add(
                 BotUser(bot_id=bot_id, user_id=user_id, is_owner=True, is_active=True)
             )
-        rdb.BotUserStatus.set(bot_id, user_id, True, True)
-        rdb.BotOwner.set(bot_id, user_id)
-        rdb.BotUsersPage.invalidate(bot_id)
+        await rdb.BotUserStatus.set(bot_id, user_id, True, True)
+        await rdb.BotOwner.set(bot_id, user_id)
+        await rdb.BotUsersPage.invalidate(bot_id)
+    await rdb.WebhookContext.invalidate(bot_id, user_id)
 
 
-def get_is_bot_owner(bot_id: int, user_id: int) -> bool:
-    cached = rdb.BotUserStatus.get(bot_id, user_id)
+async def get_is_bot_owner(bot_id: int, user_id: int) -> bool:
+    version = rdb.cache_version()
+    cached = await rdb.BotUserStatus.get(bot_id, user_id)
     if cached is not None:
         return cached["is_owner"]
-    with get_session() as session:
+    async with get_session() as session:
         row = (
-            session.query(BotUser.is_owner, BotUser.is_active)
-                   .filter_by(bot_id=bot_id, user_id=user_id)
-                   .first()
-        )
+            await session.execute(
+                select(BotUser.is_owner, BotUser.is_active)
+                .filter_by(bot_id=bot_id, user_id=user_id)
+            )
+        ).first()
         if row:
             is_owner, is_active = row
-            rdb.BotUserStatus.set(bot_id, user_id, is_active, is_owner)
+            await rdb.BotUserStatus.fill(bot_id, user_id, is_active, is_owner, version)
             return bool(is_owner)
         return False
 
 
-def owner_has_contact(bot_id: int, user_id: int) -> bool:
+async def owner_has_contact(bot_id: int, user_id: int) -> bool:
     """Return True if the owner has provided phone contact."""
-    with get_session() as session:
+    async with get_session() as session:
         row = (
-            session.query(User.phone)
-                   .join(BotUser, User.id == BotUser.user_id)
-                   .filter(
-                       BotUser.bot_id == bot_id,
-                       BotUser.user_id == user_id,
-                       BotUser.is_owner.is_(True),
-                   )
-                   .first()
-        )
+            await session.execute(
+                select(User.phone)
+                .join(BotUser, User.id == BotUser.user_id)
+                .filter(
+                    BotUser.bot_id == bot_id,
+                    BotUser.user_id == user_id,
+                    BotUser.is_owner.is_(True),
+                )
+            )
+        ).first()
         return bool(row and row[0])
 
 
-def get_bot_owner_id(bot_id: int) -> Optional[int]:
+async def get_bot_owner_id(bot_id: int) -> Optional[int]:
     """Return user id of the bot owner if exists."""
-    cached = rdb.BotOwner.get(bot_id)
+    version = rdb.cache_version()
+    cached = await rdb.BotOwner.get(bot_id)
     if cached is not None:
         return cached
-    with get_session() as session:
+    async with get_session() as session:
         row = (
-            session.query(BotUser.user_id)
-                   .filter_by(bot_id=bot_id, is_owner=True)
-                   .first()
-        )
+            await session.execute(
+                select(BotUser.user_id).filter_by(bot_id=bot_id, is_owner=True)
+            )
+        ).first()
         if row:
-            rdb.BotOwner.set(bot_id, row[0])
+            await rdb.BotOwner.fill(bot_id, row[0], version)
             return row[0]
         return None
 
 
-def update_user(user_id: int, name: str, surname: str, phone: str):
-    with get_session() as session:
-        user = session.query(User).filter_by(id=user_id).one_or_none()
+async def update_user(user_id: int, name: str, surname: str, phone: str):
+    async with get_session() as session:
+        user = await session.get(User, user_id)
         if not user:
             return
         user.name = name
@@ -284,113 +398,127 @@ def update_user(user_id: int, name: str, surname: str, phone: str):
         user.set_phone(phone)
 
 
-def add_user_to_a_bot(
+async def add_user_to_a_bot(
     bot_id: int,
     user_id: int,
     name: str,
     surname: str,
     phone: str | None = None,
 ):
-    
-    with get_session() as session:
-        user = session.get(User, user_id)
+
+    async with get_session() as session:
+        user = await session.get(User, user_id)
         if not user:
             user = User(id=user_id, name=name, surname=surname)
             if phone:
                 user.set_phone(phone)
             session.add(user)
-            session.flush()
+            await session.flush()
 
-        bu = (
-            session.query(BotUser)
-                   .filter_by(bot_id=bot_id, user_id=user_id)
-                   .one_or_none()
+        bu = await session.scalar(
+            select(BotUser).filter_by(bot_id=bot_id, user_id=user_id)
         )
         if not bu:
             session.add(BotUser(bot_id=bot_id, user_id=user_id, is_active=True))
-        rdb.BotUserStatus.set(bot_id, user_id, True, False)
-        rdb.BotUsersPage.invalidate(bot_id)
+        await rdb.BotUserStatus.set(bot_id, user_id, True, False)
+        await rdb.BotUsersPage.invalidate(bot_id)
+    await rdb.WebhookContext.invalidate(bot_id, user_id)
 
 
-def bot_has_user(bot_id: int, user_id: int) -> bool:
-    cached = rdb.BotUserStatus.get(bot_id, user_id)
+async def bot_has_user(bot_id: int, user_id: int) -> bool:
+    version = rdb.cache_version()
+    cached = await rdb.BotUserStatus.get(bot_id, user_id)
     if cached is not None:
         return True
-    with get_session() as session:
+    async with get_session() as session:
         bu = (
-            session.query(BotUser.is_active, BotUser.is_owner)
-                   .filter_by(bot_id=bot_id, user_id=user_id)
-                   .one_or_none()
-        )
+            await session.execute(
+                select(BotUser.is_active, BotUser.is_owner)
+                .filter_by(bot_id=bot_id, user_id=user_id)
+            )
+        ).one_or_none()
         if bu:
             is_active, is_owner = bu
-            rdb.BotUserStatus.set(bot_id, user_id, is_active, is_owner)
+            await rdb.BotUserStatus.fill(bot_id, user_id, is_active, is_owner, version)
             return True
         return False
 
 
-def get_botuser_status(bot_id: int, user_id: int) -> Optional[bool]:
+async def get_botuser_status(bot_id: int, user_id: int) -> Optional[bool]:
     """Return True/False if user exists, None if not registered"""
-    cached = rdb.BotUserStatus.get(bot_id, user_id)
+    version = rdb.cache_version()
+    cached = await rdb.BotUserStatus.get(bot_id, user_id)
     if cached is not None:
         return cached["is_active"]
-    with get_session() as session:
+    async with get_session() as session:
         row = (
-            session.query(BotUser.is_active, BotUser.is_owner)
-                   .filter_by(bot_id=bot_id, user_id=user_id)
-                   .first()
-        )
+            await session.execute(
+                select(BotUser.is_active, BotUser.is_owner)
+                .filter_by(bot_id=bot_id, user_id=user_id)
+            )
+        ).first()
         if row:
             is_active, is_owner = row
-            rdb.BotUserStatus.set(bot_id, user_id, is_active, is_owner)
+            await rdb.BotUserStatus.fill(bot_id, user_id, is_active, is_owner, version)
             return is_active
         return None
 
 
-def bot_set_verified(id: int, new_verified: bool):
-    with get_session() as session:
-        bot = session.get(Bot, id)
+async def bot_set_verified(id: int, new_verified: bool):
+    async with get_session() as session:
+        bot = await session.get(Bot, id)
         if bot:
             bot.verified = new_verified
 
 
-def get_bot_users(
+def _user_search(search: str):
+    """Match users by name or surname substring, or by exact phone digits."""
+    pattern = f"%{search.lower()}%"
+    conditions = [
+        func.lower(User.name).like(pattern),
+        func.lower(User.surname).like(pattern),
+    ]
+    phone_index = User.phone_blind_index(search)
+    if phone_index:
+        conditions.append(User.phoneHash == phone_index)
+    return or_(*conditions)
+
+
+async def get_bot_users(
     bot_id: int,
     page: int = 1,
     per_page: int = 10,
     search: str | None = None,
     is_active: bool | None = None,
 ):
-    cached = rdb.BotUsersPage.get(bot_id, page, per_page, search, is_active)
+    generation = await rdb.BotUsersPage.generation(bot_id)
+    cached = await rdb.BotUsersPage.get(bot_id, generation, page, per_page, search, is_active)
     if cached:
         return cached
-    with get_session() as session:
+    async with get_session() as session:
         query = (
-            session.query(User, BotUser)
+            select(User, BotUser)
             .join(BotUser, User.id == BotUser.user_id)
             .filter(BotUser.bot_id == bot_id)
         )
 
         if search:
-            pattern = f"%{search.lower()}%"
-            query = query.filter(
-                or_(
-                    func.lower(User.name).like(pattern),
-                    func.lower(User.surname).like(pattern),
-                )
-            )
+            query = query.filter(_user_search(search))
 
         if is_active is not None:
             query = query.filter(BotUser.is_active == is_active)
 
-        total = query.count()
+        total = await session.scalar(
+            select(func.count()).select_from(query.subquery())
+        )
 
         rows = (
-            query.order_by(User.id)
-            .offset((page - 1) * per_page)
-            .limit(per_page)
-            .all()
-        )
+            await session.execute(
+                query.order_by(User.id)
+                .offset((page - 1) * per_page)
+                .limit(per_page)
+            )
+        ).all()
 
         users = []
         for user, bu in rows:
@@ -411,19 +539,84 @@ def get_bot_users(
                 "isOwner": bu.is_owner,
                 "status": bu.is_active,
             })
-    rdb.BotUsersPage.set(bot_id, page, per_page, search, is_active, users, total)
+    await rdb.BotUsersPage.set(bot_id, generation, page, per_page, search, is_active, users, total)
     return users, total
 
-def get_owner_name(bot_id: int) -> Optional[str]:
-    
-    with get_session() as session: 
+def _broadcast_recipients_query(
+    bot_id: int,
+    active_only: bool = True,
+    project_code: str | None = None,
+    search: str | None = None,
+):
+    query = select(BotUser.user_id).filter(BotUser.bot_id == bot_id)
+    if active_only:
+        query = query.filter(BotUser.is_active.is_(True))
+    if search:
+        query = query.join(User, User.id == BotUser.user_id).filter(_user_search(search))
+    if project_code:
+        query = query.filter(
+            exists()
+            .where(
+                UserProjectSelection.bot_id == BotUser.bot_id,
+                UserProjectSelection.user_id == BotUser.user_id,
+                UserProjectSelection.is_selected.is_(True),
+                UserProjectSelection.project_id == Project.id,
+            )
+            .where(Project.code == project_code)
+        )
+    return query
+
+
+async def count_broadcast_recipients(
+    bot_id: int,
+    active_only: bool = True,
+    project_code: str | None = None,
+    search: str | None = None,
+) -> int:
+    """Return how many users of the bot match the broadcast filter."""
+    query = _broadcast_recipients_query(bot_id, active_only, project_code, search)
+    async with get_session() as session:
+        return await session.scalar(select(func.count()).select_from(query.subquery()))
+
+
+async def iter_broadcast_recipients(
+    bot_id: int,
+    active_only: bool = True,
+    project_code: str | None = None,
+    search: str | None = None,
+) -> AsyncIterator[int]:
+    """Yield user ids matching the broadcast filter.
+
+    Ids are read BROADCAST_FETCH_SIZE at a time by keyset, each page in its
+    own short session, so no connection is held while messages are sent.
+    """
+    query = (
+        _broadcast_recipients_query(bot_id, active_only, project_code, search)
+        .order_by(BotUser.user_id)
+        .limit(BROADCAST_FETCH_SIZE)
+    )
+    last_id = None
+    while True:
+        page = query if last_id is None else query.filter(BotUser.user_id > last_id)
+        async with get_session() as session:
+            user_ids = (await session.scalars(page)).all()
+        for user_id in user_ids:
+            yield user_id
+        if len(user_ids) < BROADCAST_FETCH_SIZE:
+            return
+        last_id = user_ids[-1]
+
+
+async def get_owner_name(bot_id: int) -> Optional[str]:
+
+    async with get_session() as session:
         stmt = (
             select(User.name, User.surname)
             .join(BotUser, BotUser.user_id == User.id)
             .where(BotUser.bot_id == bot_id, BotUser.is_owner.is_(True))
             .limit(1)
         )
-        result = session.execute(stmt).first()
+        result = (await session.execute(stmt)).first()
 
         if not result:
             return None
@@ -432,194 +625,214 @@ def get_owner_name(bot_id: int) -> Optional[str]:
         full = f"{name or ''} {surname or ''}".strip()
         return full or None
 
-def set_botuser_status(bot_id: int, user_id: int, new_status: bool) -> None:
-    with get_session() as session:
-        session.query(BotUser) \
-               .filter(
-                   BotUser.bot_id == bot_id,
-                   BotUser.user_id == user_id
-               ) \
-               .update({"is_active": new_status}, synchronize_session=False)
-        session.commit()
-    rdb.BotUserStatus.delete(bot_id, user_id)
-    rdb.BotUsersPage.invalidate(bot_id)
-    rdb.BotOwner.delete(bot_id)
-
-def delete_user_by_id(user_id: int) -> None:
-    with get_session() as session:
-        session.query(User) \
-               .filter(User.id == user_id) \
-               .delete(synchronize_session=False)
-        session.commit()
-
-    pattern = f"bots:*:users:{user_id}:status"
-    for key in rdb.redis_client.scan_iter(pattern):
-        rdb.redis_client.delete(key)
-    for key in rdb.redis_client.scan_iter(f"bots:*:users-page:*"):
-        rdb.redis_client.delete(key)
-
-
-def delete_botuser(bot_id: int, user_id: int) -> None:
-    with get_session() as session:
-        session.query(BotUser) \
-               .filter(
-                   BotUser.bot_id == bot_id,
-                   BotUser.user_id == user_id
-               ) \
-               .delete(synchronize_session=False)
-        session.commit()
-    rdb.BotUserStatus.delete(bot_id, user_id)
-    rdb.BotUsersPage.invalidate(bot_id)
-    rdb.BotOwner.delete(bot_id)
-
-
-def set_main_as_selected(bot_id: int, user_id: int) -> None:
-    with get_session() as session:
-        project = (
-            session.query(BotProject.project_id)
-            .filter(BotProject.bot_id == bot_id, BotProject.is_main.is_(True))
-            .first()
+async def set_botuser_status(bot_id: int, user_id: int, new_status: bool) -> None:
+    async with get_session() as session:
+        await session.execute(
+            update(BotUser)
+            .where(
+                BotUser.bot_id == bot_id,
+                BotUser.user_id == user_id
+            )
+            .values(is_active=new_status)
+            .execution_options(synchronize_session=False)
         )
-        if not project:
-            return
-        (project_id,) = project
+    await rdb.BotUserStatus.delete(bot_id, user_id)
+    await rdb.BotUsersPage.invalidate(bot_id)
+    await rdb.BotOwner.delete(bot_id)
+    await rdb.WebhookContext.invalidate(bot_id, user_id)
+
+async def delete_user_by_id(user_id: int) -> None:
+    async with get_session() as session:
+        # bot_user rows go with the user (ON DELETE CASCADE), so read them
+        # first: they are the reverse index of caches to invalidate.
+        bot_ids = (
+            await session.scalars(
+                select(BotUser.bot_id).where(BotUser.user_id == user_id)
+            )
+        ).all()
+        await session.execute(
+            delete(User)
+            .where(User.id == user_id)
+            .execution_options(synchronize_session=False)
+        )
+
+    await rdb.forget_user(user_id, bot_ids)
 
-        session.query(UserProjectSelection).filter_by(
-            user_id=user_id, bot_id=bot_id
-        ).update({"is_selected": False}, synchronize_session=False)
 
-        ups = (
-            session.query(UserProjectSelection)
-            .filter_by(user_id=user_id, project_id=project_id, bot_id=bot_id)
-            .one_or_none()
+async def delete_botuser(bot_id: int, user_id: int) -> None:
+    async with get_session() as session:
+        await session.execute(
+            delete(BotUser)
+            .where(
+                BotUser.bot_id == bot_id,
+                BotUser.user_id == user_id
+            )
+            .execution_options(synchronize_session=False)
         )
-        if ups:
-            ups.is_selected = True
-        else:
-            session.add(
-                UserProjectSelection(
-                    user_id=user_id,
-                    project_id=project_id,
-                    bot_id=bot_id,
-                    is_selected=True,
-                )
+    await rdb.BotUserStatus.delete(bot_id, user_id)
+    await rdb.BotUsersPage.invalidate(bot_id)
+    await rdb.BotOwner.delete(bot_id)
+    await rdb.WebhookContext.invalidate(bot_id, user_id)
+
+
+async def _select_project(session, bot_id: int, project_id: int, user_id: int) -> None:
+    await session.execute(
+        update(UserProjectSelection)
+        .filter_by(user_id=user_id, bot_id=bot_id)
+        .values(is_selected=False)
+        .execution_options(synchronize_session=False)
+    )
+
+    ups = await session.scalar(
+        select(UserProjectSelection)
+        .filter_by(user_id=user_id, project_id=project_id, bot_id=bot_id)
+    )
+    if ups:
+        ups.is_selected = True
+    else:
+        session.add(
+            UserProjectSelection(
+                user_id=user_id,
+                project_id=project_id,
+                bot_id=bot_id,
+                is_selected=True,
+            )
+        )
+
+
+async def set_main_as_selected(bot_id: int, user_id: int) -> str | None:
+    """Select the bot's main project for the user and return its code."""
+    async with get_session() as session:
+        project = (
+            await session.execute(
+                select(Project.id, Project.code)
+                .join(BotProject, BotProject.project_id == Project.id)
+                .filter(BotProject.bot_id == bot_id, BotProject.is_main.is_(True))
+                .limit(1)
             )
+        ).first()
+        if not project:
+            return None
+        project_id, project_code = project
 
+        await _select_project(session, bot_id, project_id, user_id)
+    await rdb.WebhookContext.invalidate(bot_id, user_id)
+    return project_code
 
-def get_selected_project_code(bot_id: int, user_id: int) -> str | None:
-    with get_session() as session:
-        result = (
-            session.query(Project.code)
+
+async def get_selected_project_code(bot_id: int, user_id: int) -> str | None:
+    async with get_session() as session:
+        return await session.scalar(
+            select(Project.code)
             .join(UserProjectSelection, Project.id == UserProjectSelection.project_id)
             .filter(
                 UserProjectSelection.user_id == user_id,
                 UserProjectSelection.bot_id == bot_id,
                 UserProjectSelection.is_selected.is_(True),
             )
-            .first()
+            .limit(1)
         )
-        return result[0] if result else None
 
 
-def is_project_selected(project_id: int, bot_id: int, user_id: int) -> bool:
-    with get_session() as session:
+async def is_project_selected(project_id: int, bot_id: int, user_id: int) -> bool:
+    async with get_session() as session:
         row = (
-            session.query(UserProjectSelection.is_selected)
-            .filter_by(project_id=project_id, user_id=user_id, bot_id=bot_id)
-            .first()
-        )
+            await session.execute(
+                select(UserProjectSelection.is_selected)
+                .filter_by(project_id=project_id, user_id=user_id, bot_id=bot_id)
+            )
+        ).first()
         return bool(row and row[0])
 
-def no_project_selected(bot_id: int, user_id: int) -> bool:
+async def no_project_selected(bot_id: int, user_id: int) -> bool:
     """Return True if user has no selected project for the given bot."""
-    with get_session() as session:
+    async with get_session() as session:
         row = (
-            session.query(UserProjectSelection.is_selected)
-            .filter(
-                UserProjectSelection.bot_id == bot_id,
-                UserProjectSelection.user_id == user_id,
-                UserProjectSelection.is_selected.is_(True),
+            await session.execute(
+                select(UserProjectSelection.is_selected)
+                .filter(
+                    UserProjectSelection.bot_id == bot_id,
+                    UserProjectSelection.user_id == user_id,
+                    UserProjectSelection.is_selected.is_(True),
+                )
             )
-            .first()
-        )
+        ).first()
         return not bool(row and row[0])
 
-def get_selected_project_id(bot_id: int, user_id: int) -> int | None:
-    with get_session() as session:
-        result = (
-            session.query(Project.id)
-            .join(UserProjectSelection, Project.id == UserProjectSelection.project_id)
-            .filter(
-                UserProjectSelection.user_id == user_id,
-                UserProjectSelection.bot_id == bot_id,
-                UserProjectSelection.is_selected.is_(True),
-            )
-            .first()
+def _selected_project_query(bot_id: int, user_id: int):
+    # Ids arrive as strings from request bodies and Redis; asyncpg binds
+    # them as text, which Postgres will not compare with BIGINT columns.
+    return (
+        select(Project.id)
+        .join(UserProjectSelection, Project.id == UserProjectSelection.project_id)
+        .filter(
+            UserProjectSelection.user_id == int(user_id),
+            UserProjectSelection.bot_id == int(bot_id),
+            UserProjectSelection.is_selected.is_(True),
         )
-        return result[0] if result else None
+        .limit(1)
+    )
+
+
+async def get_selected_project_id(bot_id: int, user_id: int) -> int | None:
+    async with get_session() as session:
+        return await session.scalar(_selected_project_query(bot_id, user_id))
 
-def deselect_project(project_id: int, bot_id: int, user_id: int) -> None:
+
+def _deselect_project_query(project_id: int, bot_id: int, user_id: int):
+    return (
+        update(UserProjectSelection)
+        .filter_by(project_id=int(project_id), user_id=int(user_id), bot_id=int(bot_id))
+        .values(is_selected=False)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def deselect_project(project_id: int, bot_id: int, user_id: int) -> None:
     """Set ``is_selected`` to False for the given user's project."""
-    with get_session() as session:
-        session.query(UserProjectSelection).filter_by(
-            project_id=project_id, user_id=user_id, bot_id=bot_id
-        ).update({"is_selected": False}, synchronize_session=False)
+    async with get_session() as session:
+        await session.execute(_deselect_project_query(project_id, bot_id, user_id))
+    await rdb.WebhookContext.invalidate(bot_id, user_id)
 
-def get_not_main_projects(bot_id: int, user_id: int) -> list[str]:
+async def get_not_main_projects(bot_id: int, user_id: int) -> list[str]:
     """Return names of the user's projects that are not main for the bot."""
-    with get_session() as session:
+    async with get_session() as session:
         rows = (
-            session.query(Project.name)
-            .join(UserProjectSelection, Project.id == UserProjectSelection.project_id)
-            .join(BotProject, BotProject.project_id == Project.id)
-            .filter(
-                BotProject.bot_id == bot_id,
-                UserProjectSelection.user_id == user_id,
-                UserProjectSelection.bot_id == bot_id,
-                BotProject.is_main.is_(False),
+            await session.execute(
+                select(Project.name)
+                .join(UserProjectSelection, Project.id == UserProjectSelection.project_id)
+                .join(BotProject, BotProject.project_id == Project.id)
+                .filter(
+                    BotProject.bot_id == bot_id,
+                    UserProjectSelection.user_id == user_id,
+                    UserProjectSelection.bot_id == bot_id,
+                    BotProject.is_main.is_(False),
+                )
+                .order_by(Project.id)
             )
-            .order_by(Project.id)
-            .all()
-        )
+        ).all()
         return [name for (name,) in rows]
 
-def set_project_selected(bot_id: int, project_id: int, user_id: int) -> None:
+async def set_project_selected(bot_id: int, project_id: int, user_id: int) -> None:
     """Mark the specified project as selected for the user."""
-    with get_session() as session:
-        session.query(UserProjectSelection).filter_by(
-            user_id=user_id, bot_id=bot_id
-        ).update({"is_selected": False}, synchronize_session=False)
-
-        ups = (
-            session.query(UserProjectSelection)
-            .filter_by(user_id=user_id, project_id=project_id, bot_id=bot_id)
-            .one_or_none()
-        )
-        if ups:
-            ups.is_selected = True
-        else:
-            session.add(
-                UserProjectSelection(
-                    user_id=user_id,
-                    project_id=project_id,
-                    bot_id=bot_id,
-                    is_selected=True,
-                )
-            )
+    async with get_session() as session:
+        await _select_project(session, bot_id, project_id, user_id)
+    await rdb.WebhookContext.invalidate(bot_id, user_id)
 
 
-def find_project_by_command(
+async def find_project_by_command(
     bot_id: int, user_id: int, command: str
 ) -> tuple[int, str] | None:
     """Return project id and code matching the normalized command."""
     normalized = hf.normalize_command(command)
-    with get_session() as session:
+    async with get_session() as session:
         rows = (
-            session.query(Project.id, Project.name, Project.code)
-            .join(BotProject, BotProject.project_id == Project.id)
-            .filter(BotProject.bot_id == bot_id)
-            .all()
-        )
+            await session.execute(
+                select(Project.id, Project.name, Project.code)
+                .join(BotProject, BotProject.project_id == Project.id)
+                .filter(BotProject.bot_id == bot_id)
+            )
+        ).all()
 
         for pid, name, code in rows:
             if hf.normalize_command(name) == normalized:
@@ -627,23 +840,26 @@ def find_project_by_command(
     return None
 
 
-def add_user_to_all_projects(bot_id: int, user_id: int) -> None:
+async def add_user_to_all_projects(bot_id: int, user_id: int) -> None:
     """Link all projects of the bot to the user with is_selected=False."""
 
-    with get_session() as session:
+    async with get_session() as session:
         project_ids = (
-            session.query(BotProject.project_id)
-            .filter(BotProject.bot_id == bot_id)
-            .all()
+            await session.scalars(
+                select(BotProject.project_id).filter(BotProject.bot_id == bot_id)
+            )
+        ).all()
+        linked_ids = set(
+            (
+                await session.scalars(
+                    select(UserProjectSelection.project_id)
+                    .filter_by(user_id=user_id, bot_id=bot_id)
+                )
+            ).all()
         )
 
-        for (project_id,) in project_ids:
-            exists = (
-                session.query(UserProjectSelection)
-                .filter_by(user_id=user_id, project_id=project_id, bot_id=bot_id)
-                .one_or_none()
-            )
-            if not exists:
+        for project_id in project_ids:
+            if project_id not in linked_ids:
                 session.add(
                     UserProjectSelection(
                         user_id=user_id,
@@ -651,4 +867,5 @@ def add_user_to_all_projects(bot_id: int, user_id: int) -> None:
                         bot_id=bot_id,
                         is_selected=False,
                     )
-                )
\ No newline at end of file
+                )
+    await rdb.WebhookContext.invalidate(bot_id, user_id)
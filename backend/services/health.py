@@ -0,0 +1,59 @@
+import asyncio
+from typing import Dict
+
+from sqlalchemy import text
+
+import constants.redis_models as rdb
+import services.db as db
+import services.mongo_db as mdb
+from config.settings import HEALTH_CHECK_TIMEOUT
+
+_ready = False
+
+
+def mark_ready() -> None:
+    """Called by the lifespan once every dependency has been warmed up."""
+    global _ready
+    _ready = True
+
+
+def mark_not_ready() -> None:
+    global _ready
+    _ready = False
+
+
+def is_ready() -> bool:
+    return _ready
+
+
+async def _postgres() -> None:
+    async with db.async_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+async def _redis() -> None:
+    await rdb.redis_client.ping()
+
+
+async def _mongo() -> None:
+    # pymongo blocks a thread, so bound the ping itself rather than only the await.
+    await asyncio.to_thread(mdb.ping, HEALTH_CHECK_TIMEOUT)
+
+
+CHECKS = {"postgres": _postgres, "redis": _redis, "mongo": _mongo}
+
+
+async def _run(check) -> str:
+    try:
+        await asyncio.wait_for(check(), HEALTH_CHECK_TIMEOUT)
+    except asyncio.TimeoutError:
+        return "timeout"
+    except Exception as e:
+        return f"error: {type(e).__name__}"
+    return "ok"
+
+
+async def check() -> Dict[str, str]:
+    """Ping every backing store concurrently, each bounded by HEALTH_CHECK_TIMEOUT."""
+    results = await asyncio.gather(*(_run(probe) for probe in CHECKS.values()))
+    return dict(zip(CHECKS, results))
@@ -1,8 +1,8 @@
 from urllib.parse import urlparse
-import requests
 import uuid
 import os
 import re
+import services.telegram_client as tg
 
 def guess_filename(file_url: str, headers: dict) -> str:
     disposition = headers.get("Content-Disposition", "")
@@ -52,86 +52,39 @@ def clean_commands(commands: dict) -> dict:
     return commands
 
 
-def extract_telegram_attachments(message: dict, token: str):
+TELEGRAM_ATTACHMENT_TYPES = (
+    ("photo", "Image", "image/jpeg"),
+    ("voice", "Voice", "audio/ogg"),
+    ("video", "Video", "video/mp4"),
+    ("audio", "Audio", "audio/mpeg"),
+    ("document", "Document", "application/octet-stream"),
+)
+
+
+async def extract_telegram_attachments(message: dict, token: str):
     """Return attachments list and message type for a Telegram message."""
     attachments = []
     message_type = None
 
-    if "photo" in message:
-        photo = message["photo"][-1]
-        file_id = photo["file_id"]
+    for message_key, attachment_type, mime in TELEGRAM_ATTACHMENT_TYPES:
+        if message_key not in message:
+            continue
 
-        response = requests.get(
-            f"https://api.telegram.org/bot{token}/getFile",
-            params={"file_id": file_id}
-        )
-        file_path = response.json()["result"]["file_path"]
-
-        attachments.append({
-            "type": "Image",
-            "url": f"https://api.telegram.org/file/bot{token}/{file_path}",
-            "mime": "image/jpeg",
-        })
-        message_type = "photo"
-    elif "voice" in message:
-        file_id = message["voice"]["file_id"]
-
-        response = requests.get(
-            f"https://api.telegram.org/bot{token}/getFile",
-            params={"file_id": file_id}
-        )
-        file_path = response.json()["result"]["file_path"]
-
-        attachments.append({
-            "type": "Voice",
-            "url": f"https://api.telegram.org/file/bot{token}/{file_path}",
-            "mime": "audio/ogg",
-        })
-        message_type = "voice"
-    elif "video" in message:
-        file_id = message["video"]["file_id"]
-
-        response = requests.get(
-            f"https://api.telegram.org/bot{token}/getFile",
-            params={"file_id": file_id}
-        )
-        file_path = response.json()["result"]["file_path"]
-
-        attachments.append({
-            "type": "Video",
-            "url": f"https://api.telegram.org/file/bot{token}/{file_path}",
-            "mime": "video/mp4",
-        })
-        message_type = "video"
-    elif "audio" in message:
-        file_id = message["audio"]["file_id"]
-
-        response = requests.get(
-            f"https://api.telegram.org/bot{token}/getFile",
-            params={"file_id": file_id}
-        )
-        file_path = response.json()["result"]["file_path"]
-
-        attachments.append({
-            "type": "Audio",
-            "url": f"https://api.telegram.org/file/bot{token}/{file_path}",
-            "mime": "audio/mpeg",
-        })
-        message_type = "audio"
-    elif "document" in message:
-        file_id = message["document"]["file_id"]
-
-        response = requests.get(
-            f"https://api.telegram.org/bot{token}/getFile",
-            params={"file_id": file_id}
+        media = message[message_key]
+        if message_key == "photo":
+            media = media[-1]
+
+        file_path = await tg.get_file_path(
+            token, media["file_id"], media.get("file_unique_id")
         )
-        file_path = response.json()["result"]["file_path"]
-
-        attachments.append({
-            "type": "Document",
-            "url": f"https://api.telegram.org/file/bot{token}/{file_path}",
-            "mime": "application/octet-stream",
-        })
-        message_type = "document"
+
+        if file_path:
+            attachments.append({
+                "type": attachment_type,
+                "url": tg.file_url(token, file_path),
+                "mime": mime,
+            })
+        message_type = message_key
+        break
 
     return attachments, message_type
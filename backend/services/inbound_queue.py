@@ -0,0 +1,244 @@
+import asyncio
+import json
+import math
+import os
+import socket
+import time
+import zlib
+from typing import Awaitable, Callable, Dict, Optional
+
+import redis
+from redis import asyncio as aioredis
+
+import constants.redis_models as rdb
+from config.settings import (
+    INBOUND_STREAM_PREFIX,
+    INBOUND_PARTITIONS,
+    INBOUND_GROUP,
+    INBOUND_STREAM_MAXLEN,
+    INBOUND_LEASE_MS,
+    REDIS_CONNECTION_URL,
+    REDIS_POOL_TIMEOUT,
+    REDIS_HEALTH_CHECK_INTERVAL,
+)
+from constants.prometheus_models import INBOUND_UPDATES, INBOUND_QUEUE_LAG
+from services.logging_setup import interaction_logger
+
+Handler = Callable[[int, dict], Awaitable[object]]
+
+CONSUMERS_KEY = f"{INBOUND_STREAM_PREFIX}:consumers"
+
+# A lease is only touched by its holder, so ownership checks and the write
+# have to happen atomically.
+_renew_script = rdb.redis_client.register_script("""
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+""")
+_release_script = rdb.redis_client.register_script("""
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+""")
+
+
+def partition_for(bot_id: int, chat_id: int) -> int:
+    return zlib.crc32(f"{bot_id}:{chat_id}".encode()) % INBOUND_PARTITIONS
+
+
+def _stream(partition: int) -> str:
+    return f"{INBOUND_STREAM_PREFIX}:{partition}"
+
+
+def _lease(partition: int) -> str:
+    return f"{INBOUND_STREAM_PREFIX}:{partition}:lease"
+
+
+async def enqueue(bot_id: int, chat_id: int, update: dict) -> str:
+    """Append an update to its chat's partition; one Redis round trip."""
+    return await rdb.redis_client.xadd(
+        _stream(partition_for(bot_id, chat_id)),
+        {"bot_id": bot_id, "update": json.dumps(update), "queued_at": time.time()},
+        maxlen=INBOUND_STREAM_MAXLEN,
+        approximate=True,
+    )
+
+
+class InboundConsumer:
+    """Processes partitions this process holds a lease on.
+
+    Updates of one chat always land in the same partition and a partition is
+    drained by a single task of a single process, one update at a time, so
+    per-chat order is kept while different partitions run in parallel.
+    Partitions are spread over live processes by a fair-share count.
+
+    Every partition task holds a connection through its blocking reads, so
+    they get a pool of their own instead of starving the shared one.
+    """
+
+    def __init__(self, handler: Handler):
+        self.handler = handler
+        self.name = f"{socket.gethostname()}-{os.getpid()}"
+        self.tasks: Dict[int, asyncio.Task] = {}
+        self.draining: Dict[int, asyncio.Event] = {}
+        # Tasks of partitions whose lease was lost, finishing their update.
+        self.stopping: Dict[int, asyncio.Task] = {}
+        self.manager: Optional[asyncio.Task] = None
+        self.reader_pool = aioredis.BlockingConnectionPool.from_url(
+            REDIS_CONNECTION_URL,
+            decode_responses=True,
+            max_connections=INBOUND_PARTITIONS,
+            timeout=REDIS_POOL_TIMEOUT,
+            health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+        )
+        self.reader = aioredis.Redis(connection_pool=self.reader_pool)
+
+    def start(self) -> None:
+        self.manager = asyncio.create_task(self._manage())
+
+    async def stop(self) -> None:
+        if self.manager:
+            self.manager.cancel()
+            try:
+                await self.manager
+            except asyncio.CancelledError:
+                pass
+        for partition in list(self.tasks):
+            await self._release(partition)
+        if self.stopping:
+            await asyncio.wait(list(self.stopping.values()), timeout=INBOUND_LEASE_MS / 1000)
+        await rdb.redis_client.zrem(CONSUMERS_KEY, self.name)
+        await self.reader.aclose()
+        await self.reader_pool.disconnect()
+
+    async def _fair_share(self) -> int:
+        now = time.time()
+        pipe = rdb.redis_client.pipeline(transaction=False)
+        pipe.zadd(CONSUMERS_KEY, {self.name: now})
+        pipe.zremrangebyscore(CONSUMERS_KEY, 0, now - INBOUND_LEASE_MS / 1000)
+        pipe.zcard(CONSUMERS_KEY)
+        *_, consumers = await pipe.execute()
+        return math.ceil(INBOUND_PARTITIONS / max(consumers, 1))
+
+    async def _manage(self) -> None:
+        while True:
+            try:
+                await self._rebalance()
+            except redis.RedisError as e:
+                interaction_logger.error(f"Inbound consumer {self.name} Redis error: {e}")
+            await asyncio.sleep(INBOUND_LEASE_MS / 3000)
+
+    async def _rebalance(self) -> None:
+        share = await self._fair_share()
+
+        for partition, task in list(self.tasks.items()):
+            if task.done():
+                await self._release(partition)
+                continue
+            renewed = await _renew_script(
+                keys=[_lease(partition)], args=[self.name, INBOUND_LEASE_MS]
+            )
+            if not renewed:
+                # Lost the lease (e.g. a long Redis outage): another process
+                # may already own the partition, so stop claiming entries,
+                # but let the update in hand finish instead of cutting its
+                # handler off halfway.
+                self.draining.pop(partition).set()
+                self.stopping[partition] = self.tasks.pop(partition)
+                self.stopping[partition].add_done_callback(
+                    lambda _, partition=partition: self.stopping.pop(partition, None)
+                )
+
+        while len(self.tasks) > share:
+            await self._release(max(self.tasks))
+
+        for partition in range(INBOUND_PARTITIONS):
+            if len(self.tasks) >= share:
+                break
+            if partition in self.tasks or partition in self.stopping:
+                continue
+            acquired = await rdb.redis_client.set(
+                _lease(partition), self.name, nx=True, px=INBOUND_LEASE_MS
+            )
+            if acquired:
+                self.draining[partition] = asyncio.Event()
+                self.tasks[partition] = asyncio.create_task(self._drain(partition))
+
+    async def _release(self, partition: int) -> None:
+        """Let the current update finish, then hand the partition over."""
+        self.draining[partition].set()
+        task = self.tasks.pop(partition)
+        try:
+            await asyncio.wait_for(task, timeout=INBOUND_LEASE_MS / 1000)
+        except (asyncio.CancelledError, Exception) as e:
+            if not isinstance(e, (asyncio.CancelledError, asyncio.TimeoutError)):
+                interaction_logger.error(f"Inbound partition {partition} stopped: {e}")
+        self.draining.pop(partition)
+        await _release_script(keys=[_lease(partition)], args=[self.name])
+
+    async def _read(self, partition: int):
+        stream = _stream(partition)
+        # Entries left pending by the previous owner come first, in order.
+        _, entries, *_ = await self.reader.xautoclaim(
+            stream, INBOUND_GROUP, self.name, min_idle_time=0, count=10
+        )
+        if entries:
+            return entries
+        response = await self.reader.xreadgroup(
+            INBOUND_GROUP, self.name, {stream: ">"}, count=10, block=1000
+        )
+        return response[0][1] if response else []
+
+    async def _drain(self, partition: int) -> None:
+        stream = _stream(partition)
+        stop = self.draining[partition]
+        try:
+            await rdb.redis_client.xgroup_create(stream, INBOUND_GROUP, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        while not stop.is_set():
+            try:
+                entries = await self._read(partition)
+            except redis.RedisError as e:
+                interaction_logger.error(f"Inbound partition {partition} read failed: {e}")
+                await asyncio.sleep(1)
+                continue
+            for entry_id, fields in entries:
+                if stop.is_set():
+                    break
+                if fields:
+                    INBOUND_QUEUE_LAG.observe(
+                        max(time.time() - float(fields.get("queued_at", time.time())), 0)
+                    )
+                    try:
+                        await self.handler(int(fields["bot_id"]), json.loads(fields["update"]))
+                        INBOUND_UPDATES.labels(result="processed").inc()
+                    except Exception as e:
+                        INBOUND_UPDATES.labels(result="failed").inc()
+                        interaction_logger.error(
+                            f"Inbound update {entry_id} on partition {partition} failed: {e}"
+                        )
+                pipe = rdb.redis_client.pipeline(transaction=False)
+                pipe.xack(stream, INBOUND_GROUP, entry_id)
+                pipe.xdel(stream, entry_id)
+                await pipe.execute()
+
+
+_consumer: Optional[InboundConsumer] = None
+
+
+def start(handler: Handler) -> None:
+    global _consumer
+    if _consumer is None:
+        _consumer = InboundConsumer(handler)
+        _consumer.start()
+
+
+async def stop() -> None:
+    global _consumer
+    if _consumer is not None:
+        await _consumer.stop()
+        _consumer = None
@@ -1,31 +1,246 @@
+import atexit
+import json
 import logging
 import os
+import queue
+import random
+import threading
+from collections import defaultdict, deque
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
-from logging_loki import LokiHandler
+import httpx
+
+from config.settings import (
+    LOG_QUEUE_SIZE,
+    LOG_FILE_MAX_BYTES,
+    LOG_FILE_BACKUPS,
+    LOKI_BATCH_SIZE,
+    LOKI_FLUSH_INTERVAL,
+    LOKI_BUFFER_SIZE,
+    LOG_SAMPLE_RATES,
+    LOG_MAX_FIELD_CHARS,
+)
+from constants.prometheus_models import LOG_RECORDS_DROPPED, LOKI_PUSHES
 
 LOG_DIR = os.getenv("LOG_DIR", "logs")
-os.makedirs(LOG_DIR, exist_ok=True)
 
+LOG_FORMAT = "%(asctime)s %(levelname)s [%(name)s] %(message)s"
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full.
+
+    Records are queued unformatted, so building the message (and serializing
+    ``log_event`` fields) happens on the listener thread, not the caller's.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.labels(reason="queue_full").inc()
+
+
+class LokiBatchHandler(logging.Handler):
+    """Ships records to Loki in batches from a background thread.
+
+    A batch is pushed once it holds ``batch_size`` records or every
+    ``flush_interval`` seconds. While Loki is unreachable records stay
+    buffered, up to ``buffer_size``; beyond that the oldest are dropped.
+    """
+
+    def __init__(self, url: str, labels: dict, batch_size: int, flush_interval: float, buffer_size: int):
+        super().__init__()
+        self.url = url
+        self.labels = labels
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.buffer: deque = deque()
+        self.buffer_size = buffer_size
+        self.cond = threading.Condition()
+        self.closed = False
+        self.client = httpx.Client(timeout=5.0)
+        self.thread = threading.Thread(target=self._run, name="loki-shipper", daemon=True)
+        self.thread.start()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        entry = (
+            str(int(record.created * 1e9)),
+            record.levelname.lower(),
+            record.name,
+            self.format(record),
+        )
+        with self.cond:
+            if len(self.buffer) >= self.buffer_size:
+                self.buffer.popleft()
+                LOG_RECORDS_DROPPED.labels(reason="loki_backlog").inc()
+            self.buffer.append(entry)
+            if len(self.buffer) >= self.batch_size:
+                self.cond.notify()
+
+    def _payload(self, batch: list) -> dict:
+        streams = defaultdict(list)
+        for timestamp, severity, logger_name, line in batch:
+            streams[(severity, logger_name)].append([timestamp, line])
+        return {
+            "streams": [
+                {
+                    "stream": {**self.labels, "severity": severity, "logger": logger_name},
+                    "values": values,
+                }
+                for (severity, logger_name), values in streams.items()
+            ]
+        }
+
+    def _push(self) -> bool:
+        with self.cond:
+            batch = [self.buffer.popleft() for _ in range(min(self.batch_size, len(self.buffer)))]
+        if not batch:
+            return True
+        try:
+            self.client.post(self.url, json=self._payload(batch)).raise_for_status()
+        except httpx.HTTPError:
+            LOKI_PUSHES.labels(result="failed").inc()
+            with self.cond:
+                # Put the batch back in front, as far as the buffer allows.
+                room = self.buffer_size - len(self.buffer)
+                if room < len(batch):
+                    LOG_RECORDS_DROPPED.labels(reason="loki_backlog").inc(len(batch) - room)
+                    batch = batch[len(batch) - room:] if room > 0 else []
+                self.buffer.extendleft(reversed(batch))
+            return False
+        LOKI_PUSHES.labels(result="ok").inc()
+        return True
+
+    def _run(self) -> None:
+        failing = False
+        while True:
+            with self.cond:
+                if not self.closed and (failing or len(self.buffer) < self.batch_size):
+                    self.cond.wait(self.flush_interval)
+                closed = self.closed
+            ok = self._push()
+            while ok and len(self.buffer) >= self.batch_size:
+                ok = self._push()
+            # After a failed push wait a full interval before retrying.
+            failing = not ok
+            if closed:
+                while ok and self.buffer:
+                    ok = self._push()
+                return
+
+    def close(self) -> None:
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+        self.thread.join(timeout=self.flush_interval + 5)
+        self.client.close()
+        super().close()
+
+
+handlers: list = []
+listener = None
+
+
+def configure_logging() -> None:
+    """Install the queue handler and start the listener thread.
 
-handlers = [
-    logging.FileHandler(os.path.join(LOG_DIR, "interactions.log")),
-    logging.StreamHandler(),
-]
+    Idempotent; called by the entry points at startup rather than on import,
+    so importing the app does not create files or threads.
+    """
+    global listener
+    if listener is not None:
+        return
+    os.makedirs(LOG_DIR, exist_ok=True)
+    formatter = logging.Formatter(LOG_FORMAT)
 
-loki_url = os.getenv("LOKI_URL")
-if loki_url:
     handlers.append(
-        LokiHandler(
-            url=f"{loki_url.rstrip('/')}/loki/api/v1/push",
-            tags={"app": "telegram-corp-ai"},
-            version="1",
+        RotatingFileHandler(
+            os.path.join(LOG_DIR, "interactions.log"),
+            maxBytes=LOG_FILE_MAX_BYTES,
+            backupCount=LOG_FILE_BACKUPS,
         )
     )
+    handlers.append(logging.StreamHandler())
+
+    loki_url = os.getenv("LOKI_URL")
+    if loki_url:
+        handlers.append(
+            LokiBatchHandler(
+                url=f"{loki_url.rstrip('/')}/loki/api/v1/push",
+                labels={"app": "telegram-corp-ai"},
+                batch_size=LOKI_BATCH_SIZE,
+                flush_interval=LOKI_FLUSH_INTERVAL,
+                buffer_size=LOKI_BUFFER_SIZE,
+            )
+        )
+
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    # Callers only put records on a queue; formatting, file writes and Loki
+    # pushes happen on the listener thread.
+    log_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        handlers=[DroppingQueueHandler(log_queue)],
+    )
+    listener.start()
+    atexit.register(_shutdown)
+
+
+def _shutdown() -> None:
+    listener.stop()
+    for handler in handlers:
+        handler.close()
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s [%(name)s] %(message)s",
-    handlers=handlers,
-)
 
 interaction_logger = logging.getLogger("interaction")
+
+
+def _truncate(value):
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, default=str)
+    if len(text) > LOG_MAX_FIELD_CHARS:
+        return f"{text[:LOG_MAX_FIELD_CHARS]}...(+{len(text) - LOG_MAX_FIELD_CHARS} chars)"
+    return value
+
+
+class _Event:
+    """Message of a ``log_event`` record, serialized only when formatted."""
+
+    __slots__ = ("event", "fields")
+
+    def __init__(self, event: str, fields: dict):
+        self.event = event
+        self.fields = fields
+
+    def __str__(self) -> str:
+        return json.dumps(
+            {"event": self.event, **{key: _truncate(value) for key, value in self.fields.items()}},
+            ensure_ascii=False,
+            default=str,
+        )
+
+
+def log_event(event: str, level: int = logging.INFO, **fields) -> None:
+    """Log ``event`` with ``fields`` as one JSON object.
+
+    Info-level events are sampled by LOG_SAMPLE_RATES; warnings and errors
+    are always logged. Fields are serialized and cut to LOG_MAX_FIELD_CHARS
+    on the logging thread, so they must not be mutated afterwards.
+    """
+    if not interaction_logger.isEnabledFor(level):
+        return
+    if level < logging.WARNING:
+        rate = LOG_SAMPLE_RATES.get(event, 1.0)
+        if rate < 1.0 and random.random() >= rate:
+            LOG_RECORDS_DROPPED.labels(reason="sampled").inc()
+            return
+    interaction_logger.log(level, _Event(event, fields))
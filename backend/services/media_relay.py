@@ -0,0 +1,119 @@
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+from config.settings import MEDIA_INFLIGHT_BYTES
+from constants.prometheus_models import MEDIA_RELAY_INFLIGHT_BYTES
+
+
+class ByteBudget:
+    """Caps the bytes of media being relayed by this process at once."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.available = limit
+        self._cond = asyncio.Condition()
+
+    async def _release(self, size: int) -> None:
+        async with self._cond:
+            self.available += size
+            self._cond.notify_all()
+        MEDIA_RELAY_INFLIGHT_BYTES.set(self.limit - self.available)
+
+    @asynccontextmanager
+    async def reserve(self, size: int):
+        # A single file larger than the whole budget still gets through, alone.
+        size = min(size, self.limit)
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.available >= size)
+            self.available -= size
+        MEDIA_RELAY_INFLIGHT_BYTES.set(self.limit - self.available)
+        reservation = Reservation(self, size)
+        try:
+            yield reservation
+        finally:
+            await self._release(reservation.size)
+
+
+class Reservation:
+    """Bytes held from a ``ByteBudget``; see ``ByteBudget.reserve``."""
+
+    def __init__(self, budget: ByteBudget, size: int):
+        self.budget = budget
+        self.size = size
+
+    async def shrink(self, size: int) -> None:
+        """Give back whatever was reserved above ``size``."""
+        if 0 <= size < self.size:
+            excess, self.size = self.size - size, size
+            await self.budget._release(excess)
+
+
+budget = ByteBudget(MEDIA_INFLIGHT_BYTES)
+
+
+def content_length(headers) -> Optional[int]:
+    try:
+        return int(headers["Content-Length"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _quote(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\r", "").replace("\n", "")
+
+
+class MultipartUpload:
+    """multipart/form-data body whose file part is streamed from ``chunks``.
+
+    Only the form fields and part headers are built in memory. When the file
+    size is known up front the body length is too, so no chunked encoding is
+    needed.
+    """
+
+    def __init__(
+        self,
+        fields: Dict[str, str],
+        field_name: str,
+        filename: str,
+        mime: Optional[str],
+        chunks: AsyncIterator[bytes],
+        max_size: int,
+        size: Optional[int] = None,
+    ):
+        self.boundary = uuid.uuid4().hex
+        self.chunks = chunks
+        self.max_size = max_size
+        self.size = size
+
+        head = b"".join(
+            f'--{self.boundary}\r\nContent-Disposition: form-data; name="{_quote(name)}"\r\n\r\n'.encode()
+            + str(value).encode()
+            + b"\r\n"
+            for name, value in fields.items()
+        )
+        head += (
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="{_quote(field_name)}"; filename="{_quote(filename)}"\r\n'
+            f'Content-Type: {mime or "application/octet-stream"}\r\n\r\n'
+        ).encode()
+        self.head = head
+        self.tail = f"\r\n--{self.boundary}--\r\n".encode()
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        headers = {"Content-Type": f"multipart/form-data; boundary={self.boundary}"}
+        if self.size is not None:
+            headers["Content-Length"] = str(len(self.head) + self.size + len(self.tail))
+        return headers
+
+    async def stream(self) -> AsyncIterator[bytes]:
+        yield self.head
+        sent = 0
+        async for chunk in self.chunks:
+            sent += len(chunk)
+            if sent > self.max_size:
+                raise ValueError(f"File exceeds max file size of {self.max_size} bytes")
+            yield chunk
+        yield self.tail
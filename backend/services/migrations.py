@@ -0,0 +1,155 @@
+import asyncio
+
+from cryptography.fernet import InvalidToken
+from sqlalchemy import inspect, select, text
+
+from constants.postgres_models import (
+    BLIND_INDEX_KEY_STATE,
+    Base,
+    Bot,
+    MigrationState,
+    PassToken,
+    User,
+    blind_index,
+    blind_index_key_id,
+)
+from services.db import async_engine, get_session
+from services.logging_setup import interaction_logger
+
+BACKFILL_BATCH_SIZE = 500
+# Key of the session-level advisory lock held while migrating.
+MIGRATION_LOCK_ID = 7_142_301_561
+
+# create_all() does not alter tables that already exist, so columns and
+# indexes added after the first deploy are created here. Every statement is
+# idempotent.
+SCHEMA_DDL = (
+    'ALTER TABLE bots ADD COLUMN IF NOT EXISTS "ownerUuidHash" VARCHAR(64)',
+    'ALTER TABLE pass_tokens ADD COLUMN IF NOT EXISTS "uuidHash" VARCHAR(64)',
+    'ALTER TABLE users ADD COLUMN IF NOT EXISTS "phoneHash" VARCHAR(64)',
+    'CREATE INDEX IF NOT EXISTS ix_bots_owner_uuid_hash ON bots ("ownerUuidHash")',
+    'CREATE INDEX IF NOT EXISTS ix_pass_tokens_bot_id_uuid_hash ON pass_tokens (bot_id, "uuidHash")',
+    'CREATE INDEX IF NOT EXISTS ix_users_phone_hash ON users ("phoneHash")',
+    'CREATE INDEX IF NOT EXISTS ix_bot_user_user_id ON bot_user (user_id)',
+)
+
+
+def _user_phone(user: User) -> str:
+    try:
+        return user.get_phone()
+    except InvalidToken:
+        return user.phone.decode(errors="ignore")
+
+
+# (model, hash column, encrypted source column, hash of a row)
+BLIND_INDEXES = (
+    (Bot, Bot.ownerUuidHash, Bot.ownerUuid, lambda bot: blind_index(bot.get_owner_uuid())),
+    (PassToken, PassToken.uuidHash, PassToken.uuid, lambda token: blind_index(token.get_uuid())),
+    (User, User.phoneHash, User.phone, lambda user: User.phone_blind_index(_user_phone(user))),
+)
+
+
+def _compute(model, row, compute) -> str:
+    try:
+        return compute(row) or ""
+    except (InvalidToken, ValueError) as e:
+        # Undecryptable rows get an empty hash: they can't be looked up
+        # anyway, and must not be fetched again.
+        interaction_logger.warning(
+            f"Blind index of {model.__tablename__} {inspect(row).identity} skipped: {e!r}"
+        )
+        return ""
+
+
+async def _backfill(model, hash_column, source_column, compute) -> int:
+    filled = 0
+    while True:
+        async with get_session() as session:
+            rows = (
+                await session.scalars(
+                    select(model)
+                    .where(hash_column.is_(None), source_column.is_not(None))
+                    .limit(BACKFILL_BATCH_SIZE)
+                )
+            ).all()
+            for row in rows:
+                setattr(row, hash_column.key, _compute(model, row, compute))
+        filled += len(rows)
+        if len(rows) < BACKFILL_BATCH_SIZE:
+            return filled
+
+
+async def _rehash(model, hash_column, source_column, compute) -> int:
+    """Recompute every hash in place, batch by batch in primary key order.
+
+    Rows keep their old hash until their batch is rewritten, and lookups
+    fall back to decrypting while the stored key id is not the current one.
+    """
+    primary_key = model.__mapper__.primary_key[0]
+    rehashed, last = 0, None
+    while True:
+        async with get_session() as session:
+            query = select(model).where(source_column.is_not(None))
+            if last is not None:
+                query = query.where(primary_key > last)
+            rows = (
+                await session.scalars(query.order_by(primary_key).limit(BACKFILL_BATCH_SIZE))
+            ).all()
+            for row in rows:
+                setattr(row, hash_column.key, _compute(model, row, compute))
+            if rows:
+                last = getattr(rows[-1], primary_key.key)
+        rehashed += len(rows)
+        if len(rows) < BACKFILL_BATCH_SIZE:
+            return rehashed
+
+
+async def _stored_key_id() -> str | None:
+    async with get_session() as session:
+        state = await session.get(MigrationState, BLIND_INDEX_KEY_STATE)
+        return state.value if state is not None else None
+
+
+async def migrate_schema() -> None:
+    """Bring the database up to the current models.
+
+    Creates missing tables, adds missing columns and indexes, then fills
+    blind indexes for rows written before they existed. When BLIND_INDEX_KEY
+    changed since the last run, every blind index is recomputed.
+
+    Every worker calls this on startup; a Postgres advisory lock makes them
+    take turns, so the later ones find the schema migrated and do nothing.
+    """
+    async with async_engine.connect() as lock:
+        await lock.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        await lock.commit()
+        try:
+            await _migrate()
+        finally:
+            await lock.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+            await lock.commit()
+
+
+async def _migrate() -> None:
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        for statement in SCHEMA_DDL:
+            await conn.execute(text(statement))
+
+    key_id = blind_index_key_id()
+    # Hashes from before the key id was recorded count as another key.
+    rekeyed = await _stored_key_id() != key_id
+    step = _rehash if rekeyed else _backfill
+    filled = [await step(*spec) for spec in BLIND_INDEXES]
+    if rekeyed:
+        async with get_session() as session:
+            await session.merge(MigrationState(name=BLIND_INDEX_KEY_STATE, value=key_id))
+    if any(filled):
+        owners, tokens, phones = filled
+        interaction_logger.info(
+            f"Blind index backfill: bots={owners} pass_tokens={tokens} users={phones}"
+            + (" (recomputed for a new key)" if rekeyed else "")
+        )
+
+if __name__ == "__main__":
+    asyncio.run(migrate_schema())
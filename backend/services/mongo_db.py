@@ -1,11 +1,152 @@
-from pymongo import MongoClient
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Optional
 
-from config.settings import MONGO_HOST, MONGO_USERNAME, MONGO_PASSWORD, MONGO_DB
+import pymongo
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
+
+from config.settings import (
+    MONGO_HOST,
+    MONGO_USERNAME,
+    MONGO_PASSWORD,
+    MONGO_DB,
+    MONGO_LOG_QUEUE_SIZE,
+    MONGO_LOG_BATCH_SIZE,
+    MONGO_LOG_FLUSH_INTERVAL,
+)
+from constants.prometheus_models import MONGO_LOG_DOCUMENTS, MONGO_LOG_QUEUE_DEPTH
 
 uri = f"mongodb://{MONGO_USERNAME}:{MONGO_PASSWORD}@{MONGO_HOST}"
 
-client = MongoClient(uri)
-db = client[str(MONGO_DB)]
+# Created on first use (or by connect() during startup) so importing this
+# module does not start pymongo's monitor threads.
+client: Optional[MongoClient] = None
+db = None
+
+logger = logging.getLogger(__name__)
+
+
+def connect() -> None:
+    global client, db
+    if client is None:
+        client = MongoClient(uri)
+        db = client[str(MONGO_DB)]
+
+
+def _database():
+    if db is None:
+        connect()
+    return db
+
+
+def ping(timeout: Optional[float] = None) -> None:
+    connect()
+    with pymongo.timeout(timeout):
+        client.admin.command("ping")
+
+
+def close() -> None:
+    global client, db
+    if client is not None:
+        client.close()
+        client, db = None, None
+
+
+_STOP = object()
+
+
+class MessageLogWriter:
+    """Buffers message log documents and writes them with ``insert_many``.
+
+    A batch is flushed once it holds ``batch_size`` documents or
+    ``flush_interval`` seconds after its first one, whichever comes first.
+    The queue is bounded: when Mongo falls behind, new documents are dropped
+    and counted rather than holding up message delivery.
+    """
+
+    def __init__(self, maxsize: int, batch_size: int, flush_interval: float):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.task: Optional[asyncio.Task] = None
+
+    def put(self, source: str, document: dict) -> None:
+        try:
+            self.queue.put_nowait((source, document))
+        except asyncio.QueueFull:
+            MONGO_LOG_DOCUMENTS.labels(result="dropped").inc()
+            return
+        MONGO_LOG_QUEUE_DEPTH.set(self.queue.qsize())
+
+    def start(self) -> None:
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Write everything queued so far, then stop."""
+        if self.task is None:
+            return
+        # Never wait on a writer that already died: race the sentinel put
+        # (which blocks while the queue is full) against the task itself.
+        put = asyncio.ensure_future(self.queue.put(_STOP))
+        await asyncio.wait({put, self.task}, return_when=asyncio.FIRST_COMPLETED)
+        put.cancel()
+        try:
+            await self.task
+        except Exception as e:
+            logger.error(f"Mongo log writer failed: {e}")
+        self.task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self.queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            stopping = False
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            MONGO_LOG_QUEUE_DEPTH.set(self.queue.qsize())
+            await self._write(batch)
+            if stopping:
+                return
+
+    async def _write(self, batch: list) -> None:
+        by_source = defaultdict(list)
+        for source, document in batch:
+            by_source[source].append(document)
+        for source, documents in by_source.items():
+            try:
+                await asyncio.to_thread(_database()[source].insert_many, documents, ordered=False)
+                MONGO_LOG_DOCUMENTS.labels(result="written").inc(len(documents))
+            except BulkWriteError as e:
+                written = e.details.get("nInserted", 0)
+                MONGO_LOG_DOCUMENTS.labels(result="written").inc(written)
+                MONGO_LOG_DOCUMENTS.labels(result="failed").inc(len(documents) - written)
+                logger.error(f"Mongo log write to {source} partly failed: {e}")
+            except Exception as e:
+                # Includes bson's InvalidDocument / DocumentTooLarge, which are
+                # not PyMongoErrors; a bad batch must not end the writer.
+                MONGO_LOG_DOCUMENTS.labels(result="failed").inc(len(documents))
+                logger.error(f"Mongo log write to {source} failed: {e}")
+
+
+log_writer = MessageLogWriter(MONGO_LOG_QUEUE_SIZE, MONGO_LOG_BATCH_SIZE, MONGO_LOG_FLUSH_INTERVAL)
+
 
 def insert_message(
         source: str,
@@ -18,8 +159,7 @@ def insert_message(
         received_body: dict = {}, 
         sent_body: dict = {}
         ) -> None:
-    collection = db[source]
-
+    """Queue a message log document; must be called from the event loop."""
     document = {
         'bot_id': bot_id,
         'user_id': user_id,
@@ -31,39 +171,125 @@ def insert_message(
         'sent_body': sent_body
     }
 
-    collection.insert_one(document)
+    log_writer.put(source, document)
 
-def save_variable(bot_id: int, user_id: int, name: str, value: any):
-    collection = db['variables']
+CONTACT_VARIABLES = "contact_variables"
+# Pre-1.x layout, one document per variable; merged into CONTACT_VARIABLES
+# by migrate_legacy_variables() and then renamed away.
+LEGACY_VARIABLES = "variables"
+MIGRATION_BATCH_SIZE = 500
 
-    filter = {
-        'bot_id': bot_id,
-        'user_id': user_id,
-        'name': name
-    }
 
-    update = {
-        "$set":
-            {
-                'bot_id': bot_id,
-                'user_id': user_id,
-                'name': name,
-                'value': value
-            }
+def _field(name: str) -> str:
+    """Escape a variable name for use as a key inside the variables map."""
+    return name.replace("%", "%25").replace(".", "%2E").replace("$", "%24")
+
+
+def _name(field: str) -> str:
+    return field.replace("%24", "$").replace("%2E", ".").replace("%25", "%")
+
+
+def check_names(names) -> None:
+    """Reject names that cannot be stored, such as "" (the path ``variables.``)."""
+    if any(not isinstance(name, str) or not name for name in names):
+        raise ValueError("Variable names must be non-empty strings")
+
+
+def ensure_indexes() -> None:
+    _database()[CONTACT_VARIABLES].create_index([("bot_id", 1), ("user_id", 1)], unique=True)
+
+
+def migrate_legacy_variables() -> int:
+    """Merge legacy one-document-per-variable records into CONTACT_VARIABLES.
+
+    Values already in the new layout win. The legacy collection is renamed
+    afterwards, so this is a no-op on later startups. Returns the number of
+    contacts merged.
+    """
+    database = _database()
+    if LEGACY_VARIABLES not in database.list_collection_names():
+        return 0
+    legacy = database[LEGACY_VARIABLES]
+    contacts = 0
+    requests = []
+    current, variables = None, {}
+
+    def flush_contact():
+        if current is None or not variables:
+            return
+        bot_id, user_id = current
+        requests.append(UpdateOne(
+            {'bot_id': bot_id, 'user_id': user_id},
+            [{"$set": {"variables": {"$mergeObjects": [{"$literal": variables}, "$variables"]}}}],
+            upsert=True,
+        ))
+
+    cursor = legacy.find({}, {"bot_id": 1, "user_id": 1, "name": 1, "value": 1}).sort(
+        [("bot_id", 1), ("user_id", 1), ("_id", 1)]
+    )
+    for document in cursor:
+        contact = (document.get("bot_id"), document.get("user_id"))
+        if contact != current:
+            flush_contact()
+            current, variables = contact, {}
+            contacts += 1
+        if document.get("name"):
+            # The first document of a name wins, as it did on the old read path.
+            variables.setdefault(_field(str(document["name"])), str(document.get("value")))
+        if len(requests) >= MIGRATION_BATCH_SIZE:
+            database[CONTACT_VARIABLES].bulk_write(requests, ordered=False)
+            requests = []
+    flush_contact()
+    if requests:
+        database[CONTACT_VARIABLES].bulk_write(requests, ordered=False)
+
+    try:
+        legacy.rename(f"{LEGACY_VARIABLES}_migrated")
+    except OperationFailure as e:
+        # Another worker migrated concurrently; the merge is idempotent.
+        logger.warning(f"Legacy variables collection not renamed: {e}")
+    logger.info(f"Migrated legacy variables of {contacts} contacts")
+    return contacts
+
+
+def save_variables(bot_id: int, user_id: int, variables: dict) -> None:
+    """Set many variables of a contact in one atomic update."""
+    if not variables:
+        return
+    check_names(variables)
+    _database()[CONTACT_VARIABLES].update_one(
+        {'bot_id': bot_id, 'user_id': user_id},
+        {"$set": {f"variables.{_field(name)}": value for name, value in variables.items()}},
+        upsert=True,
+    )
+
+
+def get_variables(bot_id: int, user_id: int, names: list[str] | None = None) -> dict:
+    """Return variables of a contact as strings; all of them if ``names`` is None.
+
+    Requested names that are not set come back as "".
+    """
+    if names:
+        check_names(names)
+    projection = (
+        {f"variables.{_field(name)}": 1 for name in names} if names else {"variables": 1}
+    )
+    document = _database()[CONTACT_VARIABLES].find_one(
+        {'bot_id': bot_id, 'user_id': user_id}, projection
+    )
+    found = {
+        _name(field): str(value)
+        for field, value in ((document or {}).get("variables") or {}).items()
     }
 
-    collection.update_one(filter, update, upsert=True)
+    if names:
+        return {name: found.get(name, "") for name in names}
+    return found
 
-def get_variable(bot_id: int, user_id: int, name: str) -> str:
-    collection = db['variables']
 
-    document = collection.find_one({
-        'bot_id': bot_id,
-        'user_id': user_id,
-        'name': name
-    })
+def save_variable(bot_id: int, user_id: int, name: str, value: any):
+    save_variables(bot_id, user_id, {name: value})
 
-    if document is None:
-        return ""
 
-    return str(document['value'])
+def get_variable(bot_id: int, user_id: int, name: str) -> str:
+    return get_variables(bot_id, user_id, [name])[name]
@@ -0,0 +1,185 @@
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+import services.db as db
+import services.mongo_db as mdb
+import services.sender_adapter as sa
+
+
+class PermanentSendError(Exception):
+    """Raised when retrying a job can not succeed (unknown bot, bad media)."""
+
+
+def _keyboards(inline_buttons, quick_replies) -> Dict[str, Any]:
+    reply_keyboard = None
+    if quick_replies:
+        reply_keyboard = [
+            [
+                {
+                    **{"text": qr.text},
+                    **({"request_contact": True} if qr.type.lower() == "phone" else {}),
+                    **({"request_location": True} if qr.type.lower() in {"geolocation", "location"} else {}),
+                }
+                for qr in row
+            ]
+            for row in quick_replies
+        ]
+    if inline_buttons:
+        inline_buttons = [[button.model_dump() for button in row] for row in inline_buttons]
+    return {
+        "inline_buttons": inline_buttons,
+        "reply_keyboard": reply_keyboard,
+        "remove_keyboard": not inline_buttons and not quick_replies,
+    }
+
+
+def text_job(bot_id, request) -> Dict[str, Any]:
+    """Describe a constructor text send as a JSON-serializable job."""
+    return {
+        "kind": "text",
+        "bot_id": bot_id,
+        "chat_id": request.chat.contact,
+        "text": request.text,
+        "operator": request.chat.operator or "",
+        "received_body": request.model_dump(),
+        **_keyboards(request.inlineButtons, request.quickReplies),
+    }
+
+
+def media_job(bot_id, request) -> Dict[str, Any]:
+    """Describe a constructor media send as a JSON-serializable job."""
+    return {
+        "kind": "media",
+        "bot_id": bot_id,
+        "chat_id": request.chat.contact,
+        "file_type": request.file.type,
+        "file_url": request.file.url,
+        "file_mime": request.file.mime,
+        "caption": request.caption,
+        "operator": request.chat.operator or "",
+        "received_body": request.model_dump(),
+        **_keyboards(request.inlineButtons, request.quickReplies),
+    }
+
+
+def broadcast_job(bot_id, request) -> Dict[str, Any]:
+    """Describe a broadcast as a job template; ``chat_id`` is set per recipient."""
+    job = {
+        "bot_id": bot_id,
+        "chat_id": None,
+        "operator": "",
+        "received_body": request.model_dump(),
+        **_keyboards(request.inlineButtons, request.quickReplies),
+    }
+    if request.file:
+        return {
+            **job,
+            "kind": "media",
+            "file_type": request.file.type,
+            "file_url": request.file.url,
+            "file_mime": request.file.mime,
+            "caption": request.caption,
+        }
+    return {**job, "kind": "text", "text": request.text}
+
+
+def _reply_markup(job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if job["inline_buttons"]:
+        return {"inline_keyboard": job["inline_buttons"]}
+    if job["reply_keyboard"]:
+        return {
+            "keyboard": job["reply_keyboard"],
+            "resize_keyboard": True,
+            "one_time_keyboard": True,
+        }
+    if job["remove_keyboard"]:
+        return {"remove_keyboard": True}
+    return None
+
+
+def _log(job: Dict[str, Any], response: Dict[str, Any], text: str, attachments: List[dict], sent_payload: dict) -> None:
+    mdb.insert_message(
+        source="ConstructorMessages",
+        bot_id=int(job["bot_id"]),
+        user_id=int(job["chat_id"]),
+        message_id=response.get("body", {}).get("result", {}).get("message_id", 0),
+        participant_name=job["operator"],
+        text=text,
+        attachments=attachments,
+        received_body=job["received_body"],
+        sent_body=sent_payload,
+    )
+
+
+async def deliver(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Send one job through ``sender_adapter`` and log it to Mongo.
+
+    Returns the sender result (``status_code`` and ``body``).
+    """
+    token = await db.get_bot_token(int(job["bot_id"]))
+    if not token:
+        raise PermanentSendError(f"Bot {job['bot_id']} not found")
+
+    chat_id = job["chat_id"]
+    reply_markup = _reply_markup(job)
+
+    if job["kind"] == "text":
+        response = await sa.send_message(
+            token,
+            chat_id,
+            job["text"],
+            inline_buttons=job["inline_buttons"],
+            reply_keyboard=job["reply_keyboard"],
+            remove_keyboard=job["remove_keyboard"],
+            bot_id=job["bot_id"],
+        )
+        sent_payload = {"chat_id": chat_id, "text": job["text"], "parse_mode": "HTML"}
+        if reply_markup:
+            sent_payload["reply_markup"] = reply_markup
+        _log(job, response, job["text"], [], sent_payload)
+        return response
+
+    file_type, file_url, file_mime = job["file_type"], job["file_url"], job["file_mime"]
+    caption = job["caption"]
+    try:
+        response = await sa.send_media(
+            token,
+            chat_id,
+            file_type,
+            file_url,
+            file_mime,
+            caption,
+            inline_buttons=job["inline_buttons"],
+            reply_keyboard=job["reply_keyboard"],
+            remove_keyboard=job["remove_keyboard"],
+            bot_id=job["bot_id"],
+        )
+    except ValueError as e:
+        raise PermanentSendError(str(e)) from e
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code < 500 and e.response.status_code != 429:
+            raise PermanentSendError(f"Media download failed: {e}") from e
+        raise
+
+    sent_payload = {"chat_id": str(chat_id)}
+    if caption and file_type in ["image", "video", "document"]:
+        sent_payload["caption"] = caption[:1024]
+    if reply_markup:
+        sent_payload["reply_markup"] = reply_markup
+    sent_payload["file_type"] = file_type
+    sent_payload["file_url"] = file_url
+    sent_payload["file_mime"] = file_mime
+    _log(
+        job,
+        response,
+        caption or "",
+        [{"type": file_type, "url": file_url, "mime": file_mime}],
+        sent_payload,
+    )
+    return response
+
+
+def is_retryable(response: Dict[str, Any]) -> bool:
+    status = response["status_code"]
+    return status == 429 or status >= 500
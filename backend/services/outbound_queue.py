@@ -0,0 +1,207 @@
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+import redis
+
+import constants.redis_models as rdb
+from config.settings import (
+    OUTBOUND_STREAM,
+    OUTBOUND_DEAD_LETTER_STREAM,
+    OUTBOUND_GROUP,
+    OUTBOUND_STREAM_MAXLEN,
+    OUTBOUND_MAX_ATTEMPTS,
+    OUTBOUND_RETRY_BASE_DELAY,
+    OUTBOUND_RETRY_MAX_DELAY,
+    OUTBOUND_CLAIM_IDLE_MS,
+    OUTBOUND_BATCH_SIZE,
+)
+from constants.prometheus_models import OUTBOUND_JOBS, OUTBOUND_QUEUE_LAG
+from services.logging_setup import interaction_logger
+from services.outbound import PermanentSendError, deliver, is_retryable
+
+# Retries wait here, scored by the time they become due, so a backing-off
+# job never blocks a consumer.
+DELAYED_KEY = f"{OUTBOUND_STREAM}:delayed"
+
+# ZREM decides which worker owns a due retry; doing it in the same script as
+# the XADD means a crash can neither lose nor duplicate the job.
+_promote_script = rdb.redis_client.register_script("""
+if redis.call('ZREM', KEYS[1], ARGV[1]) == 1 then
+    return redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[2], '*',
+        'job', ARGV[3], 'attempts', ARGV[4], 'queued_at', ARGV[5])
+end
+return false
+""")
+
+
+async def enqueue(job: Dict[str, Any], attempts: int = 0) -> str:
+    """Append a job to the outbound stream and return its entry id."""
+    return await rdb.redis_client.xadd(
+        OUTBOUND_STREAM,
+        {"job": json.dumps(job), "attempts": attempts, "queued_at": time.time()},
+        maxlen=OUTBOUND_STREAM_MAXLEN,
+        approximate=True,
+    )
+
+
+async def ensure_group() -> None:
+    try:
+        await rdb.redis_client.xgroup_create(
+            OUTBOUND_STREAM, OUTBOUND_GROUP, id="0", mkstream=True
+        )
+    except redis.ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+def _backoff(attempts: int) -> float:
+    return min(OUTBOUND_RETRY_BASE_DELAY * 2 ** (attempts - 1), OUTBOUND_RETRY_MAX_DELAY)
+
+
+async def _dead_letter(entry_id: str, fields: Dict[str, str], attempts: int, reason: str) -> None:
+    pipe = rdb.redis_client.pipeline()
+    pipe.xadd(
+        OUTBOUND_DEAD_LETTER_STREAM,
+        {
+            **fields,
+            "attempts": attempts,
+            "source_id": entry_id,
+            "error": reason,
+            "failed_at": time.time(),
+        },
+        maxlen=OUTBOUND_STREAM_MAXLEN,
+        approximate=True,
+    )
+    pipe.xack(OUTBOUND_STREAM, OUTBOUND_GROUP, entry_id)
+    pipe.xdel(OUTBOUND_STREAM, entry_id)
+    await pipe.execute()
+    OUTBOUND_JOBS.labels(result="dead_letter").inc()
+    interaction_logger.error(f"Outbound job {entry_id} dead-lettered: {reason}")
+
+
+async def _retry(entry_id: str, fields: Dict[str, str], attempts: int, reason: str) -> None:
+    if attempts >= OUTBOUND_MAX_ATTEMPTS:
+        await _dead_letter(entry_id, fields, attempts, reason)
+        return
+    delayed = json.dumps({**fields, "attempts": attempts})
+    pipe = rdb.redis_client.pipeline()
+    pipe.zadd(DELAYED_KEY, {delayed: time.time() + _backoff(attempts)})
+    pipe.xack(OUTBOUND_STREAM, OUTBOUND_GROUP, entry_id)
+    pipe.xdel(OUTBOUND_STREAM, entry_id)
+    await pipe.execute()
+    OUTBOUND_JOBS.labels(result="retry").inc()
+    interaction_logger.warning(
+        f"Outbound job {entry_id} failed (attempt {attempts}), retrying: {reason}"
+    )
+
+
+async def _process(entry_id: str, fields: Dict[str, str]) -> None:
+    attempts = int(fields.get("attempts", 0)) + 1
+    OUTBOUND_QUEUE_LAG.observe(max(time.time() - float(fields.get("queued_at", time.time())), 0))
+    try:
+        response = await deliver(json.loads(fields["job"]))
+    except PermanentSendError as e:
+        await _dead_letter(entry_id, fields, attempts, str(e))
+        return
+    except Exception as e:
+        await _retry(entry_id, fields, attempts, str(e))
+        return
+
+    if response["status_code"] == 200:
+        pipe = rdb.redis_client.pipeline()
+        pipe.xack(OUTBOUND_STREAM, OUTBOUND_GROUP, entry_id)
+        pipe.xdel(OUTBOUND_STREAM, entry_id)
+        await pipe.execute()
+        OUTBOUND_JOBS.labels(result="sent").inc()
+    elif is_retryable(response):
+        await _retry(entry_id, fields, attempts, json.dumps(response["body"]))
+    else:
+        await _dead_letter(entry_id, fields, attempts, json.dumps(response["body"]))
+
+
+async def _promote_due() -> None:
+    """Move retries whose backoff has elapsed back onto the stream."""
+    due = await rdb.redis_client.zrangebyscore(
+        DELAYED_KEY, 0, time.time(), start=0, num=OUTBOUND_BATCH_SIZE
+    )
+    for member in due:
+        fields = json.loads(member)
+        await _promote_script(
+            keys=[DELAYED_KEY, OUTBOUND_STREAM],
+            args=[member, OUTBOUND_STREAM_MAXLEN, fields["job"], fields["attempts"], time.time()],
+        )
+
+
+async def _claim_stale(consumer: str) -> List:
+    """Take over entries left pending by a worker that died mid-send."""
+    _, entries, *_ = await rdb.redis_client.xautoclaim(
+        OUTBOUND_STREAM,
+        OUTBOUND_GROUP,
+        consumer,
+        min_idle_time=OUTBOUND_CLAIM_IDLE_MS,
+        count=OUTBOUND_BATCH_SIZE,
+    )
+    return entries
+
+
+async def run_worker(consumer: str, stop: asyncio.Event) -> None:
+    """Drain the outbound stream until ``stop`` is set."""
+    await ensure_group()
+    interaction_logger.info(f"Outbound worker {consumer} started")
+    while not stop.is_set():
+        try:
+            await _promote_due()
+            entries = await _claim_stale(consumer)
+            if not entries:
+                response = await rdb.redis_client.xreadgroup(
+                    OUTBOUND_GROUP,
+                    consumer,
+                    {OUTBOUND_STREAM: ">"},
+                    count=OUTBOUND_BATCH_SIZE,
+                    block=1000,
+                )
+                entries = response[0][1] if response else []
+            await asyncio.gather(
+                *(_process(entry_id, fields) for entry_id, fields in entries if fields)
+            )
+        except redis.RedisError as e:
+            interaction_logger.error(f"Outbound worker {consumer} Redis error: {e}")
+            await asyncio.sleep(1)
+    interaction_logger.info(f"Outbound worker {consumer} stopped")
+
+
+async def dead_letters(count: int = 100, after: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Return dead-lettered jobs, oldest first."""
+    start = f"({after}" if after else "-"
+    entries = await rdb.redis_client.xrange(
+        OUTBOUND_DEAD_LETTER_STREAM, min=start, max="+", count=count
+    )
+    return [
+        {
+            "id": entry_id,
+            "sourceId": fields.get("source_id"),
+            "attempts": int(fields.get("attempts", 0)),
+            "error": fields.get("error"),
+            "failedAt": float(fields.get("failed_at", 0)),
+            "job": json.loads(fields["job"]),
+        }
+        for entry_id, fields in entries
+    ]
+
+
+async def replay(entry_id: str) -> Optional[str]:
+    """Move a dead-lettered job back onto the outbound stream.
+
+    Returns the new entry id, or None if ``entry_id`` is unknown.
+    """
+    entries = await rdb.redis_client.xrange(
+        OUTBOUND_DEAD_LETTER_STREAM, min=entry_id, max=entry_id
+    )
+    if not entries:
+        return None
+    _, fields = entries[0]
+    if not await rdb.redis_client.xdel(OUTBOUND_DEAD_LETTER_STREAM, entry_id):
+        return None
+    return await enqueue(json.loads(fields["job"]))
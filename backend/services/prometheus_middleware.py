@@ -0,0 +1,52 @@
+from time import perf_counter
+
+from constants.prometheus_models import (
+    REQUEST_COUNT,
+    REQUEST_LATENCY,
+    REQUESTS_IN_PROGRESS,
+    RESPONSE_SIZE,
+)
+
+# Label for requests that matched no route, so scanners probing random paths
+# can not create new series.
+UNMATCHED = "<unmatched>"
+
+
+class PrometheusMiddleware:
+    """Pure ASGI middleware recording request count, latency and size.
+
+    Requests are labelled by the template of the matched route
+    (``/webhook/{bot_id}``), which the router leaves in the scope, so the
+    number of series does not grow with bots or users.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal size
+            if message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        in_progress = REQUESTS_IN_PROGRESS.labels(method=method)
+        in_progress.inc()
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            latency = perf_counter() - start
+            in_progress.dec()
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or UNMATCHED
+            REQUEST_COUNT.labels(method=method, endpoint=endpoint).inc()
+            REQUEST_LATENCY.labels(method=method, endpoint=endpoint).observe(latency)
+            RESPONSE_SIZE.labels(method=method, endpoint=endpoint).observe(size)
@@ -0,0 +1,149 @@
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+import httpx
+
+from config.settings import (
+    TELEGRAM_BOT_RATE,
+    TELEGRAM_CHAT_RATE,
+    TELEGRAM_GROUP_RATE,
+    TELEGRAM_SEND_MAX_RETRIES,
+)
+from constants.prometheus_models import (
+    TELEGRAM_SEND_QUEUE_DEPTH,
+    TELEGRAM_SEND_WAIT,
+    TELEGRAM_SEND_RETRIES,
+)
+from services.cache import TTLCache
+from services.logging_setup import interaction_logger
+
+# Idle buckets are refilled anyway, so forgetting them a minute after their
+# last reservation is due is safe.
+BUCKET_IDLE_TTL = 60
+
+
+class TokenBucket:
+    """Token bucket that hands out reservations instead of rejecting.
+
+    ``reserve`` takes a token immediately and returns how long the caller has
+    to wait for it, so concurrent senders are served in arrival order.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        self._refill()
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def pause(self, seconds: float) -> None:
+        """Hand out nothing for at least ``seconds`` (Telegram's retry_after).
+
+        Concurrent 429s carry the same retry_after, so they don't stack.
+        """
+        self._refill()
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+    def debt(self) -> float:
+        """Seconds until every reservation handed out so far is due."""
+        return max(0.0, -self.tokens / self.rate)
+
+
+_bot_buckets = TTLCache(maxsize=10000, ttl=BUCKET_IDLE_TTL)
+_chat_buckets = TTLCache(maxsize=100000, ttl=BUCKET_IDLE_TTL)
+
+
+def _bucket(buckets: TTLCache, key, rate: float) -> TokenBucket:
+    bucket = buckets.get(key)
+    if bucket is None:
+        bucket = TokenBucket(rate, max(rate, 1))
+    return bucket
+
+
+def _keep(buckets: TTLCache, key, bucket: TokenBucket) -> None:
+    # A bucket still owed tokens must outlive its debt; a fresh one would let
+    # sends through over the limit.
+    buckets.set(key, bucket, ttl=BUCKET_IDLE_TTL + bucket.debt())
+
+
+def _reserve(buckets: TTLCache, key, rate: float) -> float:
+    bucket = _bucket(buckets, key, rate)
+    delay = bucket.reserve()
+    _keep(buckets, key, bucket)
+    return delay
+
+
+def _pause(buckets: TTLCache, key, rate: float, seconds: float) -> None:
+    bucket = _bucket(buckets, key, rate)
+    bucket.pause(seconds)
+    _keep(buckets, key, bucket)
+
+
+def _chat_rate(chat_id) -> float:
+    # Group and channel ids are negative and have a much lower limit.
+    try:
+        return TELEGRAM_GROUP_RATE if int(chat_id) < 0 else TELEGRAM_CHAT_RATE
+    except (TypeError, ValueError):
+        return TELEGRAM_CHAT_RATE
+
+
+async def _acquire(bot_key: str, chat_id) -> None:
+    started = time.monotonic()
+    TELEGRAM_SEND_QUEUE_DEPTH.inc()
+    try:
+        # The chat slot comes first so that a message parked behind a slow
+        # chat does not hold one of the bot's slots while it waits.
+        delay = _reserve(_chat_buckets, (bot_key, str(chat_id)), _chat_rate(chat_id))
+        if delay:
+            await asyncio.sleep(delay)
+        delay = _reserve(_bot_buckets, bot_key, TELEGRAM_BOT_RATE)
+        if delay:
+            await asyncio.sleep(delay)
+    finally:
+        TELEGRAM_SEND_QUEUE_DEPTH.dec()
+        TELEGRAM_SEND_WAIT.observe(time.monotonic() - started)
+
+
+def _retry_after(response: httpx.Response) -> float | None:
+    if response.status_code != 429:
+        return None
+    try:
+        return float(response.json()["parameters"]["retry_after"])
+    except (ValueError, KeyError, TypeError):
+        return 1.0
+
+
+async def send(
+    token: str,
+    chat_id,
+    call: Callable[[], Awaitable[httpx.Response]],
+) -> httpx.Response:
+    """Run ``call`` once the bot and the chat are within Telegram's limits.
+
+    ``call`` is invoked again after a 429, so it must rebuild its request
+    body. Limits are enforced per process; 429 handling covers the rest.
+    """
+    bot_key = token.split(":", 1)[0]
+    for attempt in range(TELEGRAM_SEND_MAX_RETRIES + 1):
+        await _acquire(bot_key, chat_id)
+        response = await call()
+        retry_after = _retry_after(response)
+        if retry_after is None or attempt == TELEGRAM_SEND_MAX_RETRIES:
+            return response
+        interaction_logger.warning(
+            f"Telegram flood control for bot {bot_key} chat {chat_id}, retrying in {retry_after}s"
+        )
+        TELEGRAM_SEND_RETRIES.inc()
+        _pause(_bot_buckets, bot_key, TELEGRAM_BOT_RATE, retry_after)
+        _pause(_chat_buckets, (bot_key, str(chat_id)), _chat_rate(chat_id), retry_after)
+    return response
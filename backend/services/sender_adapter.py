@@ -1,13 +1,29 @@
 import httpx
 import json
-from io import BytesIO
+import time
 from datetime import datetime
 from datetime import datetime, timezone
+from urllib.parse import urlparse
 from services.helper_functions import guess_filename
+import services.telegram_client as tg
+import services.send_scheduler as scheduler
+import services.media_relay as media_relay
+import services.text_stats as text_stats
 from typing import List, Optional, Dict, Any
-from constants.prometheus_models import MESSAGE_COUNT, MESSAGE_TEXT_COUNT
-from config.settings import INTEGRATION_URL, INTEGRATION_CODE, INTEGRATION_TOKEN
-from services.logging_setup import interaction_logger
+import constants.redis_models as rdb
+from constants.prometheus_models import (
+    MESSAGE_COUNT,
+    MEDIA_FILE_ID_CACHE,
+    MEDIA_SEND_STRATEGY_RESULTS,
+)
+from config.settings import (
+    INTEGRATION_URL,
+    INTEGRATION_CODE,
+    INTEGRATION_TOKEN,
+    MEDIA_FILE_ID_REVALIDATE,
+    MEDIA_SEND_STRATEGY,
+)
+from services.logging_setup import log_event
 
 
 async def send_message(
@@ -28,14 +44,8 @@ async def send_message(
 
     if bot_id is not None:
         MESSAGE_COUNT.labels(direction="outgoing", bot_id=str(bot_id)).inc()
-        MESSAGE_TEXT_COUNT.labels(
-            direction="outgoing",
-            bot_id=str(bot_id),
-            text=text[:100],
-        ).inc()
-        interaction_logger.info(
-            f"OUTGOING bot_id={bot_id} chat_id={chat_id} text={text}"
-        )
+        text_stats.record(bot_id, "outgoing", text)
+        log_event("OUTGOING", bot_id=bot_id, chat_id=chat_id, text=text)
 
     if remove_keyboard:
         payload["reply_markup"] = {"remove_keyboard": True}
@@ -48,22 +58,99 @@ async def send_message(
             "one_time_keyboard": True,
         }
 
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(
-            f"https://api.telegram.org/bot{token}/sendMessage",
-            json=payload
-        )
+    resp = await scheduler.send(
+        token, chat_id, lambda: tg.post(token, "sendMessage", json=payload)
+    )
 
     result = {"status_code": resp.status_code, "body": resp.json()}
     if bot_id is not None:
-        interaction_logger.info(
-            f"SENT bot_id={bot_id} status={resp.status_code} response={result['body']}"
-        )
+        log_event("SENT", bot_id=bot_id, status=resp.status_code, response=result["body"])
     return result
 
 
     
     
+# Methods that let Telegram download the file from an HTTP URL itself.
+URL_PASS_THROUGH_METHODS = {"sendPhoto", "sendVideo", "sendDocument"}
+
+
+def _validator(headers) -> Optional[str]:
+    """Cheap identity of a file from its response headers."""
+    etag = headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return f"etag:{etag}"
+    last_modified = headers.get("Last-Modified")
+    length = headers.get("Content-Length")
+    if last_modified and length:
+        return f"lm:{last_modified}:{length}"
+    return None
+
+
+async def _media_validator(file_url: str) -> Optional[str]:
+    """Validator of the file currently behind ``file_url``, from a HEAD request."""
+    try:
+        response = await tg.get_download_client().head(file_url, follow_redirects=True)
+    except httpx.HTTPError:
+        return None
+    if response.status_code != 200:
+        return None
+    return _validator(response.headers)
+
+
+async def _try_url_first(method: str, file_url: str) -> bool:
+    if MEDIA_SEND_STRATEGY == "upload" or method not in URL_PASS_THROUGH_METHODS:
+        return False
+    if urlparse(file_url).scheme not in ("http", "https"):
+        return False
+    if MEDIA_SEND_STRATEGY == "url":
+        return True
+    return await rdb.MediaDomainStrategy.get(urlparse(file_url).hostname) != "upload"
+
+
+# Bot API descriptions of a 400 caused by Telegram failing to fetch a URL.
+URL_FETCH_ERRORS = (
+    "failed to get http url content",
+    "wrong file identifier/http url specified",
+    "wrong type of the web page content",
+)
+
+
+# Bot API descriptions of a 400 caused by an unusable file_id.
+FILE_ID_ERRORS = (
+    "file identifier",
+    "file_id",
+    "file reference",
+    "file_reference",
+    "type of file mismatch",
+)
+
+
+def _description_matches(response, errors) -> bool:
+    description = str(response.json().get("description", "")).lower()
+    return any(error in description for error in errors)
+
+
+def _url_fetch_failed(response) -> bool:
+    return _description_matches(response, URL_FETCH_ERRORS)
+
+
+def _file_id_rejected(response) -> bool:
+    return _description_matches(response, FILE_ID_ERRORS)
+
+
+async def _learn_strategy(file_url: str, strategy: str) -> None:
+    if MEDIA_SEND_STRATEGY == "auto":
+        await rdb.MediaDomainStrategy.set(urlparse(file_url).hostname, strategy)
+
+
+def _uploaded_file_id(body: Dict[str, Any], field_name: str) -> Optional[str]:
+    media = (body.get("result") or {}).get(field_name)
+    if isinstance(media, list):
+        # Photos come back in several sizes; the last one is the original.
+        media = media[-1] if media else None
+    return media.get("file_id") if media else None
+
+
 async def send_media(
     token: str,
     chat_id: int,
@@ -78,74 +165,139 @@ async def send_media(
 ):
     if bot_id is not None:
         MESSAGE_COUNT.labels(direction="outgoing", bot_id=str(bot_id)).inc()
-        MESSAGE_TEXT_COUNT.labels(
-            direction="outgoing",
-            bot_id=str(bot_id),
-            text=(caption or "")[:100],
-        ).inc()
-        interaction_logger.info(
-            f"OUTGOING_MEDIA bot_id={bot_id} chat_id={chat_id} type={file_type} caption={caption}"
+        text_stats.record(bot_id, "outgoing", caption or "")
+        log_event(
+            "OUTGOING_MEDIA", bot_id=bot_id, chat_id=chat_id, type=file_type, caption=caption
         )
-    async with httpx.AsyncClient() as client:
-        file_response = await client.get(file_url, follow_redirects=True)
-        file_response.raise_for_status()
-
-        content = file_response.content
-        file_size = len(content)
-
-        method_map = {
-            "Image": ("sendPhoto", "photo", 5 * 1024 * 1024),
-            "Video": ("sendVideo", "video", 20 * 1024 * 1024),
-            "Document": ("sendDocument", "document", 20 * 1024 * 1024),
-            "Audio": ("sendAudio", "audio", 5 * 1024 * 1024),
-            "Voice": ("sendVoice", "voice", 1 * 1024 * 1024)
-        }
+    method_map = {
+        "Image": ("sendPhoto", "photo", 5 * 1024 * 1024),
+        "Video": ("sendVideo", "video", 20 * 1024 * 1024),
+        "Document": ("sendDocument", "document", 20 * 1024 * 1024),
+        "Audio": ("sendAudio", "audio", 5 * 1024 * 1024),
+        "Voice": ("sendVoice", "voice", 1 * 1024 * 1024)
+    }
 
-        if file_type not in method_map:
-            raise ValueError(f"Unsupported file type: {file_type}")
-        
-        method, field_name, max_size = method_map[file_type]
-
-        if file_size > max_size:
-            raise ValueError(f"{file_type} exceeds max file size of {max_size} bytes")
-        
-        filename = guess_filename(file_url, file_response.headers)
-        
-        files = {
-            field_name: (filename, BytesIO(content), file_mime)
-        }
+    if file_type not in method_map:
+        raise ValueError(f"Unsupported file type: {file_type}")
+    
+    method, field_name, max_size = method_map[file_type]
 
-        data = {
-            "chat_id": str(chat_id),
-        }
-        if caption and file_type in ["image", "video", "document"]:
-            data["caption"] = caption[:1024]
-        if inline_buttons:
-            data["reply_markup"] = json.dumps({"inline_keyboard": inline_buttons})
-        elif reply_keyboard:
-            data["reply_markup"] = json.dumps({
-                "keyboard": reply_keyboard,
-                "resize_keyboard": True,
-                "one_time_keyboard": True,
-            })
-        elif remove_keyboard:
-            data["reply_markup"] = json.dumps({"remove_keyboard": True})
-
-        response = await client.post(
-            f"https://api.telegram.org/bot{token}/{method}",
-            data=data,
-            files=files
+    data = {
+        "chat_id": str(chat_id),
+    }
+    if caption and file_type in ["image", "video", "document"]:
+        data["caption"] = caption[:1024]
+    if inline_buttons:
+        data["reply_markup"] = json.dumps({"inline_keyboard": inline_buttons})
+    elif reply_keyboard:
+        data["reply_markup"] = json.dumps({
+            "keyboard": reply_keyboard,
+            "resize_keyboard": True,
+            "one_time_keyboard": True,
+        })
+    elif remove_keyboard:
+        data["reply_markup"] = json.dumps({"remove_keyboard": True})
+
+    async def upload():
+        # The download is piped straight into the upload, so a retry after a
+        # 429 has to download again. The budget is taken before the download
+        # starts so waiting senders hold no connections; once the size is
+        # known the unused part is handed back.
+        async with media_relay.budget.reserve(max_size) as reservation:
+            async with tg.get_download_client().stream("GET", file_url, follow_redirects=True) as file_response:
+                file_response.raise_for_status()
+                declared = media_relay.content_length(file_response.headers)
+                if declared is not None and declared > max_size:
+                    raise ValueError(f"{file_type} exceeds max file size of {max_size} bytes")
+                # A compressed download decodes to a different length.
+                if file_response.headers.get("Content-Encoding", "identity") != "identity":
+                    declared = None
+                if declared is not None:
+                    await reservation.shrink(declared)
+                uploaded_validator = _validator(file_response.headers)
+
+                body = media_relay.MultipartUpload(
+                    data,
+                    field_name,
+                    guess_filename(file_url, file_response.headers),
+                    file_mime,
+                    file_response.aiter_bytes(),
+                    max_size,
+                    declared,
+                )
+                response = await tg.post(token, method, content=body.stream(), headers=body.headers)
+                if response.status_code == 200 and uploaded_validator:
+                    uploaded_id = _uploaded_file_id(response.json(), field_name)
+                    if uploaded_id:
+                        await rdb.MediaFileId.set(bot_key, file_url, uploaded_validator, uploaded_id)
+                return response
+
+    bot_key = token.split(":", 1)[0]
+    # Only a cached file_id is worth a HEAD request: it tells whether the file
+    # behind the URL is still the one that was sent. Once confirmed, the
+    # file_id is reused without asking again for MEDIA_FILE_ID_REVALIDATE.
+    cached = await rdb.MediaFileId.get(bot_key, file_url)
+    file_id = None
+    if cached:
+        cached_validator, cached_id, checked_at = cached
+        if time.time() - checked_at < MEDIA_FILE_ID_REVALIDATE:
+            file_id = cached_id
+        elif await _media_validator(file_url) == cached_validator:
+            file_id = cached_id
+            await rdb.MediaFileId.touch(bot_key, file_url)
+    response = None
+    if file_id:
+        response = await scheduler.send(
+            token,
+            chat_id,
+            lambda: tg.post(token, method, data={**data, field_name: file_id}),
         )
+        if response.status_code == 200:
+            MEDIA_FILE_ID_CACHE.labels(result="hit").inc()
+        elif response.status_code == 400 and _file_id_rejected(response):
+            # The file_id went stale or belongs to content Telegram lost.
+            MEDIA_FILE_ID_CACHE.labels(result="rejected").inc()
+            await rdb.MediaFileId.delete(bot_key, file_url)
+            response = None
+    else:
+        MEDIA_FILE_ID_CACHE.labels(result="miss").inc()
 
-        result = {
-            "status_code": response.status_code,
-            "body": response.json()
-        }
-        if bot_id is not None:
-            interaction_logger.info(
-                f"SENT_MEDIA bot_id={bot_id} status={response.status_code} response={result['body']}"
-            )
-        return result
+    if response is None and await _try_url_first(method, file_url):
+        response = await scheduler.send(
+            token,
+            chat_id,
+            lambda: tg.post(token, method, data={**data, field_name: file_url}),
+        )
+        if response.status_code == 400 and _url_fetch_failed(response):
+            # Telegram could not fetch the URL; upload it ourselves. Other
+            # 400s (unknown chat, bad markup) would fail the upload as well.
+            MEDIA_SEND_STRATEGY_RESULTS.labels(strategy="url", result="rejected").inc()
+            await _learn_strategy(file_url, "upload")
+            response = None
+        elif response.status_code == 200:
+            MEDIA_SEND_STRATEGY_RESULTS.labels(strategy="url", result="sent").inc()
+            await _learn_strategy(file_url, "url")
+            # Telegram fetched the file itself, so its validator takes one
+            # HEAD request; later sends reuse the file_id.
+            sent_id = _uploaded_file_id(response.json(), field_name)
+            sent_validator = await _media_validator(file_url) if sent_id else None
+            if sent_validator:
+                await rdb.MediaFileId.set(bot_key, file_url, sent_validator, sent_id)
+
+    if response is None:
+        response = await scheduler.send(token, chat_id, upload)
+        if response.status_code == 200:
+            MEDIA_SEND_STRATEGY_RESULTS.labels(strategy="upload", result="sent").inc()
+
+    result = {
+        "status_code": response.status_code,
+        "body": response.json()
+    }
+    if bot_id is not None:
+        log_event(
+            "SENT_MEDIA", bot_id=bot_id, status=response.status_code, response=result["body"]
+        )
+    return result
 
 
 def _build_event_request(
@@ -163,9 +315,7 @@ def _build_event_request(
     if text is None or text == "":
         text = "default"
 
-    interaction_logger.info(
-        f"EVENT_BUILD timestamp={ts} date={date}"
-    )
+    log_event("EVENT_BUILD", timestamp=ts, date=date)
 
     result = {
         "eventType": "InboxReceived",
@@ -200,7 +350,7 @@ async def _forward_message(request_body: dict):
         "Authorization": f"Bearer {INTEGRATION_TOKEN}",
         "Content-Type": "application/json",
     }
-    interaction_logger.info(f"Sent: {request_body}")
+    log_event("FORWARD", request=request_body)
     async with httpx.AsyncClient() as client:
         return await client.post(
             f"{INTEGRATION_URL}/{INTEGRATION_CODE}/12/event",
@@ -0,0 +1,214 @@
+import asyncio
+import importlib.util
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+import httpx
+
+from config.settings import (
+    TELEGRAM_API_URL,
+    TELEGRAM_HTTP2,
+    TELEGRAM_MAX_CONNECTIONS,
+    TELEGRAM_MAX_KEEPALIVE_CONNECTIONS,
+    TELEGRAM_KEEPALIVE_EXPIRY,
+    TELEGRAM_TIMEOUT,
+    TELEGRAM_CONNECT_TIMEOUT,
+    TELEGRAM_FILE_CACHE_TTL,
+    TELEGRAM_FILE_CACHE_SIZE,
+    MEDIA_DOWNLOAD_MAX_CONNECTIONS,
+)
+from constants.prometheus_models import (
+    TELEGRAM_API_REQUESTS,
+    TELEGRAM_API_LATENCY,
+    TELEGRAM_API_IN_FLIGHT,
+    TELEGRAM_POOL_CONNECTIONS,
+)
+from services.cache import TTLCache
+from services.logging_setup import interaction_logger
+
+_client: Optional[httpx.AsyncClient] = None
+# Media downloads from arbitrary hosts get their own pool, so slow or stalled
+# downloads can't take the connections Bot API calls need.
+_download_client: Optional[httpx.AsyncClient] = None
+
+# Download paths returned by getFile stay valid for at least an hour.
+_file_paths = TTLCache(maxsize=TELEGRAM_FILE_CACHE_SIZE, ttl=TELEGRAM_FILE_CACHE_TTL)
+_file_path_lookups: dict[tuple[str, str], "asyncio.Future[Optional[str]]"] = {}
+
+
+def _http2_enabled() -> bool:
+    if not TELEGRAM_HTTP2:
+        return False
+    if importlib.util.find_spec("h2") is None:
+        interaction_logger.warning(
+            "TELEGRAM_HTTP2 is enabled but the 'h2' package is not installed, using HTTP/1.1"
+        )
+        return False
+    return True
+
+
+def _build_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=_http2_enabled(),
+        limits=httpx.Limits(
+            max_connections=TELEGRAM_MAX_CONNECTIONS,
+            max_keepalive_connections=TELEGRAM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=TELEGRAM_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(TELEGRAM_TIMEOUT, connect=TELEGRAM_CONNECT_TIMEOUT),
+    )
+
+
+def _build_download_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=MEDIA_DOWNLOAD_MAX_CONNECTIONS,
+            max_keepalive_connections=TELEGRAM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=TELEGRAM_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(TELEGRAM_TIMEOUT, connect=TELEGRAM_CONNECT_TIMEOUT),
+    )
+
+
+async def start() -> None:
+    """Create the shared client. Called from the application lifespan."""
+    global _client
+    if _client is None:
+        _client = _build_client()
+
+
+async def close() -> None:
+    """Close the shared clients and all pooled connections."""
+    global _client, _download_client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+    if _download_client is not None:
+        await _download_client.aclose()
+        _download_client = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it lazily outside of the lifespan."""
+    global _client
+    if _client is None:
+        _client = _build_client()
+    return _client
+
+
+def get_download_client() -> httpx.AsyncClient:
+    """Return the client for downloading media from third-party URLs."""
+    global _download_client
+    if _download_client is None:
+        _download_client = _build_download_client()
+    return _download_client
+
+
+def method_url(token: str, method: str) -> str:
+    return f"{TELEGRAM_API_URL}/bot{token}/{method}"
+
+
+def file_url(token: str, file_path: str) -> str:
+    return f"{TELEGRAM_API_URL}/file/bot{token}/{file_path}"
+
+
+def _observe_pool(client: httpx.AsyncClient) -> None:
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    connections = getattr(pool, "connections", None)
+    if connections is None:
+        return
+    idle = sum(1 for connection in connections if connection.is_idle())
+    TELEGRAM_POOL_CONNECTIONS.labels(state="idle").set(idle)
+    TELEGRAM_POOL_CONNECTIONS.labels(state="active").set(len(connections) - idle)
+
+
+async def _timed(
+    method: str,
+    client: httpx.AsyncClient,
+    call: Callable[[], Awaitable[httpx.Response]],
+) -> httpx.Response:
+    status = "error"
+    TELEGRAM_API_IN_FLIGHT.inc()
+    start = time.perf_counter()
+    try:
+        response = await call()
+        status = str(response.status_code)
+        return response
+    finally:
+        TELEGRAM_API_IN_FLIGHT.dec()
+        TELEGRAM_API_REQUESTS.labels(method=method, status=status).inc()
+        TELEGRAM_API_LATENCY.labels(method=method).observe(time.perf_counter() - start)
+        _observe_pool(client)
+
+
+async def post(token: str, method: str, **kwargs: Any) -> httpx.Response:
+    """POST to a Bot API method over the shared pooled client."""
+    client = get_client()
+    return await _timed(
+        method, client, lambda: client.post(method_url(token, method), **kwargs)
+    )
+
+
+async def get(token: str, method: str, **kwargs: Any) -> httpx.Response:
+    """GET a Bot API method over the shared pooled client."""
+    client = get_client()
+    return await _timed(
+        method, client, lambda: client.get(method_url(token, method), **kwargs)
+    )
+
+
+async def _fetch_file_path(token: str, file_id: str) -> Optional[str]:
+    response = await get(token, "getFile", params={"file_id": file_id})
+    data = response.json()
+    if not data.get("ok"):
+        interaction_logger.error(f"getFile failed: {data.get('description')}")
+        return None
+    return data["result"].get("file_path")
+
+
+class _LookupAbandoned(Exception):
+    """The caller running a shared getFile lookup was cancelled."""
+
+
+async def get_file_path(
+    token: str,
+    file_id: str,
+    file_unique_id: Optional[str] = None,
+) -> Optional[str]:
+    """Resolve ``file_id`` to a download path, cached and de-duplicated.
+
+    Concurrent lookups for the same file share a single getFile call.
+    """
+    key = (token.split(":", 1)[0], file_unique_id or file_id)
+    cached = _file_paths.get(key)
+    if cached is not None:
+        return cached
+
+    pending = _file_path_lookups.get(key)
+    while pending is not None:
+        try:
+            return await asyncio.shield(pending)
+        except _LookupAbandoned:
+            # Take over; another waiter may already have.
+            pending = _file_path_lookups.get(key)
+
+    future = asyncio.get_running_loop().create_future()
+    _file_path_lookups[key] = future
+    try:
+        file_path = await _fetch_file_path(token, file_id)
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()
+        raise
+    except BaseException:
+        # Cancelled: wake the waiters so one of them retries the lookup.
+        future.set_exception(_LookupAbandoned())
+        future.exception()
+        raise
+    else:
+        future.set_result(file_path)
+        if file_path:
+            _file_paths.set(key, file_path)
+        return file_path
+    finally:
+        _file_path_lookups.pop(key, None)
@@ -0,0 +1,213 @@
+import glob
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Tuple
+
+from prometheus_client.core import GaugeMetricFamily
+
+from config.settings import (
+    PROMETHEUS_MULTIPROC_DIR,
+    TEXT_STATS_CAPACITY,
+    TEXT_STATS_DUMP_INTERVAL,
+    TEXT_STATS_EXPORT_TOP,
+)
+from services.logging_setup import interaction_logger
+from constants.prometheus_models import scrape_registry
+
+
+class SpaceSaving:
+    """Space-Saving heavy hitters summary over a stream of strings.
+
+    Tracks at most ``capacity`` items. When a new item arrives and the
+    summary is full, it replaces an item with the smallest count and
+    inherits that count as its ``error``, so ``count - error`` is a lower
+    bound of the true frequency and ``count`` an upper bound.
+
+    Items are grouped in buckets by count (the stream-summary layout), so
+    both increments and evictions are O(1).
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        # count -> items with that count; dicts keep insertion order, so the
+        # oldest item of the smallest bucket is evicted first.
+        self.buckets: Dict[int, Dict[str, None]] = {}
+        self.min_count = 0
+
+    def _place(self, item: str, count: int) -> None:
+        self.counts[item] = count
+        self.buckets.setdefault(count, {})[item] = None
+
+    def _unplace(self, item: str) -> int:
+        count = self.counts.pop(item)
+        bucket = self.buckets[count]
+        del bucket[item]
+        if not bucket:
+            del self.buckets[count]
+        return count
+
+    def add(self, item: str) -> None:
+        if item in self.counts:
+            count = self._unplace(item)
+            self._place(item, count + 1)
+            if count == self.min_count and count not in self.buckets:
+                self.min_count = count + 1
+            return
+        if len(self.counts) < self.capacity:
+            self._place(item, 1)
+            self.errors[item] = 0
+            self.min_count = 1
+            return
+        floor = self.min_count
+        victim = next(iter(self.buckets[floor]))
+        self._unplace(victim)
+        del self.errors[victim]
+        self._place(item, floor + 1)
+        self.errors[item] = floor
+        if floor not in self.buckets:
+            self.min_count = floor + 1
+
+    def top(self, k: int) -> List[Tuple[str, int, int]]:
+        """Return up to ``k`` (item, count, error) tuples, most frequent first."""
+        result = []
+        for count in sorted(self.buckets, reverse=True):
+            for item in self.buckets[count]:
+                if len(result) == k:
+                    return result
+                result.append((item, count, self.errors[item]))
+        return result
+
+
+_lock = threading.Lock()
+_summaries: Dict[Tuple[str, str], SpaceSaving] = {}
+_dumped_at = 0.0
+
+
+def record(bot_id, direction: str, text: str) -> None:
+    """Count a message text for the bot and direction ("incoming"/"outgoing")."""
+    global _dumped_at
+    key = (str(bot_id), direction)
+    with _lock:
+        summary = _summaries.get(key)
+        if summary is None:
+            summary = _summaries[key] = SpaceSaving(TEXT_STATS_CAPACITY)
+        summary.add(text[:100])
+        if PROMETHEUS_MULTIPROC_DIR and time.monotonic() - _dumped_at >= TEXT_STATS_DUMP_INTERVAL:
+            _dumped_at = time.monotonic()
+            _dump_locked()
+
+
+def _dump_path(pid) -> str:
+    return os.path.join(PROMETHEUS_MULTIPROC_DIR, f"text_stats_{pid}.json")
+
+
+def _export_locked() -> List[dict]:
+    return [
+        {
+            "botId": bot_id,
+            "direction": direction,
+            "floor": summary.min_count if len(summary.counts) >= summary.capacity else 0,
+            "items": summary.top(summary.capacity),
+        }
+        for (bot_id, direction), summary in _summaries.items()
+    ]
+
+
+def _dump_locked() -> None:
+    """Write this worker's summaries next to the prometheus multiprocess files."""
+    path = _dump_path(os.getpid())
+    try:
+        with open(path + ".tmp", "w") as f:
+            json.dump(_export_locked(), f)
+        os.replace(path + ".tmp", path)
+    except OSError as exc:
+        interaction_logger.warning(f"Could not write text stats to {path}: {exc}")
+
+
+def _load_other_workers() -> List[dict]:
+    own = _dump_path(os.getpid())
+    exported = []
+    for path in glob.glob(_dump_path("*")):
+        if path == own:
+            continue
+        try:
+            with open(path) as f:
+                exported.extend(json.load(f))
+        except (OSError, ValueError) as exc:
+            interaction_logger.warning(f"Could not read text stats from {path}: {exc}")
+    return exported
+
+
+def _merge(exported: Iterable[dict]) -> Dict[Tuple[str, str], List[Tuple[str, int, int]]]:
+    """Merge Space-Saving summaries of several workers per bot and direction.
+
+    A text missing from a full summary may still have occurred up to that
+    summary's smallest count, so the merged count and error add that floor
+    for it; the bounds of a single summary carry over to the merged one.
+    """
+    grouped: Dict[Tuple[str, str], List[dict]] = {}
+    for entry in exported:
+        grouped.setdefault((entry["botId"], entry["direction"]), []).append(entry)
+    merged = {}
+    for key, entries in grouped.items():
+        texts = dict.fromkeys(text for entry in entries for text, _, _ in entry["items"])
+        seen = [{text: (count, error) for text, count, error in entry["items"]} for entry in entries]
+        totals = []
+        for text in texts:
+            count = error = 0
+            for entry, items in zip(entries, seen):
+                floor = entry["floor"]
+                item_count, item_error = items.get(text, (floor, floor))
+                count += item_count
+                error += item_error
+            totals.append((text, count, error))
+        totals.sort(key=lambda t: -t[1])
+        merged[key] = totals
+    return merged
+
+
+def snapshot(k: int = TEXT_STATS_EXPORT_TOP) -> List[dict]:
+    """Top ``k`` texts per bot and direction, over all workers in multiprocess mode."""
+    with _lock:
+        exported = _export_locked()
+    if PROMETHEUS_MULTIPROC_DIR:
+        exported += _load_other_workers()
+    return [
+        {
+            "botId": bot_id,
+            "direction": direction,
+            "texts": [
+                {"text": text, "count": count, "error": error}
+                for text, count, error in totals[:k]
+            ],
+        }
+        for (bot_id, direction), totals in sorted(_merge(exported).items())
+    ]
+
+
+class TopTextsCollector:
+    """Exports the top texts per bot and direction, labelled by the text itself.
+
+    There is no rank label, so a text keeps one series however the ranking
+    changes; at most ``TEXT_STATS_EXPORT_TOP`` texts per bot and direction.
+    """
+
+    def collect(self):
+        family = GaugeMetricFamily(
+            "bot_message_text_top",
+            "Estimated count of the most frequent message texts since start (Space-Saving)",
+            labels=["direction", "bot_id", "text"],
+        )
+        for entry in snapshot():
+            for text in entry["texts"]:
+                family.add_metric([entry["direction"], entry["botId"], text["text"]], text["count"])
+        yield family
+
+
+# In multiprocess mode every worker dumps its summaries to
+# PROMETHEUS_MULTIPROC_DIR and a scrape merges them with the live local ones.
+scrape_registry.register(TopTextsCollector())
@@ -0,0 +1,45 @@
+from dataclasses import dataclass, field
+from typing import Optional
+
+import constants.redis_models as rdb
+import services.db as db
+
+
+@dataclass
+class WebhookContext:
+    """Bot and user state needed to handle one Telegram update."""
+
+    token: str
+    locale: str
+    user_status: Optional[bool] = None
+    is_owner: bool = False
+    selected_project_code: Optional[str] = None
+    project_commands: list[str] = field(default_factory=list)
+
+    @property
+    def has_user(self) -> bool:
+        return self.user_status is not None
+
+
+async def load_webhook_context(bot_id: int, user_id: int) -> Optional[WebhookContext]:
+    """Load the context from one Redis pipeline, or one SQL query on a miss.
+
+    Returns None when the bot is not registered.
+    """
+    version = rdb.cache_version()
+    token, locale, user = await rdb.WebhookContext.get(bot_id, user_id)
+    if token is None or locale is None or user is None:
+        loaded = await db.get_webhook_context(bot_id, user_id)
+        if loaded is None:
+            return None
+        token, locale, user = loaded["token"], loaded["locale"], loaded["user"]
+        await rdb.WebhookContext.fill(bot_id, user_id, token, locale, user, version)
+
+    return WebhookContext(
+        token=token,
+        locale=locale or "en",
+        user_status=user["is_active"],
+        is_owner=user["is_owner"],
+        selected_project_code=user["selected_project_code"],
+        project_commands=user["project_commands"],
+    )
@@ -5,20 +5,32 @@ from backend.routers import api
 
 @pytest.mark.asyncio
 async def test_bots_by_owner(monkeypatch):
-    monkeypatch.setattr(api.db, "get_bots_by_owner_uuid", lambda owner_uuid: [(1, "Bot", "pass", "url")])
+    async def fake_get_bots_by_owner_uuid(owner_uuid):
+        return [(1, "Bot", "pass", "url")]
+
+    monkeypatch.setattr(api.db, "get_bots_by_owner_uuid", fake_get_bots_by_owner_uuid)
     result = await api.bots_by_owner("owner")
     assert result[0]["botName"] == "Bot"
 
 
 @pytest.mark.asyncio
 async def test_is_bot_verified(monkeypatch):
-    monkeypatch.setattr(api.db, "is_bot_verified", lambda bot_id: True)
+    async def fake_is_bot_verified(bot_id):
+        return True
+
+    monkeypatch.setattr(api.db, "is_bot_verified", fake_is_bot_verified)
     assert await api.is_bot_verified(1) is True
 
 
 @pytest.mark.asyncio
 async def test_generate_invite(monkeypatch):
-    monkeypatch.setattr(api.db, "bot_exists", lambda bot_id: True)
-    monkeypatch.setattr(api.db, "create_pass_token", lambda bot_id: "uuid")
+    async def fake_bot_exists(bot_id):
+        return True
+
+    async def fake_create_pass_token(bot_id):
+        return "uuid"
+
+    monkeypatch.setattr(api.db, "bot_exists", fake_bot_exists)
+    monkeypatch.setattr(api.db, "create_pass_token", fake_create_pass_token)
     result = await api.generate_invite(1)
     assert result == {"passUuid": "uuid"}
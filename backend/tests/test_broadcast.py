@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+from pydantic import ValidationError
+
+from backend.services import broadcast
+from backend.constants.request_models import BroadcastRequest, File
+
+
+def test_broadcast_request_needs_text_or_file():
+    with pytest.raises(ValidationError):
+        BroadcastRequest()
+    with pytest.raises(ValidationError):
+        BroadcastRequest(text="hi", file=File(type="image", url="https://x/y.png"))
+    assert BroadcastRequest(text="hi").filter.activeOnly is True
+
+
+@pytest.mark.asyncio
+async def test_run_bounds_concurrency_and_records_results(monkeypatch):
+    async def fake_recipients(bot_id, active_only, project_code, search):
+        for user_id in range(1, 11):
+            yield user_id
+
+    inflight = {"now": 0, "max": 0}
+
+    async def fake_deliver(job):
+        inflight["now"] += 1
+        inflight["max"] = max(inflight["max"], inflight["now"])
+        await asyncio.sleep(0.01)
+        inflight["now"] -= 1
+        if job["chat_id"] == 3:
+            raise RuntimeError("blocked")
+        return {"status_code": 200, "body": {}}
+
+    recorded = {}
+    finished = {}
+
+    async def fake_record(job_id, user_id, ok, detail=None):
+        recorded[user_id] = ok
+
+    async def fake_finish(job_id, status, total=None):
+        finished.update(status=status, total=total)
+
+    monkeypatch.setattr(broadcast.db, "iter_broadcast_recipients", fake_recipients)
+    monkeypatch.setattr(broadcast.outbound, "deliver", fake_deliver)
+    monkeypatch.setattr(broadcast.rdb.Broadcast, "record", fake_record)
+    monkeypatch.setattr(broadcast.rdb.Broadcast, "finish", fake_finish)
+    monkeypatch.setattr(broadcast, "BROADCAST_CONCURRENCY", 3)
+
+    request = BroadcastRequest(text="hi")
+    await broadcast._run("job", 7, broadcast.outbound.broadcast_job(7, request), request.filter)
+
+    assert inflight["max"] == 3
+    assert len(recorded) == 10
+    assert [user_id for user_id, ok in recorded.items() if not ok] == [3]
+    assert finished == {"status": "done", "total": 10}
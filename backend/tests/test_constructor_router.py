@@ -23,7 +23,10 @@ async def test_get_schema(monkeypatch):
 
 @pytest.mark.asyncio
 async def test_list_messengers(monkeypatch):
-    monkeypatch.setattr(constructor.db, "get_all_bot_users", lambda: [(1, 2, "n", "s")])
+    async def fake_get_all_bot_users():
+        return [(1, 2, "n", "s")]
+
+    monkeypatch.setattr(constructor.db, "get_all_bot_users", fake_get_all_bot_users)
     result = await constructor.list_messengers()
     assert result["items"][0]["externalType"] == "employees"
 
@@ -36,14 +39,15 @@ async def test_send_system_message_with_media(monkeypatch):
         text="{\"event\": \"started\", \"req_id\": \"5\"}"
     )
 
-    monkeypatch.setattr(constructor.db, "get_selected_project_id", lambda *a, **k: None)
+    async def fake_get_selected_project_id(*a, **k):
+        return None
 
-    monkeypatch.setattr(
-        constructor.rdb.Message,
-        "get",
-        staticmethod(lambda *a, **k: ("text", "user", [{"type": "Image", "url": "u", "mime": "m"}], "photo")),
-    )
-    monkeypatch.setattr(constructor.rdb.Message, "delete", lambda *a, **k: None)
+    monkeypatch.setattr(constructor.db, "get_selected_project_id", fake_get_selected_project_id)
+
+    async def fake_pop(*a, **k):
+        return "text", "user", [{"type": "Image", "url": "u", "mime": "m"}], "photo"
+
+    monkeypatch.setattr(constructor.rdb.Message, "pop", fake_pop)
 
     captured = {}
 
@@ -0,0 +1,47 @@
+import pytest
+
+from backend.services import contact_variables
+
+
+@pytest.mark.asyncio
+async def test_missing_variables_are_answered_from_cache(monkeypatch):
+    cache = {}
+    mongo_reads = []
+
+    async def fake_get(bot_id, user_id):
+        return cache.get((bot_id, user_id))
+
+    async def fake_fill(bot_id, user_id, variables):
+        cache[(bot_id, user_id)] = dict(variables)
+
+    def fake_get_variables(bot_id, user_id):
+        mongo_reads.append((bot_id, user_id))
+        return {"city": "Rome"}
+
+    monkeypatch.setattr(contact_variables.rdb.ContactVariables, "get", fake_get)
+    monkeypatch.setattr(contact_variables.rdb.ContactVariables, "fill", fake_fill)
+    monkeypatch.setattr(contact_variables.mdb, "get_variables", fake_get_variables)
+
+    assert await contact_variables.get(7, 42, ["city"]) == {"city": "Rome"}
+    assert await contact_variables.get(7, 42, ["zip"]) == {"zip": ""}
+    assert await contact_variables.get(7, 42) == {"city": "Rome"}
+    assert mongo_reads == [(7, 42)]
+
+
+@pytest.mark.asyncio
+async def test_save_writes_mongo_then_cache(monkeypatch):
+    calls = []
+
+    def fake_save_variables(bot_id, user_id, variables):
+        calls.append(("mongo", variables))
+
+    async def fake_update(bot_id, user_id, variables):
+        calls.append(("cache", variables))
+
+    monkeypatch.setattr(contact_variables.mdb, "save_variables", fake_save_variables)
+    monkeypatch.setattr(contact_variables.rdb.ContactVariables, "update", fake_update)
+
+    await contact_variables.save(7, 42, {"zip": 123})
+    await contact_variables.save(7, 42, {})
+
+    assert calls == [("mongo", {"zip": 123}), ("cache", {"zip": 123})]
@@ -0,0 +1,84 @@
+from contextlib import asynccontextmanager
+
+import pytest
+from sqlalchemy.dialects.postgresql import asyncpg
+
+from backend.services import db
+
+
+def _params(statement):
+    # asyncpg renders these binds as $n::BIGINT and rejects str values for them.
+    return statement.compile(dialect=asyncpg.dialect()).params
+
+
+def test_selected_project_query_binds_integer_ids():
+    params = _params(db._selected_project_query("7922062448", "42"))
+
+    assert params["bot_id_1"] == 7922062448
+    assert params["user_id_1"] == 42
+
+
+def test_deselect_project_query_binds_integer_ids():
+    params = _params(db._deselect_project_query("3", "7922062448", "42"))
+
+    assert (params["project_id_1"], params["bot_id_1"], params["user_id_1"]) == (3, 7922062448, 42)
+
+
+class FakeScalars:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+
+class FakeSession:
+    def __init__(self, rows, state=None):
+        self.rows = rows
+        self.state = state
+        self.statements = []
+
+    async def get(self, model, key):
+        return self.state
+
+    async def scalars(self, statement):
+        self.statements.append(str(statement))
+        return FakeScalars(self.rows)
+
+
+@pytest.mark.asyncio
+async def test_owner_lookup_decrypts_while_rekey_is_pending(monkeypatch):
+    owner, other, broken = db.Bot(id=1), db.Bot(id=2), db.Bot(id=3, ownerUuid=b"garbage")
+    owner.set_owner_uuid("owner")
+    other.set_owner_uuid("other")
+    monkeypatch.setattr(db, "_blind_indexes_current", False)
+    session = FakeSession([owner, other, broken])
+
+    assert await db._bots_by_owner_uuid(session, "owner") == [owner]
+    assert "WHERE" not in session.statements[0]
+
+    session.state = db.MigrationState(name=db.BLIND_INDEX_KEY_STATE, value=db.blind_index_key_id())
+    await db._bots_by_owner_uuid(session, "owner")
+    assert 'WHERE bots."ownerUuidHash"' in session.statements[1]
+
+
+@pytest.mark.asyncio
+async def test_broadcast_recipients_are_paged_in_short_sessions(monkeypatch):
+    pages = [[1, 2], [5, 9], [12]]
+    sessions = []
+
+    class PagingSession:
+        async def scalars(self, statement):
+            sessions.append(statement.compile().params.get("user_id_1"))
+            return FakeScalars(pages.pop(0))
+
+    @asynccontextmanager
+    async def get_session():
+        yield PagingSession()
+
+    monkeypatch.setattr(db, "BROADCAST_FETCH_SIZE", 2)
+    monkeypatch.setattr(db, "get_session", get_session)
+
+    assert [user_id async for user_id in db.iter_broadcast_recipients(7)] == [1, 2, 5, 9, 12]
+    # One session per page, each continuing after the last id seen.
+    assert sessions == [None, 2, 9]
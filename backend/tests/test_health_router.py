@@ -0,0 +1,37 @@
+import pytest
+
+from backend.routers import health
+
+
+@pytest.mark.asyncio
+async def test_live():
+    assert await health.live() == {"status": "ok"}
+
+
+@pytest.mark.asyncio
+async def test_ready_before_startup(monkeypatch):
+    monkeypatch.setattr(health.health, "_ready", False)
+
+    resp = await health.ready()
+
+    assert resp.status_code == 503
+
+
+@pytest.mark.asyncio
+async def test_ready_reports_failed_checks(monkeypatch):
+    async def ok():
+        pass
+
+    async def down():
+        raise ConnectionError()
+
+    monkeypatch.setattr(health.health, "_ready", True)
+    monkeypatch.setattr(health.health, "CHECKS", {"postgres": ok, "redis": down})
+
+    resp = await health.ready()
+
+    assert resp.status_code == 503
+    assert b'"redis":"error: ConnectionError"' in resp.body
+
+    monkeypatch.setattr(health.health, "CHECKS", {"postgres": ok})
+    assert await health.ready() == {"status": "ok", "checks": {"postgres": "ok"}}
@@ -1,4 +1,7 @@
+import asyncio
 import re
+import pytest
+from backend.services import helper_functions
 from backend.services.helper_functions import (
     guess_filename,
     generate_uuid,
@@ -32,3 +35,48 @@ def test_generate_message_id_numeric_and_unique():
     assert mid1.isdigit()
     assert mid2.isdigit()
 
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, data):
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+class FakeAsyncClient:
+    def __init__(self):
+        self.calls = 0
+
+    async def get(self, url, params=None):
+        self.calls += 1
+        await asyncio.sleep(0)
+        return FakeResponse({"ok": True, "result": {"file_path": f"photos/{params['file_id']}.jpg"}})
+
+
+@pytest.mark.asyncio
+async def test_extract_telegram_attachments_caches_file_path(monkeypatch):
+    client = FakeAsyncClient()
+    monkeypatch.setattr(helper_functions.tg, "get_client", lambda: client)
+    helper_functions.tg._file_paths.clear()
+    message = {"photo": [{"file_id": "small", "file_unique_id": "u1"}, {"file_id": "big", "file_unique_id": "u2"}]}
+
+    results = await asyncio.gather(
+        extract_telegram_attachments(message, "1:token"),
+        extract_telegram_attachments(message, "1:token"),
+    )
+    again = await extract_telegram_attachments(message, "1:token")
+
+    attachments, message_type = again
+    assert results[0] == results[1] == again
+    assert message_type == "photo"
+    assert attachments[0]["type"] == "Image"
+    assert attachments[0]["url"].endswith("/file/bot1:token/photos/big.jpg")
+    assert client.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_extract_telegram_attachments_plain_text():
+    assert await extract_telegram_attachments({"text": "hi"}, "1:token") == ([], None)
@@ -0,0 +1,43 @@
+import os
+import subprocess
+import sys
+
+from .conftest import BACKEND_DIR
+
+IMPORT_BUDGET_SECONDS = 5.0
+
+# Runs in a fresh interpreter so modules cached by other tests don't hide
+# import cost. Any network connection attempted during import fails.
+SCRIPT = """
+import socket, sys, threading, time
+
+def refuse(*args, **kwargs):
+    raise AssertionError("network I/O during import")
+
+socket.socket.connect = refuse
+socket.create_connection = refuse
+
+started = time.perf_counter()
+import app
+elapsed = time.perf_counter() - started
+print(elapsed, threading.active_count())
+"""
+
+
+def test_app_import_does_no_io_and_fits_budget(tmp_path):
+    env = {**os.environ, "LOG_DIR": str(tmp_path / "logs")}
+    env.pop("PROMETHEUS_MULTIPROC_DIR", None)
+    result = subprocess.run(
+        [sys.executable, "-c", SCRIPT],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+
+    elapsed, threads = result.stdout.split()
+    assert float(elapsed) < IMPORT_BUDGET_SECONDS
+    assert int(threads) == 1
+    assert not (tmp_path / "logs").exists()
@@ -0,0 +1,38 @@
+import asyncio
+
+import pytest
+
+from backend.services import inbound_queue
+
+
+@pytest.mark.asyncio
+async def test_lost_lease_lets_current_update_finish(monkeypatch):
+    consumer = inbound_queue.InboundConsumer(handler=None)
+    handled = asyncio.Event()
+    finished = []
+
+    async def drain():
+        await handled.wait()
+        finished.append(True)
+
+    async def not_renewed(keys, args):
+        return 0
+
+    async def no_share():
+        return 0
+
+    monkeypatch.setattr(inbound_queue, "_renew_script", not_renewed)
+    monkeypatch.setattr(consumer, "_fair_share", no_share)
+    stop = consumer.draining[3] = asyncio.Event()
+    task = consumer.tasks[3] = asyncio.create_task(drain())
+
+    await consumer._rebalance()
+
+    assert stop.is_set()
+    assert consumer.tasks == {} and consumer.stopping == {3: task}
+    handled.set()
+    await task
+    await asyncio.sleep(0)
+    assert finished == [True] and not task.cancelled()
+    assert consumer.stopping == {}
+    await consumer.reader_pool.disconnect()
@@ -0,0 +1,80 @@
+import logging
+
+import httpx
+
+from backend.services import logging_setup
+
+
+def _record(message, level=logging.INFO):
+    return logging.LogRecord("interaction", level, __file__, 1, message, None, None)
+
+
+def test_loki_handler_batches_and_keeps_records_while_loki_is_down():
+    pushed = []
+    status = {"code": 503}
+
+    def respond(request):
+        if status["code"] == 204:
+            pushed.append(request.read())
+        return httpx.Response(status["code"])
+
+    handler = logging_setup.LokiBatchHandler(
+        url="http://loki/loki/api/v1/push",
+        labels={"app": "test"},
+        batch_size=2,
+        flush_interval=60,
+        buffer_size=3,
+    )
+    handler.client = httpx.Client(transport=httpx.MockTransport(respond))
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    # Stop the shipper thread so the test drives pushes itself.
+    with handler.cond:
+        handler.closed = True
+        handler.cond.notify()
+    handler.thread.join()
+
+    for n in range(4):
+        handler.emit(_record(f"m{n}"))
+    assert [line for *_, line in handler.buffer] == ["m1", "m2", "m3"]
+
+    assert handler._push() is False
+    assert len(handler.buffer) == 3
+
+    status["code"] = 204
+    assert handler._push() is True
+    assert [line for *_, line in handler.buffer] == ["m3"]
+    assert b'"m1"' in pushed[0] and b'"m2"' in pushed[0]
+    assert b'"severity":"info"' in pushed[0].replace(b" ", b"")
+
+
+def test_queue_handler_drops_instead_of_blocking():
+    import queue
+
+    handler = logging_setup.DroppingQueueHandler(queue.Queue(maxsize=1))
+    dropped = logging_setup.LOG_RECORDS_DROPPED.labels(reason="queue_full")
+    before = dropped._value.get()
+
+    handler.emit(_record("a"))
+    handler.emit(_record("b"))
+
+    assert handler.queue.qsize() == 1
+    assert dropped._value.get() == before + 1
+
+
+def test_log_event_is_sampled_truncated_and_lazy(monkeypatch):
+    records = []
+    monkeypatch.setattr(logging_setup.interaction_logger, "isEnabledFor", lambda level: True)
+    monkeypatch.setattr(logging_setup.interaction_logger, "log", lambda level, msg: records.append((level, msg)))
+    monkeypatch.setattr(logging_setup, "LOG_SAMPLE_RATES", {"SENT": 0.0})
+    monkeypatch.setattr(logging_setup, "LOG_MAX_FIELD_CHARS", 10)
+
+    logging_setup.log_event("SENT", bot_id=1)
+    logging_setup.log_event("SENT", level=logging.ERROR, bot_id=1)
+    logging_setup.log_event("INCOMING", bot_id=1, text="x" * 25, body={"a": 1})
+
+    assert [level for level, _ in records] == [logging.ERROR, logging.INFO]
+    event = records[1][1]
+    assert not isinstance(event, str)
+    assert str(event) == (
+        '{"event": "INCOMING", "bot_id": 1, "text": "xxxxxxxxxx...(+15 chars)", "body": {"a": 1}}'
+    )
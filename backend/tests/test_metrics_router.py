@@ -1,4 +1,5 @@
 import json
+import os
 import pytest
 from backend.routers import metrics
 from constants.request_models import Job
@@ -33,3 +34,47 @@ async def test_add_and_delete_job(tmp_path, monkeypatch):
     with open(path) as f:
         data = json.load(f)
     assert data == []
+
+
+@pytest.mark.asyncio
+async def test_top_texts_are_bounded(monkeypatch):
+    text_stats = metrics.text_stats
+    monkeypatch.setattr(text_stats, "_summaries", {})
+    monkeypatch.setattr(text_stats, "TEXT_STATS_CAPACITY", 2)
+    for text in ["hi", "hi", "hi", "a", "b", "c"]:
+        text_stats.record(7, "incoming", text)
+
+    (entry,) = await metrics.top_texts(limit=5)
+    assert entry["botId"] == "7" and entry["direction"] == "incoming"
+    assert len(entry["texts"]) == 2
+    assert entry["texts"][0] == {"text": "hi", "count": 3, "error": 0}
+    assert entry["texts"][1]["text"] == "c"
+    assert entry["texts"][1] == {"text": "c", "count": 3, "error": 2}
+
+    (family,) = text_stats.TopTextsCollector().collect()
+    assert [(s.labels, s.value) for s in family.samples] == [
+        ({"direction": "incoming", "bot_id": "7", "text": "hi"}, 3),
+        ({"direction": "incoming", "bot_id": "7", "text": "c"}, 3),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_top_texts_merge_other_workers(monkeypatch, tmp_path):
+    text_stats = metrics.text_stats
+    monkeypatch.setattr(text_stats, "_summaries", {})
+    monkeypatch.setattr(text_stats, "_dumped_at", 0.0)
+    monkeypatch.setattr(text_stats, "TEXT_STATS_CAPACITY", 2)
+    monkeypatch.setattr(text_stats, "PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    for text in ["hi", "hi", "a"]:
+        text_stats.record(7, "incoming", text)
+    assert (tmp_path / f"text_stats_{os.getpid()}.json").exists()
+
+    other = [{"botId": "7", "direction": "incoming", "floor": 2, "items": [["b", 5, 1], ["a", 2, 0]]}]
+    (tmp_path / "text_stats_1.json").write_text(json.dumps(other))
+
+    (entry,) = await metrics.top_texts(limit=5)
+    assert entry["texts"] == [
+        {"text": "b", "count": 6, "error": 2},
+        {"text": "hi", "count": 4, "error": 2},
+        {"text": "a", "count": 3, "error": 0},
+    ]
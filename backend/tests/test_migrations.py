@@ -0,0 +1,104 @@
+from contextlib import asynccontextmanager
+
+import pytest
+
+from backend.services import migrations
+
+
+class FakeScalars:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+
+class FakeSession:
+    def __init__(self, batches):
+        self.batches = batches
+
+    async def scalars(self, statement):
+        return FakeScalars(self.batches.pop(0) if self.batches else [])
+
+
+def _use(monkeypatch, session):
+    @asynccontextmanager
+    async def get_session():
+        yield session
+
+    monkeypatch.setattr(migrations, "get_session", get_session)
+
+
+@pytest.mark.asyncio
+async def test_backfill_skips_undecryptable_rows(monkeypatch):
+    good = migrations.Bot(id=1)
+    good.set_owner_uuid("owner")
+    good.ownerUuidHash = None
+    bad = migrations.Bot(id=2, ownerUuid=b"not a fernet token")
+    _use(monkeypatch, FakeSession([[good, bad]]))
+
+    filled = await migrations._backfill(*migrations.BLIND_INDEXES[0])
+
+    assert filled == 2
+    assert good.ownerUuidHash == migrations.blind_index("owner")
+    assert bad.ownerUuidHash == ""
+
+
+@pytest.mark.asyncio
+async def test_rehash_rewrites_hashes_in_place_by_primary_key(monkeypatch):
+    bots = []
+    for n in range(3):
+        bot = migrations.Bot(id=n + 1)
+        bot.set_owner_uuid(f"owner-{n}")
+        bot.ownerUuidHash = "old-key-hash"
+        bots.append(bot)
+    monkeypatch.setattr(migrations, "BACKFILL_BATCH_SIZE", 2)
+    session = FakeSession([bots[:2], bots[2:]])
+    _use(monkeypatch, session)
+
+    assert await migrations._rehash(*migrations.BLIND_INDEXES[0]) == 3
+    assert [bot.ownerUuidHash for bot in bots] == [
+        migrations.blind_index(f"owner-{n}") for n in range(3)
+    ]
+
+
+class FakeLockConnection:
+    def __init__(self, calls):
+        self.calls = calls
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    async def execute(self, statement, params=None):
+        self.calls.append(str(statement))
+
+    async def commit(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_migration_runs_under_advisory_lock(monkeypatch):
+    calls = []
+
+    class FakeEngine:
+        def connect(self):
+            return FakeLockConnection(calls)
+
+    async def fake_migrate():
+        calls.append("migrate")
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(migrations, "async_engine", FakeEngine())
+    monkeypatch.setattr(migrations, "_migrate", fake_migrate)
+
+    with pytest.raises(RuntimeError):
+        await migrations.migrate_schema()
+
+    assert calls == [
+        "SELECT pg_advisory_lock(:id)",
+        "migrate",
+        "SELECT pg_advisory_unlock(:id)",
+    ]
@@ -0,0 +1,178 @@
+import asyncio
+
+import pytest
+from bson.errors import InvalidDocument
+
+from backend.services import mongo_db
+
+
+class FakeCollection:
+    def __init__(self):
+        self.batches = []
+
+    def insert_many(self, documents, ordered=True):
+        self.batches.append((list(documents), ordered))
+
+
+@pytest.mark.asyncio
+async def test_log_writer_batches_and_flushes_on_stop(monkeypatch):
+    collections = {"UsersMessages": FakeCollection(), "ConstructorMessages": FakeCollection()}
+    monkeypatch.setattr(mongo_db, "db", collections)
+
+    writer = mongo_db.MessageLogWriter(maxsize=100, batch_size=3, flush_interval=60)
+    writer.start()
+    for n in range(4):
+        writer.put("UsersMessages", {"n": n})
+    writer.put("ConstructorMessages", {"n": 4})
+    await writer.stop()
+
+    users = collections["UsersMessages"].batches
+    assert [[doc["n"] for doc in docs] for docs, _ in users] == [[0, 1, 2], [3]]
+    assert all(ordered is False for _, ordered in users)
+    assert collections["ConstructorMessages"].batches == [([{"n": 4}], False)]
+
+
+@pytest.mark.asyncio
+async def test_log_writer_drops_when_full():
+    writer = mongo_db.MessageLogWriter(maxsize=2, batch_size=10, flush_interval=1)
+    dropped = mongo_db.MONGO_LOG_DOCUMENTS.labels(result="dropped")
+    before = dropped._value.get()
+
+    for n in range(3):
+        writer.put("UsersMessages", {"n": n})
+
+    assert writer.queue.qsize() == 2
+    assert dropped._value.get() == before + 1
+
+
+class InvalidCollection(FakeCollection):
+    def insert_many(self, documents, ordered=True):
+        if any(1 in doc for doc in documents):
+            raise InvalidDocument("documents must have only string keys")
+        super().insert_many(documents, ordered)
+
+
+@pytest.mark.asyncio
+async def test_log_writer_survives_invalid_document(monkeypatch):
+    collections = {"UsersMessages": InvalidCollection()}
+    monkeypatch.setattr(mongo_db, "db", collections)
+    failed = mongo_db.MONGO_LOG_DOCUMENTS.labels(result="failed")
+    before = failed._value.get()
+
+    writer = mongo_db.MessageLogWriter(maxsize=10, batch_size=1, flush_interval=60)
+    writer.start()
+    writer.put("UsersMessages", {1: "bad"})
+    writer.put("UsersMessages", {"n": 1})
+    await asyncio.wait_for(writer.stop(), 5)
+
+    assert collections["UsersMessages"].batches == [([{"n": 1}], False)]
+    assert failed._value.get() == before + 1
+
+
+@pytest.mark.asyncio
+async def test_log_writer_stop_does_not_wait_on_dead_task():
+    async def crash():
+        raise RuntimeError("boom")
+
+    writer = mongo_db.MessageLogWriter(maxsize=1, batch_size=1, flush_interval=60)
+    writer.put("UsersMessages", {"n": 0})
+    writer.task = asyncio.create_task(crash())
+
+    await asyncio.wait_for(writer.stop(), 5)
+
+    assert writer.task is None
+
+
+class FakeVariables:
+    def __init__(self, document=None):
+        self.document = document
+        self.updates = []
+
+    def update_one(self, query, update, upsert=False):
+        self.updates.append((query, update, upsert))
+
+    def find_one(self, query, projection=None):
+        return self.document
+
+
+def test_save_variables_is_one_escaped_set(monkeypatch):
+    variables = FakeVariables()
+    monkeypatch.setattr(mongo_db, "db", {"contact_variables": variables})
+
+    mongo_db.save_variables(7, 42, {"city": "Rome", "a.b": 1, "$x": 2})
+
+    assert variables.updates == [(
+        {"bot_id": 7, "user_id": 42},
+        {"$set": {"variables.city": "Rome", "variables.a%2Eb": 1, "variables.%24x": 2}},
+        True,
+    )]
+
+
+def test_empty_variable_names_are_rejected(monkeypatch):
+    variables = FakeVariables()
+    monkeypatch.setattr(mongo_db, "db", {"contact_variables": variables})
+
+    with pytest.raises(ValueError):
+        mongo_db.save_variables(7, 42, {"": 1})
+    with pytest.raises(ValueError):
+        mongo_db.get_variables(7, 42, ["city", ""])
+    assert variables.updates == []
+
+
+def test_get_variables_is_one_query(monkeypatch):
+    variables = FakeVariables(document={"variables": {"a%2Eb": 1}})
+    monkeypatch.setattr(mongo_db, "db", {"contact_variables": variables})
+
+    assert mongo_db.get_variables(7, 42, ["a.b", "zip"]) == {"a.b": "1", "zip": ""}
+    assert mongo_db.get_variable(7, 42, "a.b") == "1"
+
+
+class FakeLegacy:
+    def __init__(self, documents):
+        self.documents = documents
+        self.renamed = None
+
+    def find(self, query, projection=None):
+        return self
+
+    def sort(self, keys):
+        return iter(self.documents)
+
+    def rename(self, name):
+        self.renamed = name
+
+
+class FakeContacts:
+    def __init__(self):
+        self.requests = []
+
+    def bulk_write(self, requests, ordered=True):
+        self.requests.extend(requests)
+
+
+class FakeDatabase(dict):
+    def list_collection_names(self):
+        return list(self)
+
+
+def test_migrate_legacy_variables_merges_once(monkeypatch):
+    legacy = FakeLegacy([
+        {"bot_id": 7, "user_id": 42, "name": "city", "value": "Rome"},
+        {"bot_id": 7, "user_id": 42, "name": "a.b", "value": "$1"},
+        {"bot_id": 7, "user_id": 43, "name": "city", "value": "Oslo"},
+    ])
+    contacts = FakeContacts()
+    database = FakeDatabase(variables=legacy, contact_variables=contacts)
+    monkeypatch.setattr(mongo_db, "db", database)
+
+    assert mongo_db.migrate_legacy_variables() == 2
+
+    first = contacts.requests[0]._doc
+    assert first == [{"$set": {"variables": {"$mergeObjects": [
+        {"$literal": {"city": "Rome", "a%2Eb": "$1"}}, "$variables",
+    ]}}}]
+    assert len(contacts.requests) == 2
+    assert legacy.renamed == "variables_migrated"
+
+    del database["variables"]
+    assert mongo_db.migrate_legacy_variables() == 0
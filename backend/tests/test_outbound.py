@@ -0,0 +1,38 @@
+import pytest
+
+from backend.services import outbound
+from backend.constants.request_models import (
+    Chat,
+    QuickReply,
+    SendTextMessageRequest,
+)
+
+
+def make_request(**kwargs):
+    return SendTextMessageRequest(
+        chat=Chat(externalId="1", messengerInstance="1", contact="42", messengerId="1", operator="Op"),
+        text="hello",
+        **kwargs,
+    )
+
+
+def test_text_job_is_json_ready():
+    job = outbound.text_job(7, make_request(
+        quickReplies=[[QuickReply(text="Phone", type="phone", color="blue")]],
+    ))
+
+    assert job["kind"] == "text"
+    assert job["chat_id"] == "42"
+    assert job["reply_keyboard"] == [[{"text": "Phone", "request_contact": True}]]
+    assert job["remove_keyboard"] is False
+
+
+@pytest.mark.asyncio
+async def test_deliver_unknown_bot_is_permanent(monkeypatch):
+    async def fake_get_bot_token(bot_id):
+        return None
+
+    monkeypatch.setattr(outbound.db, "get_bot_token", fake_get_bot_token)
+
+    with pytest.raises(outbound.PermanentSendError):
+        await outbound.deliver(outbound.text_job(7, make_request()))
@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+from backend.services import outbound_queue
+
+
+class FakePipeline:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def __getattr__(self, name):
+        def op(*args, **kwargs):
+            self.calls.append(name)
+            return self
+        return op
+
+    async def execute(self):
+        return []
+
+
+class FakeRedis:
+    def __init__(self):
+        self.calls = []
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self.calls)
+
+
+@pytest.mark.parametrize(
+    "status_code, expected",
+    [(200, ["xack", "xdel"]), (429, ["zadd", "xack", "xdel"]), (400, ["xadd", "xack", "xdel"])],
+)
+@pytest.mark.asyncio
+async def test_process_acks_retries_or_dead_letters(monkeypatch, status_code, expected):
+    client = FakeRedis()
+    monkeypatch.setattr(outbound_queue.rdb, "redis_client", client)
+
+    async def fake_deliver(job):
+        return {"status_code": status_code, "body": {}}
+
+    monkeypatch.setattr(outbound_queue, "deliver", fake_deliver)
+
+    await outbound_queue._process("1-0", {"job": json.dumps({"kind": "text"}), "attempts": "0"})
+
+    assert client.calls == expected
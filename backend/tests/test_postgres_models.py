@@ -0,0 +1,26 @@
+from backend.constants.postgres_models import Bot, PassToken, User, blind_index
+
+
+def test_blind_index_is_deterministic_and_keyed():
+    assert blind_index("owner") == blind_index("owner")
+    assert blind_index("owner") != blind_index("other")
+    assert len(blind_index("owner")) == 64
+
+
+def test_setters_fill_blind_index_columns():
+    bot = Bot()
+    bot.set_owner_uuid("owner")
+    token = PassToken()
+    token.set_uuid("pass")
+
+    assert bot.ownerUuidHash == blind_index("owner")
+    assert bot.get_owner_uuid() == "owner"
+    assert token.uuidHash == blind_index("pass")
+
+
+def test_phone_blind_index_ignores_formatting():
+    user = User()
+    user.set_phone("+7 (900) 123-45-67")
+
+    assert user.phoneHash == User.phone_blind_index("79001234567")
+    assert User.phone_blind_index("ann") is None
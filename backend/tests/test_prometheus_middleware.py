@@ -0,0 +1,34 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.services import prometheus_middleware as pm
+
+
+def _sample(metric, name, **labels):
+    for family in metric.collect():
+        for sample in family.samples:
+            if sample.name == name and all(sample.labels.get(k) == v for k, v in labels.items()):
+                return sample.value
+    return 0
+
+
+def test_requests_are_labelled_by_route_template():
+    app = FastAPI()
+    app.add_middleware(pm.PrometheusMiddleware)
+
+    @app.get("/webhook/{bot_id}")
+    async def webhook(bot_id: int):
+        return {"bot": bot_id}
+
+    client = TestClient(app)
+    before = _sample(pm.REQUEST_COUNT, "http_requests_total", method="GET", endpoint="/webhook/{bot_id}")
+
+    for bot_id in (1, 2, 3):
+        assert client.get(f"/webhook/{bot_id}").status_code == 200
+    client.get("/no/such/path")
+
+    assert _sample(pm.REQUEST_COUNT, "http_requests_total", method="GET", endpoint="/webhook/{bot_id}") == before + 3
+    assert _sample(pm.REQUEST_COUNT, "http_requests_total", method="GET", endpoint="/webhook/1") == 0
+    assert _sample(pm.REQUEST_COUNT, "http_requests_total", method="GET", endpoint=pm.UNMATCHED) >= 1
+    assert _sample(pm.RESPONSE_SIZE, "http_response_size_bytes_sum", method="GET", endpoint="/webhook/{bot_id}") > 0
+    assert _sample(pm.REQUESTS_IN_PROGRESS, "http_requests_in_progress", method="GET") == 0
@@ -0,0 +1,127 @@
+import json
+
+import pytest
+
+from backend.constants import redis_models
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.ops = []
+
+    def __getattr__(self, name):
+        def op(*args, **kwargs):
+            self.ops.append((name, args))
+            return self
+        return op
+
+    async def execute(self):
+        self.client.executed.append(self.ops)
+        return [None] * len(self.ops)
+
+
+class FakeRedis:
+    def __init__(self, values=None):
+        self.values = values or {}
+        self.reads = []
+        self.executed = []
+
+    async def get(self, key):
+        self.reads.append(key)
+        return self.values.get(key)
+
+    async def set(self, key, value, **kwargs):
+        self.executed.append([("set", (key, value), kwargs)])
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+@pytest.mark.asyncio
+async def test_owner_is_served_from_local_cache(monkeypatch):
+    client = FakeRedis({"bots:1:owner": "42"})
+    monkeypatch.setattr(redis_models, "redis_client", client)
+    redis_models.local_cache.clear()
+
+    assert await redis_models.BotOwner.get(1) == 42
+    assert await redis_models.BotOwner.get(1) == 42
+    assert client.reads == ["bots:1:owner"]
+
+
+@pytest.mark.asyncio
+async def test_write_evicts_locally_and_publishes_keys(monkeypatch):
+    client = FakeRedis()
+    monkeypatch.setattr(redis_models, "redis_client", client)
+    redis_models.local_cache.set("bots:1:locale", "en")
+
+    await redis_models.BotLocale.set(1, "ru")
+
+    assert "bots:1:locale" not in redis_models.local_cache
+    [ops] = client.executed
+    assert ops[0] == ("set", ("bots:1:locale", "ru"))
+    assert ops[1] == (
+        "publish",
+        (redis_models.INVALIDATION_CHANNEL, json.dumps(["bots:1:locale"])),
+    )
+
+
+@pytest.mark.asyncio
+async def test_fill_after_miss_is_local_and_keeps_newer_writes(monkeypatch):
+    client = FakeRedis()
+    monkeypatch.setattr(redis_models, "redis_client", client)
+    redis_models.local_cache.clear()
+
+    await redis_models.BotOwner.fill(1, 42, redis_models.cache_version())
+
+    assert client.executed == [[("set", ("bots:1:owner", 42), {"ex": redis_models.REDIS_CACHE_TTL, "nx": True})]]
+    assert redis_models.local_cache.get("bots:1:owner") == 42
+
+
+@pytest.mark.asyncio
+async def test_invalidation_during_read_wins_over_the_fill(monkeypatch):
+    client = FakeRedis({"bots:1:owner": "42"})
+    read = client.get
+
+    async def get(key):
+        value = await read(key)
+        # Another worker's write is announced while this read is in flight.
+        redis_models._local_drop([key])
+        return value
+
+    client.get = get
+    monkeypatch.setattr(redis_models, "redis_client", client)
+    redis_models.local_cache.clear()
+
+    assert await redis_models.BotOwner.get(1) == 42
+    assert "bots:1:owner" not in redis_models.local_cache
+    assert await redis_models.BotOwner.get(1) == 42
+    assert client.reads == ["bots:1:owner", "bots:1:owner"]
+
+
+@pytest.mark.asyncio
+async def test_message_is_written_as_one_hash_in_one_round_trip(monkeypatch):
+    client = FakeRedis()
+    monkeypatch.setattr(redis_models, "redis_client", client)
+
+    await redis_models.Message.set(1, 2, 3, "hi", "Ann", [{"type": "Image"}])
+
+    [ops] = client.executed
+    key = "bots:1:users:2:messages:3"
+    assert [name for name, _ in ops] == ["delete", "hset", "expire"]
+    assert ops[2] == ("expire", (key, redis_models.REDIS_CACHE_TTL))
+
+
+@pytest.mark.asyncio
+async def test_users_page_invalidate_bumps_generation_without_scan(monkeypatch):
+    client = FakeRedis()
+
+    async def incr(key):
+        client.executed.append([("incr", (key,))])
+
+    client.incr = incr
+    monkeypatch.setattr(redis_models, "redis_client", client)
+
+    await redis_models.BotUsersPage.invalidate(7)
+
+    assert client.executed == [[("incr", ("bots:7:users-page-gen",))]]
@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+from backend.services import send_scheduler
+
+
+class FakeResponse:
+    def __init__(self, data, status_code):
+        self._data = data
+        self.status_code = status_code
+
+    def json(self):
+        return self._data
+
+
+def test_token_bucket_reserves_in_arrival_order():
+    bucket = send_scheduler.TokenBucket(rate=2, capacity=2)
+
+    waits = [bucket.reserve() for _ in range(4)]
+
+    assert waits[:2] == [0.0, 0.0]
+    assert waits[2] == pytest.approx(0.5, abs=0.01)
+    assert waits[3] == pytest.approx(1.0, abs=0.01)
+
+
+@pytest.mark.asyncio
+async def test_send_retries_after_flood_control(monkeypatch):
+    sleeps = []
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+
+    monkeypatch.setattr(send_scheduler.asyncio, "sleep", fake_sleep)
+    responses = [
+        FakeResponse({"ok": False, "parameters": {"retry_after": 7}}, 429),
+        FakeResponse({"ok": True}, 200),
+    ]
+
+    async def call():
+        return responses.pop(0)
+
+    response = await send_scheduler.send("555:secret", 42, call)
+
+    assert response.status_code == 200
+    assert responses == []
+    assert max(sleeps) >= 7
+
+
+def test_indebted_bucket_outlives_idle_ttl(monkeypatch):
+    buckets = send_scheduler.TTLCache(maxsize=10, ttl=send_scheduler.BUCKET_IDLE_TTL)
+    send_scheduler._pause(buckets, "555", 1, 300)
+
+    now = send_scheduler.time.monotonic()
+    monkeypatch.setattr(send_scheduler.time, "monotonic", lambda: now + 200)
+    assert send_scheduler._reserve(buckets, "555", 1) == pytest.approx(101, abs=1)
+
+
+@pytest.mark.asyncio
+async def test_flood_control_pauses_the_chat_whatever_the_id_type(monkeypatch):
+    async def fake_sleep(delay):
+        pass
+
+    monkeypatch.setattr(send_scheduler.asyncio, "sleep", fake_sleep)
+    responses = [FakeResponse({"ok": False, "parameters": {"retry_after": 30}}, 429), FakeResponse({}, 200)]
+
+    async def call():
+        return responses.pop(0)
+
+    await send_scheduler.send("556:secret", 43, call)
+
+    # The constructor passes chat ids as strings; both must share one bucket.
+    chat = send_scheduler._chat_buckets.get(("556", "43"))
+    assert chat is not None and chat.debt() >= 29
+
+
+@pytest.mark.asyncio
+async def test_concurrent_flood_control_does_not_stack(monkeypatch):
+    paused = []
+
+    async def fake_sleep(delay):
+        pass
+
+    monkeypatch.setattr(send_scheduler.asyncio, "sleep", fake_sleep)
+    monkeypatch.setattr(send_scheduler, "TELEGRAM_SEND_MAX_RETRIES", 1)
+
+    async def call():
+        if len(paused) < 10:
+            paused.append(1)
+            return FakeResponse({"ok": False, "parameters": {"retry_after": 5}}, 429)
+        return FakeResponse({}, 200)
+
+    await asyncio.gather(*(send_scheduler.send("558:secret", 100 + n, call) for n in range(10)))
+
+    bot = send_scheduler._bot_buckets.get("558")
+    # One retry_after of debt plus at most the 20 reservations made; stacked
+    # pauses would leave 50s.
+    assert 5 <= bot.debt() <= 5 + 20 / send_scheduler.TELEGRAM_BOT_RATE
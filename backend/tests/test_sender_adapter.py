@@ -1,4 +1,5 @@
-import types
+import time
+
 import pytest
 
 from backend.services import sender_adapter
@@ -17,11 +18,15 @@ class FakeResponse:
     def raise_for_status(self):
         pass
 
+    async def aiter_bytes(self):
+        yield self.content
+
 
 class FakeAsyncClient:
-    def __init__(self, get_resp=None, post_resp=None):
+    def __init__(self, get_resp=None, post_resp=None, head_resp=None):
         self.get_resp = get_resp
         self.post_resp = post_resp
+        self.head_resp = head_resp or FakeResponse(status_code=405)
         self.last_post = None
 
     async def __aenter__(self):
@@ -33,19 +38,57 @@ class FakeAsyncClient:
     async def get(self, *args, **kwargs):
         return self.get_resp
 
-    async def post(self, url, json=None, data=None, files=None):
-        self.last_post = {"url": url, "json": json, "data": data, "files": files}
+    async def head(self, *args, **kwargs):
+        return self.head_resp
+
+    def stream(self, method, url, **kwargs):
+        client = self
+
+        class Stream:
+            async def __aenter__(self):
+                return client.get_resp
+
+            async def __aexit__(self, exc_type, exc, tb):
+                pass
+
+        return Stream()
+
+    async def post(self, url, json=None, data=None, files=None, content=None, headers=None):
+        body = None
+        if content is not None:
+            body = b"".join([chunk async for chunk in content])
+        self.last_post = {"url": url, "json": json, "data": data, "files": files, "body": body, "headers": headers}
         return self.post_resp
 
 
+@pytest.fixture(autouse=True)
+def file_ids(monkeypatch):
+    cache = {}
+
+    async def fake_get(bot_key, file_url):
+        return cache.get((bot_key, file_url))
+
+    async def fake_set(bot_key, file_url, validator, file_id):
+        cache[(bot_key, file_url)] = (validator, file_id, time.time())
+
+    async def fake_touch(bot_key, file_url):
+        validator, file_id, _ = cache[(bot_key, file_url)]
+        cache[(bot_key, file_url)] = (validator, file_id, time.time())
+
+    async def fake_delete(bot_key, file_url):
+        cache.pop((bot_key, file_url), None)
+
+    monkeypatch.setattr(sender_adapter.rdb.MediaFileId, "get", fake_get)
+    monkeypatch.setattr(sender_adapter.rdb.MediaFileId, "set", fake_set)
+    monkeypatch.setattr(sender_adapter.rdb.MediaFileId, "touch", fake_touch)
+    monkeypatch.setattr(sender_adapter.rdb.MediaFileId, "delete", fake_delete)
+    return cache
+
+
 @pytest.mark.asyncio
 async def test_send_message(monkeypatch):
     client = FakeAsyncClient(post_resp=FakeResponse({"ok": True}, 200))
-    monkeypatch.setattr(
-        sender_adapter,
-        "httpx",
-        types.SimpleNamespace(AsyncClient=lambda *a, **k: client),
-    )
+    monkeypatch.setattr(sender_adapter.tg, "get_client", lambda: client)
     res = await sender_adapter.send_message("token", 1, "hello")
     assert res["status_code"] == 200
     assert client.last_post["json"]["text"] == "hello"
@@ -56,11 +99,9 @@ async def test_send_media(monkeypatch):
     get_resp = FakeResponse(content=b"data", headers={"Content-Disposition": 'attachment; filename="f.txt"'})
     post_resp = FakeResponse({"ok": True}, 200)
     client = FakeAsyncClient(get_resp=get_resp, post_resp=post_resp)
-    monkeypatch.setattr(
-        sender_adapter,
-        "httpx",
-        types.SimpleNamespace(AsyncClient=lambda *a, **k: client),
-    )
+    monkeypatch.setattr(sender_adapter.tg, "get_client", lambda: client)
+    monkeypatch.setattr(sender_adapter.tg, "get_download_client", lambda: client)
+    monkeypatch.setattr(sender_adapter, "MEDIA_SEND_STRATEGY", "upload")
     res = await sender_adapter.send_media(
         "token",
         1,
@@ -70,4 +111,209 @@ async def test_send_media(monkeypatch):
         "caption",
     )
     assert res["status_code"] == 200
-    assert "photo" in client.last_post["files"]
+    body = client.last_post["body"]
+    assert b'name="photo"; filename="f.txt"' in body
+    assert b"\r\ndata\r\n" in body
+    assert body.endswith(b"--\r\n")
+
+
+@pytest.mark.asyncio
+async def test_send_media_reserves_budget_before_download(monkeypatch):
+    budget = sender_adapter.media_relay.ByteBudget(8 * 1024 * 1024)
+    available = {}
+    get_resp = FakeResponse(content=b"data", headers={"Content-Length": "4"})
+    downloads = FakeAsyncClient(get_resp=get_resp)
+    telegram = FakeAsyncClient(post_resp=FakeResponse({"ok": True}, 200))
+
+    def stream(method, url, **kwargs):
+        available["download"] = budget.available
+        return FakeAsyncClient.stream(downloads, method, url, **kwargs)
+
+    async def post(url, **kwargs):
+        available["upload"] = budget.available
+        return await FakeAsyncClient.post(telegram, url, **kwargs)
+
+    downloads.stream = stream
+    telegram.post = post
+    monkeypatch.setattr(sender_adapter.media_relay, "budget", budget)
+    monkeypatch.setattr(sender_adapter.tg, "get_client", lambda: telegram)
+    monkeypatch.setattr(sender_adapter.tg, "get_download_client", lambda: downloads)
+    monkeypatch.setattr(sender_adapter, "MEDIA_SEND_STRATEGY", "upload")
+
+    res = await sender_adapter.send_media("token", 1, "Image", "http://example.com/a.png", "image/png", "")
+
+    assert res["status_code"] == 200
+    assert available == {"download": 3 * 1024 * 1024, "upload": 8 * 1024 * 1024 - 4}
+    assert budget.available == budget.limit
+
+
+@pytest.mark.asyncio
+async def test_send_media_rejects_oversized_file_before_download(monkeypatch):
+    get_resp = FakeResponse(headers={"Content-Length": str(2 * 1024 * 1024)})
+    client = FakeAsyncClient(get_resp=get_resp, post_resp=FakeResponse({"ok": True}, 200))
+    monkeypatch.setattr(sender_adapter.tg, "get_client", lambda: client)
+    monkeypatch.setattr(sender_adapter.tg, "get_download_client", lambda: client)
+
+    with pytest.raises(ValueError):
+        await sender_adapter.send_media("token", 2, "Voice", "http://example.com/v.ogg", "audio/ogg", "")
+    assert client.last_post is None
+
+
+class CountingClient(FakeAsyncClient):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.heads = 0
+
+    async def head(self, *args, **kwargs):
+        self.heads += 1
+        return await super().head(*args, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_send_media_caches_uploaded_file_id_without_head(monkeypatch, file_ids):
+    get_resp = FakeResponse(content=b"data", headers={"ETag": '"v1"'})
+    post_resp = FakeResponse({"ok": True, "result": {"document": {"file_id": "new-id"}}}, 200)
+    client = CountingClient(get_resp=get_resp, post_resp=post_resp)
+    monkeypatch.setattr(sender_adapter.tg, "get_client", lambda: client)
+    monkeypatch.setattr(sender_adapter.tg, "get_download_client", lambda: client)
+    monkeypatch.setattr(sender_adapter, "MEDIA_SEND_STRATEGY", "upload")
+
+    await sender_adapter.send_media("123:abc", 3, "Document", "http://example.com/a.pdf", "application/pdf", "")
+
+    assert client.heads == 0
+    assert file_ids[("123", "http://example.com/a.pdf")][:2] == ('etag:"v1"', "new-id")
+
+
+@pytest.mark.asyncio
+async def test_send_media_reuses_cached_file_id(monkeypatch, file_ids):
+    head_resp = FakeResponse(headers={"ETag": '"v1"'})
+    client = CountingClient(post_resp=FakeResponse({"ok": True}, 200), head_resp=head_resp)
+    monkeypatch.setattr(sender_adapter.tg, "get_client", lambda: client)
+    monkeypatch.setattr(sender_adapter.tg, "get_download_client", lambda: client)
+    file_ids[("123", "http://example.com/a.png")] = ('etag:"v1"', "cached-id", 0.0)
+
+    res = await sender_adapter.send_media(
+        "123:abc", 3, "Image", "http://example.com/a.png", "image/png", ""
+    )
+
+    assert res["status_code"] == 200
+    assert client.heads == 1
+    assert client.last_post["data"]["photo"] == "cached-id"
+    assert client.last_post["body"] is None
+    assert file_ids[("123", "http://example.com/a.png")][2] > 0
+
+
+@pytest.mark.asyncio
+async def test_send_media_skips_head_within_revalidate_window(monkeypatch, file_ids):
+    client = CountingClient(post_resp=FakeResponse({"ok": True}, 200))
+    monkeypatch.setattr(sender_adapter.tg, "get_client", lambda: client)
+    monkeypatch.setattr(sender_adapter.tg, "get_download_client", lambda: client)
+    file_ids[("123", "http://example.com/a.png")] = ('etag:"v1"', "cached-id", time.time())
+
+    res = await sender_adapter.send_media(
+        "123:abc", 3, "Image", "http://example.com/a.png", "image/png", ""
+    )
+
+    assert res["status_code"] == 200
+    assert client.heads == 0
+    assert client.last_post["data"]["photo"] == "cached-id"
+
+
+@pytest.mark.asyncio
+async def test_send_media_caches_file_id_after_url_send(monkeypatch, file_ids):
+    body = {"ok": True, "result": {"photo": [{"file_id": "small"}, {"file_id": "large"}]}}
+    head_resp = FakeResponse(headers={"ETag": '"v1"'})
+    client = CountingClient(post_resp=FakeResponse(body, 200), head_resp=head_resp)
+    monkeypatch.setattr(sender_adapter.tg, "get_client", lambda: client)
+    monkeypatch.setattr(sender_adapter.tg, "get_download_client", lambda: client)
+    monkeypatch.setattr(sender_adapter, "MEDIA_SEND_STRATEGY", "url")
+
+    res = await sender_adapter.send_media(
+        "123:abc", 3, "Image", "http://example.com/a.png", "image/png", ""
+    )
+
+    assert res["status_code"] == 200
+    assert client.last_post["data"]["photo"] == "http://example.com/a.png"
+    assert client.heads == 1
+    assert file_ids[("123", "http://example.com/a.png")][:2] == ('etag:"v1"', "large")
+
+
+@pytest.mark.asyncio
+async def test_send_media_keeps_file_id_on_chat_errors(monkeypatch, file_ids):
+    body = {"ok": False, "description": "Bad Request: chat not found"}
+    head_resp = FakeResponse(headers={"ETag": '"v1"'})
+    client = FakeAsyncClient(post_resp=FakeResponse(body, 400), head_resp=head_resp)
+    monkeypatch.setattr(sender_adapter.tg, "get_client", lambda: client)
+    monkeypatch.setattr(sender_adapter.tg, "get_download_client", lambda: client)
+    file_ids[("123", "http://example.com/a.png")] = ('etag:"v1"', "cached-id", 0.0)
+
+    res = await sender_adapter.send_media(
+        "123:abc", 3, "Image", "http://example.com/a.png", "image/png", ""
+    )
+
+    assert res == {"status_code": 400, "body": body}
+    assert ("123", "http://example.com/a.png") in file_ids
+
+
+@pytest.mark.asyncio
+async def test_send_media_falls_back_to_upload_when_url_is_rejected(monkeypatch):
+    get_resp = FakeResponse(content=b"data")
+    client = FakeAsyncClient(get_resp=get_resp)
+    posts = []
+    rejected = {"ok": False, "description": "Bad Request: failed to get HTTP URL content"}
+    responses = [FakeResponse(rejected, 400), FakeResponse({"ok": True}, 200)]
+
+    async def post(url, data=None, content=None, headers=None, **kwargs):
+        posts.append({"data": data, "content": content})
+        return responses.pop(0)
+
+    client.post = post
+    learned = {}
+
+    async def fake_get(domain):
+        return None
+
+    async def fake_set(domain, strategy):
+        learned[domain] = strategy
+
+    monkeypatch.setattr(sender_adapter.tg, "get_client", lambda: client)
+    monkeypatch.setattr(sender_adapter.tg, "get_download_client", lambda: client)
+    monkeypatch.setattr(sender_adapter, "MEDIA_SEND_STRATEGY", "auto")
+    monkeypatch.setattr(sender_adapter.rdb.MediaDomainStrategy, "get", fake_get)
+    monkeypatch.setattr(sender_adapter.rdb.MediaDomainStrategy, "set", fake_set)
+
+    res = await sender_adapter.send_media(
+        "1:t", 4, "Document", "https://files.example.com/a.pdf", "application/pdf", ""
+    )
+
+    assert res["status_code"] == 200
+    assert posts[0]["data"]["document"] == "https://files.example.com/a.pdf"
+    assert posts[1]["content"] is not None
+    assert learned == {"files.example.com": "upload"}
+
+
+@pytest.mark.asyncio
+async def test_send_media_keeps_url_strategy_on_other_bad_requests(monkeypatch):
+    body = {"ok": False, "description": "Bad Request: chat not found"}
+    client = FakeAsyncClient(post_resp=FakeResponse(body, 400))
+    learned = {}
+
+    async def fake_get(domain):
+        return None
+
+    async def fake_set(domain, strategy):
+        learned[domain] = strategy
+
+    monkeypatch.setattr(sender_adapter.tg, "get_client", lambda: client)
+    monkeypatch.setattr(sender_adapter.tg, "get_download_client", lambda: client)
+    monkeypatch.setattr(sender_adapter, "MEDIA_SEND_STRATEGY", "auto")
+    monkeypatch.setattr(sender_adapter.rdb.MediaDomainStrategy, "get", fake_get)
+    monkeypatch.setattr(sender_adapter.rdb.MediaDomainStrategy, "set", fake_set)
+
+    res = await sender_adapter.send_media(
+        "1:t", 4, "Document", "https://files.example.com/a.pdf", "application/pdf", ""
+    )
+
+    assert res == {"status_code": 400, "body": body}
+    assert client.last_post["body"] is None
+    assert learned == {}
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from backend.services import sender_adapter
+
+tg = sender_adapter.tg
+
+
+class FakeResponse:
+    status_code = 200
+
+    def json(self):
+        return {"ok": True}
+
+
+class FakeAsyncClient:
+    def __init__(self):
+        self.calls = []
+
+    async def post(self, url, **kwargs):
+        self.calls.append(("POST", url, kwargs))
+        return FakeResponse()
+
+    async def get(self, url, **kwargs):
+        self.calls.append(("GET", url, kwargs))
+        return FakeResponse()
+
+
+@pytest.mark.asyncio
+async def test_shared_client_is_reused():
+    await tg.close()
+    try:
+        await tg.start()
+        first = tg.get_client()
+        assert tg.get_client() is first
+    finally:
+        await tg.close()
+    assert tg._client is None
+
+
+@pytest.mark.asyncio
+async def test_post_uses_method_url_and_records_metrics(monkeypatch):
+    client = FakeAsyncClient()
+    monkeypatch.setattr(tg, "get_client", lambda: client)
+    counter = tg.TELEGRAM_API_REQUESTS.labels(method="sendMessage", status="200")
+    before = counter._value.get()
+
+    await tg.post("token", "sendMessage", json={"text": "hi"})
+
+    assert client.calls == [
+        ("POST", f"{tg.TELEGRAM_API_URL}/bottoken/sendMessage", {"json": {"text": "hi"}})
+    ]
+    assert counter._value.get() == before + 1
+    assert tg.TELEGRAM_API_IN_FLIGHT._value.get() == 0
+
+
+@pytest.mark.asyncio
+async def test_file_path_waiters_survive_cancelled_lookup(monkeypatch):
+    calls = []
+    started = asyncio.Event()
+
+    async def fetch(token, file_id):
+        calls.append(file_id)
+        if len(calls) == 1:
+            started.set()
+            await asyncio.sleep(60)
+        return "photos/a.jpg"
+
+    monkeypatch.setattr(tg, "_fetch_file_path", fetch)
+    tg._file_paths.clear()
+
+    first = asyncio.create_task(tg.get_file_path("1:t", "cancel-me"))
+    await started.wait()
+    second = asyncio.create_task(tg.get_file_path("1:t", "cancel-me"))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await asyncio.wait_for(second, 5) == "photos/a.jpg"
+    assert calls == ["cancel-me", "cancel-me"]
+    with pytest.raises(asyncio.CancelledError):
+        await first
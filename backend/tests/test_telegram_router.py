@@ -18,9 +18,32 @@ class FakeRequest:
 
 @pytest.mark.asyncio
 async def test_handle_webhook_unsupported(monkeypatch):
-    monkeypatch.setattr(telegram.db, "get_bot_token", lambda bot_id: "token")
-    monkeypatch.setattr(telegram.db, "get_bot_locale", lambda bot_id: "en")
+    async def fake_load_webhook_context(bot_id, user_id):
+        return telegram.WebhookContext(token="token", locale="en")
+
+    monkeypatch.setattr(telegram, "load_webhook_context", fake_load_webhook_context)
     request = FakeRequest({"unknown": {}})
     resp = await telegram.handle_webhook(1, request)
     assert resp.status_code == 200
     assert resp.body
+
+
+@pytest.mark.asyncio
+async def test_handle_webhook_queues_update_in_stream_mode(monkeypatch):
+    queued = []
+
+    async def fake_enqueue(bot_id, chat_id, update):
+        queued.append((bot_id, chat_id, update))
+
+    async def fail(*a, **k):
+        raise AssertionError("update must not be processed inline")
+
+    monkeypatch.setattr(telegram, "INBOUND_QUEUE_ENABLED", True)
+    monkeypatch.setattr(telegram.inbound_queue, "enqueue", fake_enqueue)
+    monkeypatch.setattr(telegram, "load_webhook_context", fail)
+    update = {"message": {"from": {"id": 5}, "text": "hi"}}
+
+    resp = await telegram.handle_webhook(1, FakeRequest(update))
+
+    assert resp == {"status": "queued"}
+    assert queued == [(1, 5, update)]
@@ -0,0 +1,71 @@
+import pytest
+
+from backend.services import webhook_context
+
+
+USER = {
+    "is_active": True,
+    "is_owner": False,
+    "selected_project_code": None,
+    "project_commands": ["Sales"],
+}
+
+
+@pytest.mark.asyncio
+async def test_load_webhook_context_miss_queries_db_once_and_caches(monkeypatch):
+    stored = {}
+    calls = []
+
+    async def fake_get_webhook_context(bot_id, user_id):
+        calls.append((bot_id, user_id))
+        return {"token": "token", "locale": "ru", "user": USER}
+
+    async def cache_miss(*a):
+        return None, None, None
+
+    async def cache_fill(*a):
+        stored["args"] = a
+
+    monkeypatch.setattr(webhook_context.rdb.WebhookContext, "get", cache_miss)
+    monkeypatch.setattr(webhook_context.rdb.WebhookContext, "fill", cache_fill)
+    monkeypatch.setattr(webhook_context.db, "get_webhook_context", fake_get_webhook_context)
+
+    ctx = await webhook_context.load_webhook_context(1, 2)
+
+    assert calls == [(1, 2)]
+    assert stored["args"][:5] == (1, 2, "token", "ru", USER)
+    assert ctx.token == "token"
+    assert ctx.locale == "ru"
+    assert ctx.has_user
+    assert ctx.project_commands == ["Sales"]
+
+
+@pytest.mark.asyncio
+async def test_load_webhook_context_hit_skips_db(monkeypatch):
+    async def fail(*a):
+        raise AssertionError("database must not be queried on a cache hit")
+
+    async def cache_hit(*a):
+        return "token", "en", dict(USER, is_active=None)
+
+    monkeypatch.setattr(webhook_context.rdb.WebhookContext, "get", cache_hit)
+    monkeypatch.setattr(webhook_context.db, "get_webhook_context", fail)
+
+    ctx = await webhook_context.load_webhook_context(1, 2)
+
+    assert ctx.user_status is None
+    assert not ctx.has_user
+
+
+@pytest.mark.asyncio
+async def test_load_webhook_context_unknown_bot(monkeypatch):
+    async def fake_get_webhook_context(bot_id, user_id):
+        return None
+
+    async def cache_miss(*a):
+        return None, None, None
+
+    monkeypatch.setattr(webhook_context.rdb.WebhookContext, "get", cache_miss)
+    monkeypatch.setattr(webhook_context.db, "get_webhook_context", fake_get_webhook_context)
+
+    assert await webhook_context.load_webhook_context(1, 2) is None
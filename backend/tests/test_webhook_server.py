@@ -1,4 +1,3 @@
-import types
 import pytest
 
 from backend.services import webhook_server
@@ -39,11 +38,7 @@ class FakeAsyncClient:
 @pytest.mark.asyncio
 async def test_get_bot_id(monkeypatch):
     resp = FakeResponse({"ok": True, "result": {"id": 42}})
-    monkeypatch.setattr(
-        webhook_server,
-        "httpx",
-        types.SimpleNamespace(AsyncClient=lambda *a, **k: FakeAsyncClient(get_resp=resp)),
-    )
+    monkeypatch.setattr(webhook_server.tg, "get_client", lambda: FakeAsyncClient(get_resp=resp))
     bot_id = await webhook_server.get_bot_id("token")
     assert bot_id == 42
 
@@ -51,11 +46,7 @@ async def test_get_bot_id(monkeypatch):
 @pytest.mark.asyncio
 async def test_get_bot_name(monkeypatch):
     resp = FakeResponse({"ok": True, "result": {"username": "bot"}})
-    monkeypatch.setattr(
-        webhook_server,
-        "httpx",
-        types.SimpleNamespace(AsyncClient=lambda *a, **k: FakeAsyncClient(get_resp=resp)),
-    )
+    monkeypatch.setattr(webhook_server.tg, "get_client", lambda: FakeAsyncClient(get_resp=resp))
     name = await webhook_server.get_bot_name("token")
     assert name == "bot"
 
@@ -63,11 +54,7 @@ async def test_get_bot_name(monkeypatch):
 @pytest.mark.asyncio
 async def test_set_webhook(monkeypatch):
     resp = FakeResponse({"ok": True}, status_code=200)
-    monkeypatch.setattr(
-        webhook_server,
-        "httpx",
-        types.SimpleNamespace(AsyncClient=lambda *a, **k: FakeAsyncClient(post_resp=resp)),
-    )
+    monkeypatch.setattr(webhook_server.tg, "get_client", lambda: FakeAsyncClient(post_resp=resp))
     result = await webhook_server.set_webhook("token", "http://url")
     assert result["status_code"] == 200
     assert result["body"]["ok"] is True
@@ -76,11 +63,15 @@ async def test_set_webhook(monkeypatch):
 @pytest.mark.asyncio
 async def test_delete_webhook(monkeypatch):
     resp = FakeResponse({"ok": True}, status_code=200)
-    monkeypatch.setattr(
-        webhook_server,
-        "httpx",
-        types.SimpleNamespace(AsyncClient=lambda *a, **k: FakeAsyncClient(post_resp=resp)),
-    )
+    monkeypatch.setattr(webhook_server.tg, "get_client", lambda: FakeAsyncClient(post_resp=resp))
     result = await webhook_server.delete_webhook("token")
     assert result["status_code"] == 200
     assert result["body"]["ok"] is True
+
+
+@pytest.mark.asyncio
+async def test_answer_callback_query(monkeypatch):
+    resp = FakeResponse({"ok": True}, status_code=200)
+    monkeypatch.setattr(webhook_server.tg, "get_client", lambda: FakeAsyncClient(post_resp=resp))
+    result = await webhook_server.answer_callback_query("token", "cb")
+    assert result["status_code"] == 200